@@ -2,12 +2,24 @@
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import json
+import time
+import hashlib
+import numpy as np
 import pandas as pd
-import sqlite3
 import unicodedata
-from src.core.config import DB_PATH
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from src.core.config import COMPARATOR_WORKERS, DIFF_ENGINE, DIFF_TOLERANCE
+from src.core.schema import REAL_COLUMNS, column_types, create_table_sql
 from src.core.logger import log
+from core.db_utils import (
+    sanitize_table_name, reader, transaction, insert_rows, dataframe_rows,
+    INTERNAL_PREFIX, FINGERPRINT_TABLE, FINGERPRINT_SETS
+)
 
 # --- Mapa de claves por defecto (puede faltar 'responsable' en alguna hoja) ---
 DEFAULT_KEYS = ["fecha", "descripcion__actividad", "monto_", "responsable"]
@@ -15,12 +27,34 @@ FALLBACK_KEYS = ["fecha", "descripcion__actividad", "monto_"]
 
 OMITIR_HOJAS = {"reporte_bancos", "fe"}  # por si acaso
 
-def load_table_from_db(table_name: str) -> pd.DataFrame:
-    """Carga una tabla desde SQLite."""
+# Columna auxiliar con el índice original de cada fila (new: posición en la
+# hoja; old: rowid en SQLite) para poder aplicar los cambios fila a fila.
+IDX = "__idx__"
+
+# Columnas no clave que cambiaron en cada fila modificada (tupla de nombres normalizados)
+CAMBIOS = "__cambios__"
+
+def _tipar(conn, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas declaradas REAL como float aunque vengan todas vacías (NULL → NaN)."""
+    reales = [fila[1] for fila in conn.execute(f'PRAGMA table_info("{table_name}")') if fila[2] == "REAL"]
+    for c in reales:
+        if c in df.columns and df[c].dtype == object and df[c].isna().all():
+            df[c] = df[c].astype(float)
+    return df
+
+def load_table_from_db(table_name: str, conn=None, rowid: bool = False) -> pd.DataFrame:
+    """
+    Carga una tabla desde SQLite (con la conexión dada o un lector del pool).
+    - rowid: usa el rowid de SQLite como índice (para aplicar cambios por fila).
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query(f"SELECT * FROM '{table_name}'", conn)
-        conn.close()
+        with (reader() if conn is None else nullcontext(conn)) as conn:
+            if rowid:
+                df = pd.read_sql_query(f"SELECT rowid AS \"{IDX}\", * FROM '{table_name}'", conn, index_col=IDX)
+                df.index.name = None
+            else:
+                df = pd.read_sql_query(f"SELECT * FROM '{table_name}'", conn)
+            df = _tipar(conn, table_name, df)
         log(f"📦 Tabla '{table_name}' cargada desde la base ({len(df)} filas).")
         return df
     except Exception as e:
@@ -34,25 +68,24 @@ def _strip_accents(s: str) -> str:
         if not unicodedata.combining(c)
     )
 
+def _normalize_name(c) -> str:
+    c2 = str(c).strip().replace("\n", " ")
+    c2 = c2.replace(" / ", "_").replace("/", "_").replace(" ", "_")
+    return _strip_accents(c2).lower()
+
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Normaliza nombres de columnas: minúsculas, sin tildes, _ en vez de espacios/slash."""
-    cols = []
-    for c in df.columns:
-        c2 = str(c).strip().replace("\n", " ")
-        c2 = c2.replace(" / ", "_").replace("/", "_").replace(" ", "_")
-        c2 = _strip_accents(c2).lower()
-        cols.append(c2)
     df = df.copy()
-    df.columns = cols
+    df.columns = [_normalize_name(c) for c in df.columns]
     return df
 
 def coerce_types(df: pd.DataFrame) -> pd.DataFrame:
     """Fija tipos básicos: fechas a YYYY-MM-DD, numéricos a string estable, resto string."""
     dfx = df.copy()
-    # Fecha
+    # Fecha (cada valor por separado: el resultado no depende de qué otras filas vengan)
     for col in dfx.columns:
         if "fecha" in col:
-            dfx[col] = pd.to_datetime(dfx[col], errors="coerce").dt.strftime("%Y-%m-%d")
+            dfx[col] = pd.to_datetime(dfx[col], errors="coerce", format="mixed", dayfirst=True).dt.strftime("%Y-%m-%d")
     # Monto
         if col.startswith("monto"):
             dfx[col] = pd.to_numeric(dfx[col], errors="coerce")
@@ -73,14 +106,69 @@ def get_keys_for_sheet(columns: list[str]) -> list[str]:
     return keys
 
 # ---------- Comparación ----------
-def compare_dataframes(df_old: pd.DataFrame, df_new: pd.DataFrame):
+def _sin_claves():
+    return {
+        "nuevos": pd.DataFrame(), "eliminados": pd.DataFrame(), "modificados": pd.DataFrame(),
+        "celdas": _sin_celdas(), "claves": []
+    }
+
+def _sin_celdas(columnas=()):
+    return {
+        "idx": np.array([], dtype=np.int64), "rid": np.array([], dtype=np.int64),
+        "columna": np.array([], dtype=np.int32), "columnas": list(columnas),
+        "antes": np.array([], dtype=object), "despues": np.array([], dtype=object),
+    }
+
+def _emparejar(clave_new, fila_new, clave_old, fila_old) -> tuple:
     """
-    Devuelve (nuevos, eliminados, modificados) como DataFrames.
+    Empareja las filas de ambos lados como multiconjuntos por clave (huellas
+    uint64 de clave y de fila): cada fila tiene a lo sumo una pareja, así que
+    el resultado crece linealmente aunque las claves se repitan.
+    - Primero, filas idénticas (misma clave y misma fila): la k-ésima aparición
+      en new con la k-ésima en old. Insertar o borrar una fila dentro de un
+      grupo no desplaza al resto.
+    - Las que quedan, por orden de aparición dentro de su clave (candidatas a
+      modificadas); las sobrantes son nuevas (new) o eliminadas (old).
+    Retorna (pos_new, pos_old, solo_new, solo_old) en posiciones (0..n-1).
+    """
+    new = pd.DataFrame({"clave": clave_new, "fila": fila_new}).rename_axis("pos")
+    old = pd.DataFrame({"clave": clave_old, "fila": fila_old}).rename_axis("pos")
+
+    def _aparicion(df, por):
+        return df.assign(k=df.groupby(por, sort=False).cumcount()).reset_index()
+
+    por = ["clave", "fila", "k"]
+    iguales = _aparicion(new, por[:2])[por + ["pos"]].merge(
+        _aparicion(old, por[:2])[por + ["pos"]], on=por, suffixes=("_new", "_old")
+    )
+    libres_new = new.drop(index=iguales["pos_new"])
+    libres_old = old.drop(index=iguales["pos_old"])
+
+    por = ["clave", "k"]
+    pares = _aparicion(libres_new, por[:1])[por + ["pos"]].merge(
+        _aparicion(libres_old, por[:1])[por + ["pos"]], on=por, suffixes=("_new", "_old")
+    )
+    solo_new = libres_new.index.difference(pares["pos_new"])
+    solo_old = libres_old.index.difference(pares["pos_old"])
+    return (pares["pos_new"].to_numpy(), pares["pos_old"].to_numpy(),
+            solo_new.to_numpy(), solo_old.to_numpy())
+
+def _alinear(a: pd.DataFrame, b: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """Une fila a fila dos lados ya emparejados (mismas columnas que un merge por claves)."""
+    a, b = a.reset_index(drop=True), b.reset_index(drop=True)
+    return a.merge(b.drop(columns=keys), left_index=True, right_index=True, suffixes=("_new", "_old"))
+
+def _comparar(df_old: pd.DataFrame, df_new: pd.DataFrame) -> dict:
+    """
+    Núcleo de compare_dataframes. Además de los tres conjuntos retorna las
+    claves usadas. Las claves repetidas se tratan como multiconjunto
+    (_emparejar), de modo que el diff es exacto y no hay producto cartesiano.
+    Cada fila conserva su índice original en IDX (modificados: IDX_new / IDX_old).
     """
     if df_new.empty and df_old.empty:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return _sin_claves()
 
-    # Normalizar columnas y tipos en ambos lados (solo para comparar)
+    # Normalizar columnas y tipos en ambos lados (solo para emparejar)
     df_old_n = coerce_types(normalize_columns(df_old))
     df_new_n = coerce_types(normalize_columns(df_new))
 
@@ -88,70 +176,662 @@ def compare_dataframes(df_old: pd.DataFrame, df_new: pd.DataFrame):
     common_cols = sorted(set(df_old_n.columns).intersection(df_new_n.columns))
     if not common_cols:
         log("⚠️ No hay columnas en común para comparar.")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return _sin_claves()
 
     keys = get_keys_for_sheet(common_cols)
     if not keys:
         log(f"⚠️ No se encontraron claves válidas. Columnas comunes: {common_cols[:10]}…")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-    # NUEVOS (están en new y no en old)
-    nuevos = df_new_n.merge(df_old_n[keys], on=keys, how="left", indicator=True)
-    nuevos = nuevos[nuevos["_merge"] == "left_only"].drop(columns=["_merge"])
-
-    # ELIMINADOS (están en old y no en new)
-    eliminados = df_old_n.merge(df_new_n[keys], on=keys, how="left", indicator=True)
-    eliminados = eliminados[eliminados["_merge"] == "left_only"].drop(columns=["_merge"])
-
-    # MODIFICADOS (coincide clave, difiere alguna columna no-clave)
-    comunes = df_new_n.merge(df_old_n, on=keys, suffixes=("_new", "_old"))
-    diffs = []
-    non_key_cols = [c for c in df_new_n.columns if c not in keys]
-    for _, row in comunes.iterrows():
-        changed = False
-        for c in non_key_cols:
-            cn = f"{c}_new"
-            co = f"{c}_old"
-            if cn in comunes.columns and co in comunes.columns:
-                if str(row[cn]) != str(row[co]):
-                    changed = True
-                    break
-        if changed:
-            diffs.append(row)
-    modificados = pd.DataFrame(diffs)
-
-    return nuevos, eliminados, modificados
-
-def detect_changes(new_data: dict):
+        return _sin_claves()
+
+    # Emparejar por huellas: claves normalizadas + valores originales no clave
+    # (el redondeo y el paso a texto de coerce_types ocultarían cambios reales).
+    non_key_cols = [c for c in df_new_n.columns if c not in keys and c in df_old_n.columns]
+    raw_new = {_normalize_name(c): c for c in df_new.columns}
+    raw_old = {_normalize_name(c): c for c in df_old.columns}
+    pos_new, pos_old, solo_new, solo_old = _emparejar(
+        _hash_filas(df_new_n[keys]), _hash_filas(df_new[[raw_new[c] for c in non_key_cols]]),
+        _hash_filas(df_old_n[keys]), _hash_filas(df_old[[raw_old[c] for c in non_key_cols]]),
+    )
+    df_old_n[IDX] = df_old.index
+    df_new_n[IDX] = df_new.index
+
+    # NUEVOS (sin pareja en old) y ELIMINADOS (sin pareja en new)
+    nuevos = df_new_n.iloc[solo_new].reset_index(drop=True)
+    eliminados = df_old_n.iloc[solo_old].reset_index(drop=True)
+
+    # MODIFICADOS: parejas con huella de fila distinta; la comparación por
+    # columnas decide (tolerancia en montos).
+    comunes = _alinear(df_new_n.iloc[pos_new], df_old_n.iloc[pos_old], keys)
+    if comunes.empty or not non_key_cols:
+        modificados, celdas = comunes.iloc[0:0].assign(**{CAMBIOS: []}), _sin_celdas(non_key_cols)
+    else:
+        modificados, celdas = _filtrar_modificados(comunes, df_new, df_old, non_key_cols)
+
+    return {
+        "nuevos": nuevos, "eliminados": eliminados, "modificados": modificados,
+        "celdas": celdas, "claves": keys
+    }
+
+def _es_monto(col: str) -> bool:
+    return col.upper() in REAL_COLUMNS or col.startswith("monto")
+
+def _diferencias(a: pd.DataFrame, b: pd.DataFrame, columnas: list) -> np.ndarray:
     """
-    Recorre todos los DataFrames del reader y compara con las tablas SQLite.
-    Retorna resumen {hoja: {nuevos, eliminados, modificados, nuevos_df, eliminados_df, modificados_df}}
-    """
-    summary = {}
-
-    for hoja, df_new in new_data.items():
-        table_name = hoja.replace(" ", "_").lower()
-        if table_name in OMITIR_HOJAS:
-            continue
-
-        df_old = load_table_from_db(table_name)
-        if df_old.empty:
-            # Consideramos todo como nuevo si no existe tabla previa
-            ndf, edf, mdf = df_new.copy(), pd.DataFrame(), pd.DataFrame()
-            summary[hoja] = {
-                "nuevos": len(ndf), "eliminados": 0, "modificados": 0,
-                "nuevos_df": ndf, "eliminados_df": edf, "modificados_df": mdf
-            }
-            log(f"🆕 Tabla '{table_name}' no existía. Todo se considera NUEVO: {len(ndf)} filas.")
-            continue
-
-        nuevos, eliminados, modificados = compare_dataframes(df_old, df_new)
-        summary[hoja] = {
-            "nuevos": len(nuevos), "eliminados": len(eliminados), "modificados": len(modificados),
-            "nuevos_df": nuevos, "eliminados_df": eliminados, "modificados_df": modificados
+    Matriz booleana (filas × columnas) de celdas distintas entre a y b, ya
+    alineados fila a fila. Compara valores nativos, sin pasar por texto:
+    - Montos: numéricos con tolerancia DIFF_TOLERANCE (un texto no numérico
+      se compara exacto).
+    - Resto: igualdad exacta. Dos nulos (None / NaN) son iguales.
+    """
+    distinto = np.zeros((len(a), len(columnas)), dtype=bool)
+    for j, col in enumerate(columnas):
+        x = a.iloc[:, j].to_numpy(dtype=object)
+        y = b.iloc[:, j].to_numpy(dtype=object)
+        nulos_x, nulos_y = pd.isna(x), pd.isna(y)
+        exacto = (x != y) & ~(nulos_x & nulos_y)
+        if _es_monto(col):
+            xn = pd.to_numeric(a.iloc[:, j], errors="coerce").to_numpy(dtype=np.float64)
+            yn = pd.to_numeric(b.iloc[:, j], errors="coerce").to_numpy(dtype=np.float64)
+            texto = (np.isnan(xn) & ~nulos_x) | (np.isnan(yn) & ~nulos_y)
+            numerico = ~np.isclose(xn, yn, rtol=0, atol=DIFF_TOLERANCE, equal_nan=True)
+            distinto[:, j] = np.where(texto, exacto, numerico)
+        else:
+            distinto[:, j] = exacto
+    return distinto
+
+def _filtrar_modificados(comunes, df_new, df_old, columnas: list) -> tuple:
+    """
+    Filas de `comunes` (merge por claves) con alguna columna no clave distinta.
+    Agrega CAMBIOS: tupla con las columnas (nombre normalizado) que cambiaron.
+    Retorna (modificados, celdas): celdas es la vista compacta por celda
+    cambiada, en columnas paralelas:
+    - idx / rid: índice de la fila en la hoja / rowid en la tabla.
+    - columna: posición en `columnas` (nombres normalizados).
+    - antes / despues: valores nativos (nulo → None).
+    """
+    raw_new = {_normalize_name(c): c for c in df_new.columns}
+    raw_old = {_normalize_name(c): c for c in df_old.columns}
+    a = df_new.loc[comunes[f"{IDX}_new"], [raw_new[c] for c in columnas]]
+    b = df_old.loc[comunes[f"{IDX}_old"], [raw_old[c] for c in columnas]]
+    distinto = _diferencias(a, b, columnas)
+    filas = distinto.any(axis=1)
+    nombres = np.array(columnas, dtype=object)
+    modificados = comunes[filas].copy()
+    modificados[CAMBIOS] = [tuple(nombres[d]) for d in distinto[filas]]
+
+    i, j = np.nonzero(distinto)
+    antes, despues = b.to_numpy(dtype=object)[i, j], a.to_numpy(dtype=object)[i, j]
+    antes[pd.isna(antes)] = None
+    despues[pd.isna(despues)] = None
+    celdas = {
+        "idx": comunes[f"{IDX}_new"].to_numpy()[i], "rid": comunes[f"{IDX}_old"].to_numpy(dtype=np.int64)[i],
+        "columna": j.astype(np.int32), "columnas": list(columnas),
+        "antes": antes, "despues": despues,
+    }
+    return modificados, celdas
+
+def compare_dataframes(df_old: pd.DataFrame, df_new: pd.DataFrame):
+    """
+    Devuelve (nuevos, eliminados, modificados) como DataFrames.
+    """
+    r = _comparar(df_old, df_new)
+    return r["nuevos"], r["eliminados"], r["modificados"]
+
+# ---------- Huellas por fila ----------
+# Huella de 64 bits (siphash de pandas, clave fija → estable entre ejecuciones)
+# de las claves normalizadas y de las columnas no clave de cada fila. Las de la
+# tabla guardada viven en FINGERPRINT_TABLE (tabla, rid = rowid, clave, fila);
+# FINGERPRINT_SETS guarda por tabla las columnas y una ficha del contenido
+# (_ficha_tabla) al escribirlas: si la tabla se editó fuera del pipeline la
+# ficha no coincide y las huellas no se usan.
+_NULO = "\x00"
+_MEZCLA = np.uint64(0x100000001B3)
+
+_HASH_NULO = pd.util.hash_array(np.array([_NULO], dtype=object))[0]
+
+def _hash_numeros(valores) -> np.ndarray:
+    numeros = np.asarray(valores, dtype=np.float64) + 0.0  # -0.0 = 0.0
+    h = pd.util.hash_array(numeros)
+    h[np.isnan(numeros)] = _HASH_NULO
+    return h
+
+def _hash_columna(col: pd.Series) -> np.ndarray:
+    """
+    Huella uint64 por valor, independiente del dtype de la columna:
+    números por su valor (1 = 1.0, -0.0 = 0.0), texto por su contenido y
+    cualquier nulo (None / NaN) igual a cualquier otro.
+    """
+    if col.dtype.kind in "fiu":
+        return _hash_numeros(col.to_numpy())
+    valores = col.to_numpy(dtype=object)
+    nulos = pd.isna(valores)
+    texto = col.astype(str).to_numpy(dtype=object)
+    texto[nulos] = _NULO
+    h = pd.util.hash_array(texto)
+    if pd.api.types.infer_dtype(valores, skipna=True) not in ("string", "empty"):
+        tipos = col.map(type)
+        numericos = (tipos.isin((float, int, np.float64, np.int64)) & ~nulos).to_numpy()
+        if numericos.any():
+            h[numericos] = _hash_numeros(valores[numericos])
+    return h
+
+def _hash_filas(df: pd.DataFrame) -> np.ndarray:
+    """Huella uint64 por fila combinando las de sus columnas en orden."""
+    h = np.zeros(len(df), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(df.shape[1]):
+            h = (h ^ _hash_columna(df.iloc[:, i])) * _MEZCLA
+    return h
+
+def row_fingerprints(df: pd.DataFrame) -> dict:
+    """
+    Huellas de las filas de df tal como se comparan en _comparar:
+    - clave: claves normalizadas (coerce_types), como en el merge.
+    - fila: valores originales de las columnas no clave.
+    Retorna {claves, columnas, clave, fila} (arrays uint64 alineados con df).
+    """
+    columnas = [_normalize_name(c) for c in df.columns]
+    keys = get_keys_for_sheet(sorted(set(columnas)))
+    norm = normalize_columns(df)
+    clave = _hash_filas(coerce_types(norm[keys])) if keys else np.zeros(len(df), dtype=np.uint64)
+    no_clave = [i for i, c in enumerate(columnas) if c not in keys]
+    return {
+        "claves": keys, "columnas": columnas,
+        "clave": clave, "fila": _hash_filas(df.iloc[:, no_clave]),
+    }
+
+def _asegurar_tablas_huellas(conn):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{FINGERPRINT_TABLE}" ('
+        "tabla TEXT NOT NULL, rid INTEGER NOT NULL, clave INTEGER NOT NULL, fila INTEGER NOT NULL, "
+        "PRIMARY KEY (tabla, rid)) WITHOUT ROWID"
+    )
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{FINGERPRINT_SETS}" ('
+        "tabla TEXT PRIMARY KEY, columnas TEXT NOT NULL, filas INTEGER NOT NULL, ficha TEXT)"
+    )
+    if "ficha" not in {fila[1] for fila in conn.execute(f'PRAGMA table_info("{FINGERPRINT_SETS}")')}:
+        conn.execute(f'ALTER TABLE "{FINGERPRINT_SETS}" ADD COLUMN ficha TEXT')
+
+def _insertar_huellas(conn, table: str, rids, huellas: dict):
+    conn.executemany(
+        f'INSERT OR REPLACE INTO "{FINGERPRINT_TABLE}" (tabla, rid, clave, fila) VALUES (?, ?, ?, ?)',
+        zip([table] * len(huellas["clave"]), map(int, rids),
+            huellas["clave"].view(np.int64).tolist(), huellas["fila"].view(np.int64).tolist())
+    )
+
+def _ficha_tabla(conn, table: str) -> tuple:
+    """
+    Ficha barata del contenido actual de la tabla, en una sola pasada en SQLite
+    (sin convertir tipos): su CREATE TABLE, COUNT(*), MAX(rowid) y por columna
+    la suma de los valores (REAL / INTEGER) o de los largos (resto). Detecta
+    ediciones hechas fuera del pipeline (UPDATE manual, backup restaurado,
+    herramientas de ia/) salvo las que conservan esas sumas, p. ej. cambiar un
+    texto por otro del mismo largo. Retorna (filas, ficha).
+    """
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    partes = ["COUNT(*)", "MAX(rowid)"]
+    for fila in conn.execute(f'PRAGMA table_info("{table}")'):
+        c = fila[1].replace('"', '""')
+        partes.append(f'total("{c}")' if fila[2].upper() in ("REAL", "INTEGER") else f'total(length("{c}"))')
+    valores = conn.execute(f'SELECT {", ".join(partes)} FROM "{table}"').fetchone()
+    ficha = hashlib.blake2b(json.dumps([sql and sql[0], valores]).encode("utf-8"), digest_size=16).hexdigest()
+    return valores[0], ficha
+
+def _registrar_set(conn, table: str, columnas: list):
+    filas, ficha = _ficha_tabla(conn, table)
+    conn.execute(
+        f'INSERT OR REPLACE INTO "{FINGERPRINT_SETS}" (tabla, columnas, filas, ficha) VALUES (?, ?, ?, ?)',
+        (table, json.dumps(columnas, ensure_ascii=False), filas, ficha)
+    )
+
+def store_fingerprints(conn, table: str, df: pd.DataFrame = None, huellas: dict = None):
+    """
+    Guarda las huellas de una tabla recién escrita completa (rowid 1..n en el
+    orden de df). Acepta huellas ya calculadas (p. ej. acumuladas por bloques).
+    No confirma.
+    """
+    if huellas is None:
+        huellas = row_fingerprints(df)
+    _asegurar_tablas_huellas(conn)
+    conn.execute(f'DELETE FROM "{FINGERPRINT_TABLE}" WHERE tabla = ?', (table,))
+    _insertar_huellas(conn, table, range(1, len(huellas["clave"]) + 1), huellas)
+    _registrar_set(conn, table, huellas["columnas"])
+
+def update_fingerprints(conn, table: str, df: pd.DataFrame, cambios: dict, primer_rid: int,
+                        vigentes: bool = True):
+    """
+    Ajusta las huellas tras aplicar un delta (updater.apply_changes):
+    borra las de eliminados, recalcula las de modificados e inserta las de
+    nuevos desde primer_rid (rowids asignados en orden). Si la tabla no tenía
+    huellas o no estaban vigentes antes del delta (vigentes = resultado de
+    fingerprints_current antes de escribir), las reconstruye leyéndola una
+    vez. No confirma.
+    """
+    if not vigentes or _set_huellas(conn, table) is None:
+        refresh_fingerprints(conn, table)
+        return
+
+    eliminados, nuevos = cambios["eliminados_rid"], cambios["nuevos_idx"]
+    if len(eliminados):
+        conn.executemany(
+            f'DELETE FROM "{FINGERPRINT_TABLE}" WHERE tabla = ? AND rid = ?',
+            ((table, int(r)) for r in eliminados)
+        )
+    if len(cambios["modificados_idx"]):
+        _insertar_huellas(conn, table, cambios["modificados_rid"],
+                          row_fingerprints(df.loc[cambios["modificados_idx"]]))
+    if len(nuevos):
+        _insertar_huellas(conn, table, range(primer_rid, primer_rid + len(nuevos)),
+                          row_fingerprints(df.loc[nuevos]))
+    _registrar_set(conn, table, [_normalize_name(c) for c in df.columns])
+
+def refresh_fingerprints(conn, table: str):
+    """Recalcula las huellas leyendo la tabla completa (tablas sin huellas previas)."""
+    df = load_table_from_db(table, conn, rowid=True)
+    huellas = row_fingerprints(df)
+    _asegurar_tablas_huellas(conn)
+    conn.execute(f'DELETE FROM "{FINGERPRINT_TABLE}" WHERE tabla = ?', (table,))
+    _insertar_huellas(conn, table, df.index, huellas)
+    _registrar_set(conn, table, huellas["columnas"])
+
+def _set_huellas(conn, table: str):
+    """(columnas, ficha) registradas para la tabla, o None si no hay huellas."""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FINGERPRINT_SETS,)
+    ).fetchone()
+    if not existe:
+        return None
+    # SELECT * tolera bases previas a la columna ficha (aún sin migrar)
+    fila = conn.execute(f'SELECT * FROM "{FINGERPRINT_SETS}" WHERE tabla = ?', (table,)).fetchone()
+    return (json.loads(fila[1]), fila[3] if len(fila) > 3 else None) if fila else None
+
+def fingerprints_current(conn, table: str) -> bool:
+    """
+    True si la tabla tiene huellas y su ficha (_ficha_tabla) coincide con la
+    guardada al escribirlas: nadie la editó fuera del pipeline desde entonces.
+    """
+    registrado = _set_huellas(conn, table)
+    return registrado is not None and registrado[1] == _ficha_tabla(conn, table)[1]
+
+def _avisar_desfasadas(table: str):
+    log(f"⚠️ Huellas de '{table}' desfasadas (la tabla cambió fuera del pipeline): no se usan.")
+
+def stored_fingerprints(conn, table: str):
+    """Huellas guardadas de la tabla (DataFrame rid, clave, fila) o None si no tiene o están desfasadas."""
+    if _set_huellas(conn, table) is None:
+        return None
+    if not fingerprints_current(conn, table):
+        _avisar_desfasadas(table)
+        return None
+    return pd.read_sql_query(
+        f'SELECT rid, clave, fila FROM "{FINGERPRINT_TABLE}" WHERE tabla = ?', conn, params=(table,)
+    )
+
+def pair_fingerprints(previas, huellas: dict):
+    """
+    Empareja, para un reemplazo completo, las filas guardadas (previas, de
+    stored_fingerprints) con las de la versión nueva (rowids 1..n en el orden
+    de huellas): filas idénticas = mismas huellas, como multiconjunto.
+    Retorna {bajas: rids viejos sin pareja, altas: rids nuevos sin pareja,
+    movidas: (rid viejo, rid nuevo) de filas iguales cuyo rowid cambia},
+    o None si no hay huellas previas.
+    """
+    if previas is None:
+        return None
+    antes = pd.DataFrame({
+        "clave": previas["clave"].astype("int64"), "fila": previas["fila"].astype("int64"),
+        "rid": previas["rid"].astype("int64"),
+    })
+    despues = pd.DataFrame({
+        "clave": huellas["clave"].view(np.int64), "fila": huellas["fila"].view(np.int64),
+        "nuevo": np.arange(1, len(huellas["clave"]) + 1),
+    })
+    for df in (antes, despues):
+        df["n"] = df.groupby(["clave", "fila"]).cumcount()
+    pares = antes.merge(despues, on=["clave", "fila", "n"], how="outer", indicator=True)
+    iguales = pares[(pares["_merge"] == "both") & (pares["rid"] != pares["nuevo"])]
+    return {
+        "bajas": pares.loc[pares["_merge"] == "left_only", "rid"].to_numpy(np.int64),
+        "altas": pares.loc[pares["_merge"] == "right_only", "nuevo"].to_numpy(np.int64),
+        "movidas": (iguales["rid"].to_numpy(np.int64), iguales["nuevo"].to_numpy(np.int64)),
+    }
+
+def _filas_por_rowid(conn, table: str, rids) -> pd.DataFrame:
+    """Solo las filas pedidas de la tabla (índice = rowid)."""
+    df = pd.read_sql_query(
+        f'SELECT rowid AS "{IDX}", * FROM "{table}" WHERE rowid IN (SELECT value FROM json_each(?))',
+        conn, params=(json.dumps([int(r) for r in rids]),), index_col=IDX
+    )
+    df.index.name = None
+    return _tipar(conn, table, df)
+
+def _comparar_huellas(conn, table: str, df_new: pd.DataFrame):
+    """
+    Variante de _comparar que no carga la tabla guardada: cruza las huellas de
+    df_new con las persistidas (operaciones de conjunto sobre enteros) y solo
+    lee de SQLite las filas eliminadas y modificadas. Mismo resultado que
+    _comparar. Retorna None si no aplica (sin huellas, otro esquema, huellas
+    desfasadas por ediciones fuera del pipeline o sin claves): el llamador
+    usa _comparar.
+    """
+    registrado = _set_huellas(conn, table)
+    if registrado is None:
+        return None
+    if registrado[0] != [_normalize_name(c) for c in df_new.columns]:
+        return None
+    if not fingerprints_current(conn, table):
+        _avisar_desfasadas(table)
+        return None
+
+    nuevas = row_fingerprints(df_new)
+    keys = nuevas["claves"]
+    if not keys:
+        return None
+    viejas = pd.read_sql_query(
+        f'SELECT rid, clave, fila FROM "{FINGERPRINT_TABLE}" WHERE tabla = ? ORDER BY rid', conn, params=(table,)
+    )
+    clave_old = viejas["clave"].to_numpy(dtype=np.int64).view(np.uint64)
+    fila_old = viejas["fila"].to_numpy(dtype=np.int64).view(np.uint64)
+    rid = viejas["rid"].to_numpy()
+
+    # Mismo emparejamiento que _comparar, solo sobre enteros
+    pos_new, pos_old, solo_new, solo_old = _emparejar(nuevas["clave"], nuevas["fila"], clave_old, fila_old)
+    return _resultado(conn, table, df_new, keys, pos_new, rid[pos_old], solo_new, rid[solo_old])
+
+def _resultado(conn, table: str, df_new: pd.DataFrame, keys: list, pos_new, mod_old, solo_new, eli_old) -> dict:
+    """
+    Arma el resultado de _comparar a partir del emparejamiento (posiciones en
+    df_new, rowids en la tabla) leyendo de SQLite solo las filas eliminadas y
+    las parejas candidatas a modificadas.
+    """
+    def _normalizadas(df):
+        n = coerce_types(normalize_columns(df))
+        n[IDX] = df.index
+        return n.reset_index(drop=True)
+
+    mod_new = df_new.index[pos_new]
+    df_old = _filas_por_rowid(conn, table, np.concatenate([eli_old, mod_old]))
+    nuevos = _normalizadas(df_new.iloc[solo_new])
+    eliminados = _normalizadas(df_old.loc[eli_old])
+
+    # Pareja con fila distinta = candidato; la comparación por columnas decide (tolerancia en montos)
+    candidatos = _alinear(_normalizadas(df_new.loc[mod_new]), _normalizadas(df_old.loc[mod_old]), keys)
+    non_key_cols = [c for c in (_normalize_name(c) for c in df_new.columns) if c not in keys]
+    modificados, celdas = _filtrar_modificados(candidatos, df_new, df_old, non_key_cols)
+
+    return {
+        "nuevos": nuevos, "eliminados": eliminados, "modificados": modificados,
+        "celdas": celdas, "claves": keys
+    }
+
+# ---------- Diff en SQLite ----------
+# La hoja nueva se carga en una tabla TEMP con el mismo esquema tipado y el
+# emparejamiento de _emparejar se resuelve en SQL: los grupos (clave, fila)
+# con igual cantidad en ambos lados quedan emparejados con un GROUP BY, y
+# solo las filas de los grupos descuadrados se numeran y cruzan por clave
+# (LEFT JOIN sobre índices). A Python vuelven solo los rowids de las filas
+# que difieren; la tabla guardada no se carga.
+def _temp(nombre: str) -> str:
+    return f"{INTERNAL_PREFIX}diff_{nombre}"
+
+DIFF_STAGE = _temp("hoja")
+_BLOQUE_STAGE = 20_000  # filas por executemany al cargar la hoja (acota la memoria)
+_DIFF_TEMP = [DIFF_STAGE] + [_temp(n) for n in ("firmas", "grupos", "libres")]
+
+def _clave_sql(columna: str, real: str, tipo: str) -> str:
+    """Expresión SQL equivalente a coerce_types para una columna clave (fechas ISO del reader)."""
+    if "fecha" in columna:
+        return f'date("{real}")'
+    if columna.startswith("monto") or tipo in ("REAL", "INTEGER"):
+        return f"""CASE WHEN typeof("{real}") IN ('integer', 'real') THEN round("{real}", 2) END"""
+    return f'trim("{real}")'
+
+def _emparejar_sql(conn, table: str, firma_k: str, firma_f: str) -> list:
+    """
+    _emparejar dentro de SQLite entre DIFF_STAGE (lado 0) y la tabla guardada
+    (lado 1). Retorna [(rid_nueva, rid_vieja)] de las filas sin pareja
+    idéntica (rid_vieja None = nueva; rid_nueva None = eliminada). En la
+    hoja, rid = posición + 1.
+    """
+    firmas, grupos, libres = _temp("firmas"), _temp("grupos"), _temp("libres")
+    conn.execute(f"""
+        CREATE TEMP TABLE "{firmas}" AS
+        SELECT 0 AS lado, rowid AS rid, json_array({firma_k}) AS k, json_array({firma_f}) AS f FROM temp."{DIFF_STAGE}"
+        UNION ALL
+        SELECT 1, rowid, json_array({firma_k}), json_array({firma_f}) FROM main."{table}"
+    """)
+
+    # 1) Filas idénticas: en cada grupo (k, f) se emparejan las primeras
+    #    min(n0, n1) apariciones de cada lado; solo los grupos descuadrados dejan filas libres.
+    conn.execute(f"""
+        CREATE TEMP TABLE "{grupos}" AS
+        SELECT k, f, SUM(lado = 0) AS n0, SUM(lado = 1) AS n1 FROM "{firmas}"
+        GROUP BY k, f HAVING n0 != n1
+    """)
+    conn.execute(f'CREATE INDEX temp."{grupos}__kf" ON "{grupos}" (k, f)')
+    conn.execute(f"""
+        CREATE TEMP TABLE "{libres}" AS
+        SELECT lado, rid, k FROM (
+            SELECT s.lado, s.rid, s.k, MIN(g.n0, g.n1) AS iguales,
+                   ROW_NUMBER() OVER (PARTITION BY s.k, s.f, s.lado ORDER BY s.rid) AS occ
+            FROM "{firmas}" s CROSS JOIN "{grupos}" g ON g.k = s.k AND g.f = s.f
+        ) WHERE occ > iguales
+    """)
+
+    # 2) El resto, por aparición dentro de k: pareja = candidata a modificada
+    return conn.execute(f"""
+        WITH n AS (SELECT rid, k, ROW_NUMBER() OVER (PARTITION BY k ORDER BY rid) AS occ FROM "{libres}" WHERE lado = 0),
+             o AS (SELECT rid, k, ROW_NUMBER() OVER (PARTITION BY k ORDER BY rid) AS occ FROM "{libres}" WHERE lado = 1)
+        SELECT n.rid, o.rid FROM n LEFT JOIN o ON o.k = n.k AND o.occ = n.occ
+        UNION ALL
+        SELECT NULL, o.rid FROM o LEFT JOIN n ON n.k = o.k AND n.occ = o.occ
+        WHERE n.rid IS NULL
+    """).fetchall()
+
+def _comparar_sql(conn, table: str, df_new: pd.DataFrame):
+    """
+    Variante de _comparar resuelta dentro de SQLite contra la tabla guardada.
+    Firmas por fila: json_array de las claves normalizadas (k) y de los valores
+    no clave tal como se guardan (f). Solo crea tablas TEMP, así que sirve con
+    un lector del pool. Retorna None si no aplica (tabla inexistente, otro
+    esquema o sin claves): el llamador usa _comparar.
+    """
+    info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    columnas = [_normalize_name(c) for c in df_new.columns]
+    if [_normalize_name(f[1]) for f in info] != columnas:
+        return None
+    keys = get_keys_for_sheet(sorted(set(columnas)))
+    if not keys:
+        return None
+
+    reales = {_normalize_name(f[1]): (f[1], f[2]) for f in info}
+    firma_k = ", ".join(_clave_sql(c, *reales[c]) for c in keys)
+    firma_f = ", ".join(f'"{reales[c][0]}"' for c in columnas if c not in keys)
+
+    solo_lectura = conn.execute("PRAGMA query_only").fetchone()[0]
+    conn.execute("PRAGMA query_only=OFF")
+    try:
+        with transaction(conn, "diff_sql"):
+            conn.execute(create_table_sql(DIFF_STAGE, column_types(conn, table, df_new), temporal=True))
+            for i in range(0, len(df_new), _BLOQUE_STAGE):
+                insert_rows(conn, DIFF_STAGE, df_new.columns, dataframe_rows(df_new.iloc[i:i + _BLOQUE_STAGE]))
+            filas = _emparejar_sql(conn, table, firma_k, firma_f)
+            for nombre in _DIFF_TEMP:
+                conn.execute(f'DROP TABLE temp."{nombre}"')
+    finally:
+        conn.execute(f"PRAGMA query_only={solo_lectura}")
+
+    # Mismo orden que _emparejar: nuevas y parejas por posición en la hoja, eliminadas por rowid
+    filas.sort(key=lambda f: (f[0] is None, f[0] or 0, f[1] or 0))
+    pares = np.array([f for f in filas if None not in f], dtype=np.int64).reshape(-1, 2)
+    solo_new = np.array([f[0] - 1 for f in filas if f[1] is None], dtype=np.int64)
+    eli_old = np.array([f[1] for f in filas if f[0] is None], dtype=np.int64)
+    return _resultado(conn, table, df_new, keys, pares[:, 0] - 1, pares[:, 1], solo_new, eli_old)
+
+# ---------- Resumen compacto ----------
+# Cada entrada del resumen guarda solo identificadores y celdas cambiadas
+# (arrays en columnas), no copias de filas: IDX de la hoja para nuevos,
+# rowid para eliminados y ambos para modificados. materialize_changes arma
+# los DataFrames a pedido.
+_VACIO = np.array([], dtype=np.int64)
+
+def _sin_cambios(tabla: str = None):
+    return {
+        "nuevos": 0, "eliminados": 0, "modificados": 0, "tabla": tabla,
+        "nuevos_idx": _VACIO, "eliminados_rid": _VACIO, "modificados_idx": _VACIO, "modificados_rid": _VACIO,
+        "celdas": _sin_celdas(), "claves": [], "delta": False, "columnas_cambiadas": {}
+    }
+
+def detect_sheet_changes(hoja: str, df_new: pd.DataFrame, conn=None):
+    """
+    Compara una hoja del reader con su tabla SQLite (mismo nombre que usa
+    db_utils al guardarla). Retorna la entrada del resumen o None si se omite.
+    - conn: conexión compartida (pipeline); None = conexión propia.
+    - delta: True si los conjuntos se pueden aplicar fila a fila (hay claves;
+      cada fila tiene a lo sumo una pareja).
+    - nuevos_idx / modificados_idx: índice de la hoja; eliminados_rid /
+      modificados_rid: rowid de la tabla; celdas: ver _filtrar_modificados.
+    """
+    table_name = sanitize_table_name(hoja)
+    if table_name in OMITIR_HOJAS:
+        return None
+
+    motor = {"fingerprint": _comparar_huellas, "sql": _comparar_sql}.get(DIFF_ENGINE)
+    if motor is not None:
+        with (reader() if conn is None else nullcontext(conn)) as c:
+            r = motor(c, table_name, df_new)
+        if r is not None:
+            return _entrada(hoja, r)
+
+    df_old = load_table_from_db(table_name, conn, rowid=True)
+    if df_old.empty:
+        # Consideramos todo como nuevo si no existe tabla previa
+        log(f"🆕 Tabla '{table_name}' no existía. Todo se considera NUEVO: {len(df_new)} filas.")
+        return {
+            **_sin_cambios(table_name),
+            "nuevos": len(df_new), "nuevos_idx": df_new.index.to_numpy()
         }
-        log(f"🔍 Hoja '{hoja}' → +{len(nuevos)} nuevos, -{len(eliminados)} eliminados, ✏️ {len(modificados)} modificados.")
 
+    return _entrada(hoja, _comparar(df_old, df_new))
+
+def _entrada(hoja: str, r: dict) -> dict:
+    """Entrada compacta del resumen a partir del resultado de _comparar / _comparar_huellas."""
+    nuevos, eliminados, modificados = r["nuevos"], r["eliminados"], r["modificados"]
+    log(f"🔍 Hoja '{hoja}' → +{len(nuevos)} nuevos, -{len(eliminados)} eliminados, ✏️ {len(modificados)} modificados.")
+    columnas = {}
+    if len(modificados):
+        columnas = pd.Series([c for t in modificados[CAMBIOS] for c in t]).value_counts().to_dict()
+        log(f"   ✏️ Columnas modificadas: {', '.join(f'{c} ({n})' for c, n in columnas.items())}")
+
+    def _ids(df, col, dtype=None):
+        return df[col].to_numpy(dtype=dtype) if len(df) else _VACIO
+
+    return {
+        "nuevos": len(nuevos), "eliminados": len(eliminados), "modificados": len(modificados),
+        "tabla": sanitize_table_name(hoja),
+        "nuevos_idx": _ids(nuevos, IDX), "eliminados_rid": _ids(eliminados, IDX, np.int64),
+        "modificados_idx": _ids(modificados, f"{IDX}_new"),
+        "modificados_rid": _ids(modificados, f"{IDX}_old", np.int64),
+        "celdas": r["celdas"], "claves": r["claves"], "delta": bool(r["claves"]),
+        "columnas_cambiadas": columnas
+    }
+
+def _modificados_df(celdas: dict) -> pd.DataFrame:
+    """Filas modificadas en formato ancho: IDX_new, IDX_old, <col>_new / <col>_old y CAMBIOS."""
+    if not len(celdas["idx"]):
+        return pd.DataFrame(columns=[f"{IDX}_new", f"{IDX}_old", CAMBIOS])
+
+    largo = pd.DataFrame({
+        f"{IDX}_new": celdas["idx"], f"{IDX}_old": celdas["rid"],
+        "columna": np.array(celdas["columnas"], dtype=object)[celdas["columna"]],
+        "new": celdas["despues"], "old": celdas["antes"],
+    })
+    filas = [f"{IDX}_new", f"{IDX}_old"]
+    ancho = largo.pivot(index=filas, columns="columna", values=["new", "old"])
+    usadas = [c for c in celdas["columnas"] if c in set(largo["columna"])]
+    ancho = ancho[[(lado, c) for c in usadas for lado in ("new", "old")]]
+    ancho.columns = [f"{c}_{lado}" for lado, c in ancho.columns]
+    ancho[CAMBIOS] = largo.groupby(filas)["columna"].agg(tuple)
+    return ancho.reset_index()
+
+def materialize_changes(entrada: dict, tipo: str, df_new: pd.DataFrame = None, conn=None) -> pd.DataFrame:
+    """
+    Arma a pedido el DataFrame de un tipo de cambio de una entrada del resumen:
+    - "modificados": desde las celdas (no necesita nada más).
+    - "nuevos": filas de df_new (la hoja comparada).
+    - "eliminados": filas de la tabla por rowid (conn o un lector del pool);
+      solo tiene sentido antes de aplicar los cambios.
+    """
+    if tipo == "modificados":
+        return _modificados_df(entrada["celdas"])
+    if tipo == "nuevos":
+        if df_new is None:
+            raise ValueError("materialize_changes('nuevos') necesita df_new")
+        return df_new.loc[entrada["nuevos_idx"]]
+    if tipo == "eliminados":
+        if not len(entrada["eliminados_rid"]):
+            return pd.DataFrame()
+        with (reader() if conn is None else nullcontext(conn)) as c:
+            return _filas_por_rowid(c, entrada["tabla"], entrada["eliminados_rid"])
+    raise ValueError(f"Tipo de cambio desconocido: {tipo}")
+
+def _comparar_hoja(hoja: str, df_new: pd.DataFrame):
+    """Compara una hoja con su propio lector del pool. Retorna (entrada, segundos)."""
+    inicio = time.perf_counter()
+    entrada = detect_sheet_changes(hoja, df_new)
+    return entrada, time.perf_counter() - inicio
+
+def _comparar_en_paralelo(pares, workers: int):
+    """
+    Genera (hoja, entrada, segundos) en el orden de `pares`, comparando en un
+    ProcessPoolExecutor. Cada proceso abre sus lectores (solo lectura); hay
+    como máximo 2 × workers hojas enviadas a la vez para acotar la memoria.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pendientes = deque()
+        for hoja, df_new in pares:
+            pendientes.append((hoja, pool.submit(_comparar_hoja, hoja, df_new)))
+            if len(pendientes) >= 2 * workers:
+                hoja, futuro = pendientes.popleft()
+                yield hoja, *futuro.result()
+        while pendientes:
+            hoja, futuro = pendientes.popleft()
+            yield hoja, *futuro.result()
+
+def detect_changes(new_data, sin_cambios=None, workers=None):
+    """
+    Recorre todos los DataFrames del reader y compara con las tablas SQLite.
+    - new_data: dict {hoja: DataFrame} o iterable de pares (hoja, DataFrame),
+      p. ej. reader.iter_sheets(); cada hoja se compara y se suelta.
+    - sin_cambios: hojas que el reader marcó como idénticas a la última lectura
+      (huella de contenido); se registran con 0 cambios sin cargar su tabla.
+    - workers: procesos para comparar hojas en paralelo (por defecto
+      COMPARATOR_WORKERS del .env; 1 = secuencial). El resumen sale en el
+      mismo orden que new_data en ambos casos.
+    Retorna resumen {hoja: entrada compacta} (ver detect_sheet_changes y materialize_changes)
+    """
+    workers = COMPARATOR_WORKERS if workers is None else workers
+    summary = {hoja: _sin_cambios() for hoja in sin_cambios or []}
+    if sin_cambios:
+        log(f"⏭️ {len(sin_cambios)} hojas sin cambios en el Excel. Se omite su comparación.")
+
+    pares = new_data.items() if isinstance(new_data, dict) else new_data
+    if workers > 1:
+        log(f"⚙️ Comparación paralela en {workers} procesos.")
+        resultados = _comparar_en_paralelo(pares, workers)
+    else:
+        resultados = ((hoja, *_comparar_hoja(hoja, df_new)) for hoja, df_new in pares)
+
+    inicio, comparadas = time.perf_counter(), 0
+    for hoja, entrada, segundos in resultados:
+        log(f"⏱️ Hoja '{hoja}' comparada en {segundos:.2f}s.")
+        comparadas += 1
+        if entrada is not None:
+            summary[hoja] = entrada
+
+    if comparadas:
+        log(f"⏱️ {comparadas} hojas comparadas en {time.perf_counter() - inicio:.2f}s.")
     return summary
 
 if __name__ == "__main__":
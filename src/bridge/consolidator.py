@@ -1,32 +1,61 @@
 # src/bridge/consolidator.py
 # ==========================================================
 # DataPulse v3.9 – Consolidator Engine (Estable)
-# Crea vistas resumen por cada tabla + vista global consolidada.
+# Mantiene el resumen por (fuente, portafolio, responsable) como tabla
+# real e indexada, recalculando solo los grupos que tocaron las filas
+# cambiadas en la última sincronización, y expone las vistas resumen por
+# tabla + la vista global consolidada (v_reporte_bancos) sobre ella.
+# El esquema de cada tabla se inspecciona una vez y se guarda por hash:
+# solo las tablas que cumplen tienen vista (con mapeo explícito de
+# columnas) y solo se reconstruyen las de tablas cuyo esquema cambió.
 # ==========================================================
 import sys
-import sqlite3
 from pathlib import Path
 
 # === FIX DE RUTA GLOBAL ===
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
+import json
+import hashlib
+from datetime import datetime
 from core.logger import log
+from core.config import DB_PATH
+from core.db_utils import INTERNAL_PREFIX, writer, is_internal_table, transaction
+from bridge.comparator import _normalize_name
 
 # ==========================================================
 # CONFIGURACIÓN BASE
 # ==========================================================
-# Detecta ruta de la base desde .env o usa valor por defecto
-try:
-    from core.config import DATABASE_URL
-    DB_PATH = Path(DATABASE_URL or "db/datapulse.sqlite")
-except Exception:
-    DB_PATH = Path("db/datapulse.sqlite")
-
 EXCLUDE_TABLES = {
     "clientes_proveedores", "sqlite_sequence",
     "reporte_bancos", "v_reporte_bancos"
 }
 
+# Resumen materializado: una fila por (fuente, portafolio, responsable)
+REPORT_TABLE = f"{INTERNAL_PREFIX}reporte_bancos"
+MASTER_VIEW = "v_reporte_bancos"
+# Grupos por recalcular: el updater los marca en la misma transacción que los datos
+PENDING_TABLE = f"{INTERNAL_PREFIX}summary_pending"
+# Tablas ya resumidas con el hash de su esquema y su mapeo de columnas
+# (una tabla nueva o con esquema distinto se resume completa)
+SOURCES_TABLE = f"{INTERNAL_PREFIX}summary_sources"
+
+# Columna lógica del resumen → nombres normalizados aceptados (gana el primero presente)
+SUMMARY_COLUMNS = {
+    "portafolio": ("portafolio",),
+    "responsable": ("responsable",),
+    "fecha": ("fecha",),
+    "tipo_mov": ("tipo_mov", "tipo_movimiento"),
+    "abono": ("abono",),
+    "retiro": ("retiro",),
+    "saldo": ("saldo",),
+}
+
+REPORT_COLUMNS = [
+    "portafolio", "responsable", "fecha_inicio", "fecha_fin",
+    "total_ingresos", "total_egresos", "saldo_final", "fuente",
+]
+
 # ==========================================================
 # FUNCIONES AUXILIARES
 # ==========================================================
@@ -34,80 +63,273 @@ def get_tables(conn):
     """Obtiene todas las tablas SQLite excluyendo las auxiliares."""
     cur = conn.cursor()
     cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [t[0] for t in cur.fetchall() if t[0] not in EXCLUDE_TABLES]
+    tables = [t[0] for t in cur.fetchall() if t[0] not in EXCLUDE_TABLES and not is_internal_table(t[0])]
     return sorted(tables)
 
 
-def create_summary_view(conn, table):
-    """Crea o reemplaza una vista resumen para una tabla dada."""
-    view_name = f"v_{table}_resumen"
-
-    sql = f"""
-    CREATE VIEW IF NOT EXISTS {view_name} AS
-    SELECT
-        portafolio,
-        responsable,
-        MIN(fecha) AS fecha_inicio,
-        MAX(fecha) AS fecha_fin,
-        SUM(CASE WHEN tipo_mov='INGRESO' THEN abono ELSE 0 END) AS total_ingresos,
-        SUM(CASE WHEN tipo_mov='EGRESO' THEN retiro ELSE 0 END) AS total_egresos,
-        MAX(saldo) AS saldo_final,
-        '{table}' AS fuente
-    FROM {table}
-    WHERE saldo IS NOT NULL
-    GROUP BY portafolio, responsable;
+# ==========================================================
+# ESQUEMAS (HASH + MAPEO DE COLUMNAS)
+# ==========================================================
+# Mapeo ya resuelto por hash de esquema (None = la tabla no cumple)
+_MAPEOS = {}
+
+
+def _esquemas(conn, table=None) -> dict:
     """
+    Lee en una sola consulta las columnas (nombre, tipo) de las tablas
+    candidatas (o solo de table) y retorna {tabla: (hash, mapeo)}.
+    """
+    filtro, params = ("AND m.name = ?", (table,)) if table else ("", ())
+    columnas = {}
+    for tabla, nombre, tipo in conn.execute(
+        "SELECT m.name, p.name, p.type FROM sqlite_master AS m, pragma_table_info(m.name) AS p "
+        f"WHERE m.type = 'table' {filtro} ORDER BY m.name, p.cid", params
+    ):
+        if tabla not in EXCLUDE_TABLES and not is_internal_table(tabla):
+            columnas.setdefault(tabla, []).append((nombre, tipo.upper()))
+
+    esquemas = {}
+    for tabla, cols in columnas.items():
+        firma = hashlib.blake2b(json.dumps(cols).encode("utf-8"), digest_size=16).hexdigest()
+        if firma not in _MAPEOS:
+            _MAPEOS[firma] = _mapear([nombre for nombre, _ in cols])
+        esquemas[tabla] = (firma, _MAPEOS[firma])
+    return esquemas
+
 
+def _mapear(columnas) -> dict:
+    """Columna lógica → columna real de la tabla; None si falta alguna."""
+    normalizadas = {}
+    for c in columnas:
+        normalizadas.setdefault(_normalize_name(c), c)
+    mapeo = {}
+    for logica, aceptadas in SUMMARY_COLUMNS.items():
+        real = next((normalizadas[a] for a in aceptadas if a in normalizadas), None)
+        if real is None:
+            return None
+        mapeo[logica] = real
+    return mapeo
+
+
+def _mapeo(conn, table):
+    return _esquemas(conn, table).get(table, (None, None))[1]
+
+
+def is_summary_source(conn, table) -> bool:
+    """La tabla se resume: no es auxiliar y tiene todas las columnas del resumen."""
+    return _mapeo(conn, table) is not None
+
+
+def _asegurar(conn):
+    # Columnas sin tipo declarado: guardan los valores tal cual (sin afinidad), así
+    # portafolio / responsable se comparan igual que en la tabla de origen
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{REPORT_TABLE}" ('
+        "portafolio, responsable, fecha_inicio, fecha_fin, "
+        "total_ingresos, total_egresos, saldo_final, fuente TEXT NOT NULL)"
+    )
+    conn.execute(
+        f'CREATE UNIQUE INDEX IF NOT EXISTS "{REPORT_TABLE}__grupo" '
+        f'ON "{REPORT_TABLE}" (fuente, portafolio, responsable)'
+    )
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{PENDING_TABLE}" ('
+        "fuente TEXT NOT NULL, portafolio, responsable)"
+    )
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{SOURCES_TABLE}" ('
+        "fuente TEXT PRIMARY KEY, actualizado TEXT NOT NULL, esquema TEXT, columnas TEXT)"
+    )
+    existentes = {fila[1] for fila in conn.execute(f'PRAGMA table_info("{SOURCES_TABLE}")')}
+    for columna in ("esquema", "columnas"):
+        if columna not in existentes:
+            conn.execute(f'ALTER TABLE "{SOURCES_TABLE}" ADD COLUMN {columna} TEXT')
+
+
+def _vista(conn, nombre: str, select: str) -> bool:
+    """Crea la vista o la reemplaza si su definición cambió. Retorna True si la escribió."""
+    sql = f'CREATE VIEW "{nombre}" AS {select}'
+    actual = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (nombre,)).fetchone()
+    if actual and actual[0] == sql:
+        return False
+    conn.execute(f'DROP VIEW IF EXISTS "{nombre}"')
     conn.execute(sql)
+    return True
+
+# ==========================================================
+# GRUPOS PENDIENTES (UPDATER)
+# ==========================================================
+def mark_groups(conn, table, rids=None, desde=None):
+    """
+    Marca para recalcular los grupos (portafolio, responsable) de las filas
+    dadas de la tabla, tal como están ahora: llamar antes de borrar o
+    modificar (grupos que dejan) y después de escribir (grupos que reciben).
+    - rids: rowids de las filas; desde: además las filas con rowid >= desde.
+    - Sin rids ni desde: todos los grupos de la tabla.
+    No confirma. Las tablas que no se resumen se ignoran.
+    """
+    if table in EXCLUDE_TABLES or is_internal_table(table):
+        return
+    m = _mapeo(conn, table)
+    if m is None:
+        return
+    _asegurar(conn)
+    insertar = (
+        f'INSERT INTO "{PENDING_TABLE}" (fuente, portafolio, responsable) '
+        f'SELECT DISTINCT ?, "{m["portafolio"]}", "{m["responsable"]}" FROM "{table}"'
+    )
+    if rids is None and desde is None:
+        conn.execute(insertar, (table,))
+        return
+    if rids is not None and len(rids):
+        conn.execute(f"{insertar} WHERE rowid IN (SELECT value FROM json_each(?))",
+                     (table, json.dumps([int(r) for r in rids])))
+    if desde is not None:
+        conn.execute(f"{insertar} WHERE rowid >= ?", (table, int(desde)))
+
+# ==========================================================
+# RESUMEN MATERIALIZADO
+# ==========================================================
+def _select(m: dict) -> str:
+    """Columnas del resumen (en el orden de REPORT_COLUMNS, sin fuente) según el mapeo."""
+    c = {logica: f't."{real}"' for logica, real in m.items()}
+    return f"""{c['portafolio']}, {c['responsable']},
+        MIN({c['fecha']}), MAX({c['fecha']}),
+        SUM(CASE WHEN {c['tipo_mov']} = 'INGRESO' THEN {c['abono']} ELSE 0 END),
+        SUM(CASE WHEN {c['tipo_mov']} = 'EGRESO' THEN {c['retiro']} ELSE 0 END),
+        MAX({c['saldo']})"""
+
+
+def _recalcular(conn, table, m: dict, completa: bool) -> int:
+    """
+    Reemplaza en el resumen las filas de los grupos pendientes de la tabla
+    (o todas si completa), leyendo sus columnas según el mapeo m. Los
+    grupos que ya no tienen filas desaparecen.
+    """
+    insertar = f'INSERT INTO "{REPORT_TABLE}" ({", ".join(REPORT_COLUMNS)}) '
+    grupo = f't."{m["portafolio"]}", t."{m["responsable"]}"'
+    if completa:
+        conn.execute(f'DELETE FROM "{REPORT_TABLE}" WHERE fuente = ?', (table,))
+        return conn.execute(
+            insertar + f"""
+            SELECT {_select(m)}, ?
+            FROM "{table}" AS t
+            WHERE t."{m['saldo']}" IS NOT NULL
+            GROUP BY {grupo}""",
+            (table,)
+        ).rowcount
+
+    conn.execute(
+        f'DELETE FROM "{REPORT_TABLE}" WHERE fuente = ? AND EXISTS ('
+        f'SELECT 1 FROM "{PENDING_TABLE}" AS p WHERE p.fuente = "{REPORT_TABLE}".fuente '
+        f'AND p.portafolio IS "{REPORT_TABLE}".portafolio AND p.responsable IS "{REPORT_TABLE}".responsable)',
+        (table,)
+    )
+    # CROSS JOIN: recorre los grupos pendientes y busca sus filas por índice (portafolio, responsable)
+    return conn.execute(
+        insertar + f"""
+        SELECT {_select(m)}, ?
+        FROM (SELECT DISTINCT portafolio, responsable FROM "{PENDING_TABLE}" WHERE fuente = ?) AS g
+        CROSS JOIN "{table}" AS t
+            ON t."{m['portafolio']}" IS g.portafolio AND t."{m['responsable']}" IS g.responsable
+        WHERE t."{m['saldo']}" IS NOT NULL
+        GROUP BY {grupo}""",
+        (table, table)
+    ).rowcount
+
+
+def summary_view(table) -> str:
+    return f"v_{table}_resumen"
+
+
+def create_summary_view(conn, table):
+    """Elimina y vuelve a crear la vista resumen de una tabla (sus filas del resumen materializado)."""
+    view_name = summary_view(table)
+    columnas = ", ".join(REPORT_COLUMNS)
+    conn.execute(f'DROP VIEW IF EXISTS "{view_name}"')
+    conn.execute(f"CREATE VIEW \"{view_name}\" AS SELECT {columnas} FROM \"{REPORT_TABLE}\" WHERE fuente = '{table}'")
     log(f"🧩 Vista resumen creada: {view_name}")
 
 
-def create_master_view(conn, views):
-    """Crea la vista consolidada global (v_reporte_bancos)."""
-    if not views:
-        log("⚠️ No hay vistas para consolidar. Proceso omitido.")
-        return
+def create_master_view(conn):
+    """Crea la vista consolidada global (v_reporte_bancos) sobre el resumen materializado."""
+    if _vista(conn, MASTER_VIEW, f'SELECT {", ".join(REPORT_COLUMNS)} FROM "{REPORT_TABLE}"'):
+        log(f"📊 Vista global consolidada creada: {MASTER_VIEW}")
+
 
-    union_sql = "\nUNION ALL\n".join([f"SELECT * FROM {v}" for v in views])
-    master_sql = f"""
-    CREATE VIEW IF NOT EXISTS v_reporte_bancos AS
-    {union_sql};
+def refresh_summaries(conn, completo: bool = False) -> int:
     """
+    Deja el resumen al día con la conexión de escritura del llamador:
+    - Tablas nuevas o con esquema distinto al guardado (o todas si completo):
+      se resumen completas y su vista se elimina y se vuelve a crear.
+    - Tablas con el mismo esquema: solo los grupos marcados por mark_groups.
+    - Tablas que ya no existen o dejaron de tener las columnas: salen del
+      resumen y pierden su vista (también las vistas resumen huérfanas).
+    Retorna los grupos recalculados.
+    """
+    with transaction(conn, "resumen"):
+        _asegurar(conn)
+        esquemas = _esquemas(conn)
+        fuentes = {t: (firma, m) for t, (firma, m) in esquemas.items() if m is not None}
+        registradas = dict(conn.execute(f'SELECT fuente, esquema FROM "{SOURCES_TABLE}"'))
+        pendientes = {f for (f,) in conn.execute(f'SELECT DISTINCT fuente FROM "{PENDING_TABLE}"')}
+        vistas = {v for (v,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'view' AND name GLOB 'v_*_resumen'"
+        )}
+
+        for fuente in sorted(set(registradas) - set(fuentes)):
+            conn.execute(f'DELETE FROM "{REPORT_TABLE}" WHERE fuente = ?', (fuente,))
+            conn.execute(f'DELETE FROM "{SOURCES_TABLE}" WHERE fuente = ?', (fuente,))
+        huerfanas = sorted(vistas - {summary_view(t) for t in fuentes})
+        for vista in huerfanas:
+            conn.execute(f'DROP VIEW IF EXISTS "{vista}"')
+        if huerfanas:
+            log(f"🗑️ {len(huerfanas)} vistas resumen eliminadas (tablas sin las columnas del resumen).")
+
+        grupos = completas = 0
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for table in sorted(fuentes):
+            firma, m = fuentes[table]
+            cambio = registradas.get(table) != firma
+            completa = completo or cambio
+            if not completa and table not in pendientes:
+                continue
+            grupos += _recalcular(conn, table, m, completa)
+            completas += completa
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{SOURCES_TABLE}" (fuente, actualizado, esquema, columnas) '
+                "VALUES (?, ?, ?, ?)", (table, ahora, firma, json.dumps(m))
+            )
+            if cambio or summary_view(table) not in vistas:
+                create_summary_view(conn, table)
 
-    conn.execute(master_sql)
-    log("📊 Vista global consolidada creada: v_reporte_bancos")
+        conn.execute(f'DELETE FROM "{PENDING_TABLE}"')
+        create_master_view(conn)
+
+    if grupos or completas:
+        log(f"📊 Resumen actualizado: {grupos} grupos recalculados ({completas} tablas completas).")
+    return grupos
 
 
 # ==========================================================
 # EJECUCIÓN PRINCIPAL
 # ==========================================================
-def main():
+def main(completo: bool = False):
     log("🚀 Iniciando consolidación de vistas resumen...")
 
     if not DB_PATH.exists():
         log(f"❌ No se encontró la base de datos: {DB_PATH}")
         return
 
-    conn = sqlite3.connect(DB_PATH)
     try:
-        tables = get_tables(conn)
-        if not tables:
-            log("⚠️ No se encontraron tablas para consolidar.")
-            return
-
-        views = []
-        for t in tables:
-            create_summary_view(conn, t)
-            views.append(f"v_{t}_resumen")
-
-        create_master_view(conn, views)
-        conn.commit()
-        log(f"✅ Consolidación completada con {len(views)} vistas generadas.")
+        with writer() as conn:
+            refresh_summaries(conn, completo)
+            filas = conn.execute(f'SELECT COUNT(*), COUNT(DISTINCT fuente) FROM "{REPORT_TABLE}"').fetchone()
+        log(f"✅ Consolidación completada: {filas[0]} grupos de {filas[1]} tablas en {MASTER_VIEW}.")
 
     except Exception as e:
         log(f"💥 Error durante la consolidación: {e}")
     finally:
-        conn.close()
         log("🏁 Consolidator finalizado correctamente.\n")
 
 
@@ -115,4 +337,4 @@ def main():
 # EJECUCIÓN DIRECTA
 # ==========================================================
 if __name__ == "__main__":
-    main()
+    main(completo="--completo" in sys.argv)
@@ -0,0 +1,225 @@
+# src/bridge/events.py
+# ==========================================================
+# DataPulse v4.0 – Registro de eventos de cambio
+# Cada corrida que aplica cambios (pipeline, sync completo o por bloques)
+# agrega al log append-only _dp_events un evento por fila escrita:
+# insert / update / delete, tabla, rowid, clave y corrida, en el orden en
+# que se aplicaron y en la misma transacción que los datos. Los
+# consumidores leen desde un offset (seq) que pueden guardar en la base
+# para retomar donde quedaron.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+from contextlib import nullcontext
+from datetime import datetime
+import pandas as pd
+from core.config import CHANGE_EVENTS
+from core.logger import log
+from core.db_utils import INTERNAL_PREFIX, reader, transaction, writer
+from bridge.comparator import _normalize_name, get_keys_for_sheet
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+EVENTS_TABLE = f"{INTERNAL_PREFIX}events"
+RUNS_TABLE = f"{INTERNAL_PREFIX}event_runs"
+OFFSETS_TABLE = f"{INTERNAL_PREFIX}event_offsets"
+
+# Claves de las filas de un reemplazo, tomadas antes de reescribir la tabla
+_PREVIAS = f"{INTERNAL_PREFIX}event_snapshot"
+
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+
+def _asegurar(conn):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{RUNS_TABLE}" ('
+        "corrida INTEGER PRIMARY KEY AUTOINCREMENT, inicio TEXT NOT NULL, "
+        "origen TEXT NOT NULL, desde INTEGER NOT NULL)"
+    )
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{EVENTS_TABLE}" ('
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, corrida INTEGER NOT NULL, tabla TEXT NOT NULL, "
+        "op TEXT NOT NULL, rid INTEGER NOT NULL, clave TEXT)"
+    )
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{OFFSETS_TABLE}" ('
+        "consumidor TEXT PRIMARY KEY, seq INTEGER NOT NULL, actualizado TEXT NOT NULL)"
+    )
+
+
+def _existe(conn, nombre: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nombre,)
+    ).fetchone() is not None
+
+
+def _clave_sql(conn, table: str) -> str:
+    """Expresión json_array con las columnas clave del comparator (NULL si la tabla no tiene)."""
+    columnas = {}
+    for fila in conn.execute(f'PRAGMA table_info("{table}")'):
+        columnas.setdefault(_normalize_name(fila[1]), fila[1])
+    claves = get_keys_for_sheet(sorted(columnas))
+    if not claves:
+        return "NULL"
+    return "json_array(" + ", ".join(f'"{columnas[k]}"' for k in claves) + ")"
+
+# ==========================================================
+# CORRIDAS
+# ==========================================================
+def open_run(conn, origen: str = "pipeline"):
+    """
+    Registra una corrida y retorna su id (None si CHANGE_EVENTS está apagado).
+    Guarda el último seq anterior (desde) para delimitar sus eventos.
+    """
+    if not CHANGE_EVENTS:
+        return None
+    with transaction(conn, "eventos"):
+        _asegurar(conn)
+        desde = conn.execute(f'SELECT COALESCE(MAX(seq), 0) FROM "{EVENTS_TABLE}"').fetchone()[0]
+        return conn.execute(
+            f'INSERT INTO "{RUNS_TABLE}" (inicio, origen, desde) VALUES (?, ?, ?)',
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), origen, desde)
+        ).lastrowid
+
+
+def close_run(conn, corrida):
+    """Resume en el log los eventos emitidos por la corrida."""
+    if corrida is None:
+        return
+    desde = conn.execute(f'SELECT desde FROM "{RUNS_TABLE}" WHERE corrida = ?', (corrida,)).fetchone()[0]
+    conteo = dict(conn.execute(
+        f'SELECT op, COUNT(*) FROM "{EVENTS_TABLE}" WHERE seq > ? AND corrida = ? GROUP BY op', (desde, corrida)
+    ))
+    if conteo:
+        log(f"🧾 Corrida {corrida}: {sum(conteo.values())} eventos "
+            f"({conteo.get(INSERT, 0)} insert, {conteo.get(UPDATE, 0)} update, {conteo.get(DELETE, 0)} delete).")
+
+# ==========================================================
+# EMISIÓN
+# ==========================================================
+def _emitir(conn, corrida, table: str, op: str, origen: str, rid: str, clave: str,
+            filtro: str = "", params=()) -> int:
+    """Un evento por fila de origen (que cumpla el filtro), en orden de rid."""
+    return conn.execute(
+        f'INSERT INTO "{EVENTS_TABLE}" (corrida, tabla, op, rid, clave) '
+        f"SELECT ?, ?, ?, {rid}, {clave} FROM {origen} {filtro} ORDER BY {rid}",
+        (corrida, table, op, *params)
+    ).rowcount
+
+
+def _en(rids, columna: str = "rowid") -> tuple:
+    return f"WHERE {columna} IN (SELECT value FROM json_each(?))", (json.dumps([int(r) for r in rids]),)
+
+
+def emit_deletes(conn, corrida, table: str, rids):
+    """Eventos delete de las filas que se van a borrar (leer antes del DELETE). No confirma."""
+    if corrida is None or not len(rids):
+        return
+    _emitir(conn, corrida, table, DELETE, f'"{table}"', "rowid", _clave_sql(conn, table), *_en(rids))
+
+
+def emit_delta(conn, corrida, table: str, cambios: dict, primer_rid: int):
+    """Eventos update e insert de un delta ya aplicado (nuevos desde primer_rid). No confirma."""
+    if corrida is None:
+        return
+    clave = _clave_sql(conn, table)
+    if len(cambios["modificados_rid"]):
+        _emitir(conn, corrida, table, UPDATE, f'"{table}"', "rowid", clave, *_en(cambios["modificados_rid"]))
+    if len(cambios["nuevos_idx"]):
+        _emitir(conn, corrida, table, INSERT, f'"{table}"', "rowid", clave, "WHERE rowid >= ?", (int(primer_rid),))
+
+
+def snapshot_keys(conn, corrida, table: str):
+    """
+    Antes de reemplazar una tabla completa: guarda rowid y clave de sus filas
+    en una tabla TEMP para emitir después los delete (emit_replace).
+    """
+    if corrida is None:
+        return
+    conn.execute(f'DROP TABLE IF EXISTS temp."{_PREVIAS}"')
+    if not _existe(conn, table):
+        return
+    conn.execute(
+        f'CREATE TEMP TABLE "{_PREVIAS}" AS SELECT rowid AS rid, {_clave_sql(conn, table)} AS clave FROM "{table}"'
+    )
+
+
+def emit_replace(conn, corrida, table: str, pares):
+    """
+    Eventos de un reemplazo completo según pares (comparator.pair_fingerprints):
+    delete de las bajas y insert de las altas; las filas iguales no emiten.
+    pares None (sin huellas previas) = delete de todas las filas previas e
+    insert de todas las nuevas. No confirma.
+    """
+    if corrida is None:
+        return
+    previas = conn.execute(
+        "SELECT 1 FROM temp.sqlite_master WHERE type = 'table' AND name = ?", (_PREVIAS,)
+    ).fetchone()
+    if previas:
+        filtro, params = _en(pares["bajas"], "rid") if pares is not None else ("", ())
+        _emitir(conn, corrida, table, DELETE, f'temp."{_PREVIAS}"', "rid", "clave", filtro, params)
+        conn.execute(f'DROP TABLE temp."{_PREVIAS}"')
+    filtro, params = _en(pares["altas"]) if pares is not None else ("", ())
+    _emitir(conn, corrida, table, INSERT, f'"{table}"', "rowid", _clave_sql(conn, table), filtro, params)
+
+# ==========================================================
+# CONSUMO
+# ==========================================================
+def read_events(desde: int = 0, limite: int = None, conn=None) -> pd.DataFrame:
+    """
+    Eventos con seq > desde en orden (seq, corrida, tabla, op, rid, clave);
+    clave = json con los valores de las columnas clave (None si la tabla no
+    tiene claves). rid es el rowid de la fila en la tabla tras el evento
+    (antes, en los delete); en un reemplazo completo las filas iguales
+    pueden cambiar de rowid sin evento. Para retomar, pasar el último seq
+    procesado.
+    """
+    with (reader() if conn is None else nullcontext(conn)) as conn:
+        if not _existe(conn, EVENTS_TABLE):
+            return pd.DataFrame(columns=["seq", "corrida", "tabla", "op", "rid", "clave"])
+        return pd.read_sql_query(
+            f'SELECT seq, corrida, tabla, op, rid, clave FROM "{EVENTS_TABLE}" WHERE seq > ? ORDER BY seq'
+            + (" LIMIT ?" if limite else ""),
+            conn, params=(desde, limite) if limite else (desde,)
+        )
+
+
+def get_offset(consumidor: str, conn=None) -> int:
+    """Último seq confirmado por el consumidor (0 = desde el principio)."""
+    with (reader() if conn is None else nullcontext(conn)) as conn:
+        if not _existe(conn, OFFSETS_TABLE):
+            return 0
+        fila = conn.execute(f'SELECT seq FROM "{OFFSETS_TABLE}" WHERE consumidor = ?', (consumidor,)).fetchone()
+    return fila[0] if fila else 0
+
+
+def commit_offset(consumidor: str, seq: int, conn=None):
+    """Guarda el offset del consumidor (nunca retrocede)."""
+    with (writer() if conn is None else nullcontext(conn)) as conn:
+        with transaction(conn, "offset"):
+            _asegurar(conn)
+            conn.execute(
+                f'INSERT INTO "{OFFSETS_TABLE}" (consumidor, seq, actualizado) VALUES (?, ?, ?) '
+                "ON CONFLICT (consumidor) DO UPDATE SET seq = MAX(seq, excluded.seq), actualizado = excluded.actualizado",
+                (consumidor, int(seq), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+
+def pending_events(consumidor: str, limite: int = None, conn=None) -> pd.DataFrame:
+    """Eventos posteriores al offset guardado del consumidor (confirmar con commit_offset)."""
+    return read_events(get_offset(consumidor, conn), limite, conn)
+
+
+if __name__ == "__main__":
+    consumidor = sys.argv[1] if len(sys.argv) > 1 else None
+    eventos = pending_events(consumidor) if consumidor else read_events()
+    print(eventos.to_string(max_rows=30))
+    if consumidor and not eventos.empty:
+        commit_offset(consumidor, int(eventos["seq"].iloc[-1]))
+        print(f"\n✅ Offset de '{consumidor}' → {eventos['seq'].iloc[-1]}")
@@ -0,0 +1,102 @@
+# src/bridge/fingerprint.py
+# ==========================================================
+# DataPulse v4.0 – Huellas de contenido (Manifest)
+# Detecta qué workbooks y hojas cambiaron desde la última lectura.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import re
+import json
+import hashlib
+from core.config import PROCESSED_PATH
+from core.logger import log
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+MANIFEST_PATH = PROCESSED_PATH / "manifest.json"
+
+# Subir cuando cambien las reglas de lectura/limpieza del reader:
+# invalida todas las huellas guardadas.
+READER_VERSION = 2
+
+# Referencias a shared strings dentro del XML de una hoja: <c ... t="s"><v>12</v>
+_SHARED_REF_RE = re.compile(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>')
+
+# ==========================================================
+# MANIFEST PERSISTENTE
+# ==========================================================
+def load_manifest() -> dict:
+    """Carga el manifest de la última lectura (vacío si no existe o es de otra versión)."""
+    try:
+        if MANIFEST_PATH.exists():
+            manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+            if manifest.get("version") == READER_VERSION:
+                return manifest
+            log("♻️ Manifest de otra versión del lector. Se recalculan todas las huellas.")
+    except Exception as e:
+        log(f"⚠️ No se pudo leer el manifest ({e}). Se recalculan todas las huellas.")
+    return {"version": READER_VERSION, "workbooks": {}}
+
+
+def save_manifest(manifest: dict):
+    """Guarda el manifest de forma atómica (archivo temporal + replace)."""
+    try:
+        MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = MANIFEST_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(MANIFEST_PATH)
+    except Exception as e:
+        log(f"⚠️ No se pudo guardar el manifest: {e}")
+
+# ==========================================================
+# HUELLAS
+# ==========================================================
+def file_signature(path: Path) -> dict:
+    """Tamaño y mtime del archivo (solo un stat)."""
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def content_hash(path: Path) -> str:
+    """Hash del contenido completo del archivo."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sheet_hashes(wb, hojas) -> dict:
+    """
+    Hash por hoja a partir del XML crudo de cada worksheet.
+    - Incluye los shared strings que la hoja referencia (el XML solo guarda índices).
+    - Incluye styles.xml: los formatos deciden qué números se leen como fecha.
+    """
+    archive = wb._archive
+    try:
+        styles = archive.read("xl/styles.xml")
+    except KeyError:
+        styles = b""
+
+    hashes = {}
+    for hoja in hojas:
+        ws = wb[hoja]
+        strings = ws._shared_strings  # en read_only el workbook no los expone
+        xml = archive.read(ws._worksheet_path)
+        h = hashlib.blake2b(styles, digest_size=16)
+        h.update(xml)
+        for idx in _SHARED_REF_RE.findall(xml):
+            h.update(str(strings[int(idx)]).encode("utf-8"))
+            h.update(b"\x00")
+        hashes[hoja] = h.hexdigest()
+    return hashes
+
+
+if __name__ == "__main__":
+    manifest = load_manifest()
+    print(f"\n🧾 Manifest: {MANIFEST_PATH}")
+    for key, entry in manifest["workbooks"].items():
+        print(f" • {key}: {Path(entry['path']).name} | {len(entry['hojas'])} hojas | {entry['hash']}")
@@ -0,0 +1,239 @@
+# src/bridge/history.py
+# ==========================================================
+# DataPulse v4.0 – Historial de versiones (SCD tipo 2)
+# Para las tablas de HISTORY_TABLES guarda cada versión de fila con su
+# intervalo de vigencia [valid_from, valid_to), alimentado por el diff del
+# comparator al aplicar los cambios (updater), y responde cómo estaba una
+# tabla en un instante: as_of() o la vista v_<tabla>_historial.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+from contextlib import nullcontext
+from datetime import date, datetime
+import pandas as pd
+from core.config import HISTORY_TABLES
+from core.logger import log
+from core.schema import create_table_sql
+from core.db_utils import (
+    INTERNAL_PREFIX, is_internal_table, reader, sanitize_table_name, transaction, writer
+)
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+HISTORY_PREFIX = f"{INTERNAL_PREFIX}hist_"
+
+# valid_to de la versión vigente: texto mayor que cualquier instante, así
+# "vigente en t" es siempre valid_from <= t < valid_to (sin NULL, usa el índice)
+ABIERTO = "9999-12-31 23:59:59"
+FORMATO = "%Y-%m-%d %H:%M:%S"
+INTERNAS = ["rid", "valid_from", "valid_to"]
+
+
+def history_table(table: str) -> str:
+    return f"{HISTORY_PREFIX}{table}"
+
+
+def history_view(table: str) -> str:
+    return f"v_{table}_historial"
+
+
+def history_enabled(table: str) -> bool:
+    """La tabla lleva historial según HISTORY_TABLES ('*' = todas las de hojas)."""
+    return not is_internal_table(table) and ("*" in HISTORY_TABLES or table in HISTORY_TABLES)
+
+
+def _existe(conn, nombre: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nombre,)
+    ).fetchone() is not None
+
+
+def _instante(momento) -> str:
+    """Texto comparable con valid_from / valid_to. Una fecha sola = al cierre de ese día."""
+    solo_fecha = (isinstance(momento, date) and not isinstance(momento, datetime)) or (
+        isinstance(momento, str) and len(momento.strip()) == 10
+    )
+    ts = pd.Timestamp(momento)
+    if solo_fecha:
+        ts += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return ts.strftime(FORMATO)
+
+# ==========================================================
+# TABLA DE HISTORIAL
+# ==========================================================
+def _asegurar(conn, table: str) -> tuple:
+    """
+    Crea la tabla de historial (columnas de la tabla + rid, valid_from,
+    valid_to), sus índices y la vista; si ya existe agrega las columnas
+    nuevas de la tabla. Retorna (columnas de la tabla, recién creada). No confirma.
+    - _dp_hist_<t>__vigencia (valid_to, valid_from): consultas por instante.
+    - _dp_hist_<t>__rid (rid, valid_to): cierre de la versión vigente de una fila.
+    """
+    tipos = {fila[1]: fila[2] for fila in conn.execute(f'PRAGMA table_info("{table}")')}
+    hist = history_table(table)
+    if _existe(conn, hist):
+        actuales = {fila[1] for fila in conn.execute(f'PRAGMA table_info("{hist}")')}
+        for c, t in tipos.items():
+            if c not in actuales:
+                conn.execute(f'ALTER TABLE "{hist}" ADD COLUMN "{c}" {t}')
+        return list(tipos), False
+
+    conn.execute(create_table_sql(hist, {
+        "rid": "INTEGER NOT NULL", "valid_from": "TEXT NOT NULL", "valid_to": "TEXT NOT NULL", **tipos,
+    }))
+    conn.execute(f'CREATE INDEX "{hist}__vigencia" ON "{hist}" (valid_to, valid_from)')
+    conn.execute(f'CREATE INDEX "{hist}__rid" ON "{hist}" (rid, valid_to)')
+    conn.execute(f'DROP VIEW IF EXISTS "{history_view(table)}"')
+    conn.execute(f'CREATE VIEW "{history_view(table)}" AS SELECT * FROM "{hist}"')
+    return list(tipos), True
+
+
+def _copiar(conn, table: str, columnas: list, desde: str, filtro: str = "", params=()) -> int:
+    """Abre versiones con las filas actuales de la tabla (todas o las del filtro)."""
+    lista = ", ".join(f'"{c}"' for c in columnas)
+    return conn.execute(
+        f'INSERT INTO "{history_table(table)}" (rid, valid_from, valid_to, {lista}) '
+        f'SELECT rowid, ?, ?, {lista} FROM "{table}" {filtro}',
+        (desde, ABIERTO, *params)
+    ).rowcount
+
+
+def _cerrar(conn, table: str, rids, hasta: str) -> int:
+    """Cierra en `hasta` las versiones vigentes de los rids dados (None = todas)."""
+    if rids is None:
+        return conn.execute(
+            f'UPDATE "{history_table(table)}" SET valid_to = ? WHERE valid_to = ?', (hasta, ABIERTO)
+        ).rowcount
+    return conn.execute(
+        f'UPDATE "{history_table(table)}" SET valid_to = ? '
+        "WHERE valid_to = ? AND rid IN (SELECT value FROM json_each(?))",
+        (hasta, ABIERTO, json.dumps([int(r) for r in rids]))
+    ).rowcount
+
+
+def _log(table: str, abiertas: int, cerradas: int):
+    if abiertas or cerradas:
+        log(f"🕰️ Historial '{table}': {abiertas} versiones nuevas, {cerradas} cerradas.")
+
+# ==========================================================
+# REGISTRO DE CAMBIOS
+# ==========================================================
+def record_delta(conn, table: str, cambios: dict, primer_rid: int):
+    """
+    Registra un delta ya aplicado (updater.apply_changes): cierra la versión
+    vigente de eliminados y modificados y abre versiones para modificados y
+    nuevos (rowids desde primer_rid), copiándolas de la tabla.
+    Si la tabla aún no tenía historial, lo inicia con su contenido actual. No confirma.
+    """
+    if not history_enabled(table):
+        return
+    columnas, creada = _asegurar(conn, table)
+    ahora = datetime.now().strftime(FORMATO)
+    if creada:
+        _log(table, _copiar(conn, table, columnas, ahora), 0)
+        return
+
+    modificados = cambios["modificados_rid"]
+    cerradas = _cerrar(conn, table, [*cambios["eliminados_rid"], *modificados], ahora)
+    abiertas = 0
+    if len(modificados):
+        abiertas += _copiar(conn, table, columnas, ahora, "WHERE rowid IN (SELECT value FROM json_each(?))",
+                            (json.dumps([int(r) for r in modificados]),))
+    if len(cambios["nuevos_idx"]):
+        abiertas += _copiar(conn, table, columnas, ahora, "WHERE rowid >= ?", (int(primer_rid),))
+    _log(table, abiertas, cerradas)
+
+
+def record_replace(conn, table: str, pares):
+    """
+    Registra un reemplazo completo según pares (comparator.pair_fingerprints):
+    las filas iguales a una versión vigente la conservan (con su rowid nuevo);
+    las versiones de las bajas se cierran y las altas abren versión.
+    pares None (sin huellas previas) = se cierra y abre todo. No confirma.
+    """
+    if not history_enabled(table):
+        return
+    columnas, creada = _asegurar(conn, table)
+    ahora = datetime.now().strftime(FORMATO)
+    if creada:
+        _log(table, _copiar(conn, table, columnas, ahora), 0)
+        return
+    if pares is None:
+        cerradas = _cerrar(conn, table, None, ahora)
+        _log(table, _copiar(conn, table, columnas, ahora), cerradas)
+        return
+
+    cerradas = _cerrar(conn, table, pares["bajas"], ahora)
+    # Renumerar en dos pasos (rid negativo) para no chocar con rids aún sin mover
+    hist = history_table(table)
+    conn.executemany(
+        f'UPDATE "{hist}" SET rid = ? WHERE rid = ? AND valid_to = ?',
+        ((-int(n), int(r), ABIERTO) for r, n in zip(*pares["movidas"]))
+    )
+    conn.execute(f'UPDATE "{hist}" SET rid = -rid WHERE rid < 0')
+    abiertas = 0
+    if len(pares["altas"]):
+        abiertas = _copiar(conn, table, columnas, ahora, "WHERE rowid IN (SELECT value FROM json_each(?))",
+                           (json.dumps(pares["altas"].tolist()),))
+    _log(table, abiertas, cerradas)
+
+
+def sync_history(conn) -> int:
+    """
+    Inicia el historial de las tablas de HISTORY_TABLES que aún no lo tienen
+    (versión inicial = contenido actual) y actualiza estadísticas con ANALYZE.
+    Retorna las tablas iniciadas. Usa la conexión de escritura del llamador.
+    """
+    if not HISTORY_TABLES:
+        return 0
+    iniciadas = 0
+    ahora = datetime.now().strftime(FORMATO)
+    with transaction(conn, "historial"):
+        tablas = [t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        for table in tablas:
+            if history_enabled(table) and not _existe(conn, history_table(table)):
+                columnas, _ = _asegurar(conn, table)
+                _copiar(conn, table, columnas, ahora)
+                conn.execute(f'ANALYZE "{history_table(table)}"')
+                iniciadas += 1
+    if iniciadas:
+        log(f"🕰️ Historial iniciado en {iniciadas} tablas.")
+    return iniciadas
+
+# ==========================================================
+# CONSULTA
+# ==========================================================
+def as_of(table: str, momento, conn=None) -> pd.DataFrame:
+    """
+    Contenido de la tabla (hoja o nombre de tabla) vigente en `momento`
+    (datetime, date, Timestamp o texto; una fecha sola = al cierre del día):
+    las versiones con valid_from <= momento < valid_to, en orden de rowid.
+    Usa el índice de vigencia. DataFrame vacío si la tabla no tiene historial.
+    Equivalente SQL:
+      SELECT * FROM v_<tabla>_historial WHERE valid_from <= :t AND valid_to > :t
+    """
+    table = sanitize_table_name(table)
+    instante = _instante(momento)
+    with (reader() if conn is None else nullcontext(conn)) as conn:
+        if not _existe(conn, history_table(table)):
+            log(f"⚠️ '{table}' no tiene historial (HISTORY_TABLES).")
+            return pd.DataFrame()
+        df = pd.read_sql_query(
+            f'SELECT * FROM "{history_view(table)}" WHERE valid_from <= ? AND valid_to > ? ORDER BY rid',
+            conn, params=(instante, instante)
+        )
+    return df.drop(columns=INTERNAS)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python bridge/history.py <tabla> <instante>")
+        sys.exit(1)
+    with writer() as conn:
+        sync_history(conn)
+    print(as_of(sys.argv[1], " ".join(sys.argv[2:])).to_string(max_rows=20))
@@ -0,0 +1,195 @@
+# src/bridge/indexer.py
+# ==========================================================
+# DataPulse v4.0 – Gestor de índices
+# Mantiene los índices de las tablas de hojas tras cada sincronización
+# (columnas de INDEX_COLUMNS, mes de la fecha y claves del comparator),
+# actualiza las estadísticas con ANALYZE y reporta qué consultas
+# generadas los usan según EXPLAIN QUERY PLAN.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from core.config import INDEX_COLUMNS
+from core.logger import log
+from core.db_utils import INTERNAL_PREFIX, is_internal_table, reader, transaction, writer
+from bridge.comparator import _normalize_name, get_keys_for_sheet
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+INDEX_PREFIX = f"{INTERNAL_PREFIX}ix_"
+
+# Filtro por mes que generan query_engine y natural_query: strftime('%m', fecha)
+COLUMNA_MES = "fecha"
+
+# ==========================================================
+# DEFINICIÓN DE ÍNDICES
+# ==========================================================
+def _columnas(conn, table: str) -> dict:
+    """{nombre normalizado: nombre real} de las columnas de la tabla."""
+    columnas = {}
+    for fila in conn.execute(f'PRAGMA table_info("{table}")'):
+        columnas.setdefault(_normalize_name(fila[1]), fila[1])
+    return columnas
+
+
+def _index_sql(table: str, sufijo: str, expresion: str) -> tuple:
+    nombre = f"{INDEX_PREFIX}{table}__{sufijo}"
+    return nombre, f'CREATE INDEX "{nombre}" ON "{table}" ({expresion})'
+
+
+def desired_indexes(conn, table: str) -> dict:
+    """
+    {nombre: CREATE INDEX} que corresponden hoy a la tabla:
+    - Una entrada por elemento de INDEX_COLUMNS presente ('a+b' = compuesto).
+    - strftime('%m', fecha) para los filtros por mes.
+    - Índice compuesto con las claves del comparator.
+    """
+    columnas = _columnas(conn, table)
+    deseados = {}
+
+    for entrada in INDEX_COLUMNS:
+        partes = [p.strip().lower() for p in entrada.split("+")]
+        if all(p in columnas for p in partes):
+            expresion = ", ".join(f'"{columnas[p]}"' for p in partes)
+            nombre, sql = _index_sql(table, "_".join(partes), expresion)
+            deseados[nombre] = sql
+
+    if COLUMNA_MES in columnas:
+        nombre, sql = _index_sql(table, f"{COLUMNA_MES}_mes", f"strftime('%m', \"{columnas[COLUMNA_MES]}\")")
+        deseados[nombre] = sql
+
+    claves = get_keys_for_sheet(sorted(columnas))
+    if claves:
+        nombre, sql = _index_sql(table, "claves", ", ".join(f'"{columnas[k]}"' for k in claves))
+        deseados[nombre] = sql
+
+    return deseados
+
+
+def ensure_indexes(conn, table: str) -> tuple:
+    """
+    Crea los índices que faltan y elimina los propios que ya no corresponden
+    (o cuya definición cambió). Los índices ajenos a DataPulse no se tocan.
+    Retorna (creados, eliminados). No confirma.
+    """
+    deseados = desired_indexes(conn, table)
+    actuales = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name LIKE ?",
+        (table, f"{INDEX_PREFIX}%"),
+    ))
+
+    eliminados = 0
+    for nombre, sql in actuales.items():
+        if deseados.get(nombre) != sql:
+            conn.execute(f'DROP INDEX "{nombre}"')
+            eliminados += 1
+
+    creados = 0
+    for nombre, sql in deseados.items():
+        if actuales.get(nombre) != sql:
+            conn.execute(sql)
+            creados += 1
+    return creados, eliminados
+
+
+def _tablas(conn) -> list:
+    filas = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+    return [t for (t,) in filas if not is_internal_table(t)]
+
+
+def sync_indexes(conn, cambiadas=None) -> int:
+    """
+    Revisa los índices de todas las tablas de hojas y ejecuta ANALYZE sobre las
+    que cambiaron (cambiadas; None = todas) o recibieron índices nuevos.
+    Retorna los índices creados. Usa la conexión de escritura del llamador.
+    """
+    creados = eliminados = 0
+    analizar = set()
+    with transaction(conn, "indices"):
+        for table in _tablas(conn):
+            c, e = ensure_indexes(conn, table)
+            creados += c
+            eliminados += e
+            if c or cambiadas is None or table in cambiadas:
+                analizar.add(table)
+
+        for table in sorted(analizar):
+            conn.execute(f'ANALYZE "{table}"')
+
+    if creados or eliminados or analizar:
+        log(f"🗂️ Índices: {creados} creados, {eliminados} eliminados | ANALYZE en {len(analizar)} tablas.")
+    return creados
+
+# ==========================================================
+# REPORTE (EXPLAIN QUERY PLAN)
+# ==========================================================
+def _consultas(conn, table: str) -> list:
+    """Consultas que DataPulse genera sobre la tabla: [(origen, sql, parámetros)]."""
+    columnas = _columnas(conn, table)
+    consultas = []
+
+    # query_engine / natural_query: agregado de montos filtrado por mes
+    monto = next((c for c in columnas.values() if any(m in c.lower() for m in ("monto", "importe", "total"))), None)
+    fecha = next((c for c in columnas.values() if "fecha" in c.lower()), None)
+    if monto and fecha:
+        consultas.append((
+            "query_engine",
+            f"SELECT SUM(\"{monto}\") AS resultado FROM '{table}' WHERE strftime('%m', \"{fecha}\") = '01';",
+            (),
+        ))
+
+    # consolidator: vista resumen por portafolio/responsable
+    vista = f"v_{table}_resumen"
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (vista,)).fetchone():
+        consultas.append(("consolidator", f"SELECT * FROM {vista};", ()))
+
+    # comparator: búsqueda por claves
+    claves = get_keys_for_sheet(sorted(columnas))
+    if claves:
+        filtro = " AND ".join(f'"{columnas[k]}" = ?' for k in claves)
+        consultas.append(("comparator", f"SELECT rowid FROM '{table}' WHERE {filtro};", (None,) * len(claves)))
+
+    return consultas
+
+
+def _usa_indice(plan) -> bool:
+    return any("USING INDEX" in d or "USING COVERING INDEX" in d or "PRIMARY KEY" in d for d in plan)
+
+
+def explain_report(conn=None) -> list:
+    """
+    Ejecuta EXPLAIN QUERY PLAN sobre las consultas generadas de cada tabla.
+    Retorna [{tabla, origen, sql, plan, indice}] y lo resume en el log.
+    """
+    if conn is None:
+        with reader() as conn:
+            return explain_report(conn)
+
+    reporte = []
+    for table in _tablas(conn):
+        for origen, sql, params in _consultas(conn, table):
+            try:
+                plan = [fila[-1] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except Exception as e:
+                plan = [f"error: {e}"]
+            reporte.append({
+                "tabla": table, "origen": origen, "sql": sql,
+                "plan": plan, "indice": _usa_indice(plan),
+            })
+
+    con_indice = sum(r["indice"] for r in reporte)
+    log(f"🔎 EXPLAIN QUERY PLAN: {con_indice}/{len(reporte)} consultas generadas usan índice.")
+    return reporte
+
+
+if __name__ == "__main__":
+    with writer() as conn:
+        sync_indexes(conn)
+    for r in explain_report():
+        marca = "✅" if r["indice"] else "⚠️" if r["plan"][0].startswith("error") else "🐢"
+        print(f"{marca} {r['tabla']} [{r['origen']}]")
+        for paso in r["plan"]:
+            print(f"      {paso}")
@@ -0,0 +1,138 @@
+# src/bridge/pipeline.py
+# ==========================================================
+# DataPulse v4.0 – Pipeline unificado
+# Etapas: lectura → diff → respaldo → aplicación → índices, con una sola conexión.
+# Cada workbook se parsea una vez y cada tabla se escribe como máximo una vez.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from core.config import DB_PATH, SQLITE_TRANSACTION
+from core.logger import log
+from core.db_utils import writer, sanitize_table_name, transaction
+from core.backup import create_backup, purge_old_backups
+from bridge.reader import planificar_lectura, iter_sheets, descartar_hoja
+from bridge.fingerprint import save_manifest
+from bridge.comparator import detect_changes, detect_sheet_changes, fingerprints_current, refresh_fingerprints
+from bridge.updater import apply_changes, motivo_reemplazo
+from bridge.indexer import sync_indexes
+from bridge.history import sync_history
+from bridge.events import open_run, close_run
+from bridge.consolidator import refresh_summaries
+
+# ==========================================================
+# ETAPAS
+# ==========================================================
+def _respaldar():
+    """Respaldo de la base antes de la primera escritura (estado previo a la ejecución)."""
+    log("💾 Creando respaldo antes de aplicar cambios...")
+    backup_file = create_backup()
+    purge_old_backups(limit=5)
+
+    if backup_file:
+        log(f"📦 Respaldo generado correctamente: {backup_file.name}")
+    else:
+        log("⚠️ No se generó respaldo (posible base vacía o error menor).")
+
+
+# ==========================================================
+# EJECUCIÓN
+# ==========================================================
+def run_pipeline(workers=None):
+    """
+    Ejecuta una sincronización completa Excel → SQLite:
+    1. Lectura: solo las hojas cuyo contenido cambió (manifest), de a una.
+    2. Diff: cada hoja contra su tabla tal como estaba antes de esta ejecución.
+    3. Respaldo: una vez, justo antes de la primera escritura.
+    4. Aplicación: solo los cambios del diff (delta por tabla); reemplazo
+       completo si la tabla es nueva, cambió su esquema o no hay claves.
+    5. Historial: versiones con vigencia de las tablas de HISTORY_TABLES
+       (bridge.history), en la misma transacción que la aplicación.
+    6. Eventos: un evento insert / update / delete por fila escrita, con el
+       id de la corrida, en el log append-only de bridge.events.
+    7. Resumen: solo los grupos (portafolio, responsable) que tocaron las
+       filas cambiadas se recalculan en el resumen materializado
+       (bridge.consolidator), tras actualizar los índices.
+    Las etapas comparten el DataFrame de cada hoja y una única conexión
+    (pragmas de escritura masiva; transacción por tabla o por ejecución
+    según SQLITE_TRANSACTION).
+    El manifest se guarda al final, sin las hojas que no se pudieron guardar.
+    Retorna el resumen de cambios {hoja: {...}} (ver comparator.detect_changes).
+    """
+    log("📘 Leyendo hojas desde los archivos Excel...")
+    plan = planificar_lectura(workers)
+    summary = detect_changes({}, plan["sin_cambios"])
+
+    if not plan["tareas"]:
+        if plan["sin_cambios"]:
+            save_manifest(plan["manifest"])
+            log("✅ Ningún Excel cambió desde la última ejecución. Base ya actualizada.")
+        else:
+            log("⚠️ No se encontraron datos válidos en el Excel. Proceso detenido.")
+        return summary
+
+    respaldado = False
+    corrida = None
+    total = actualizadas = 0
+    escritas = set()
+    with writer() as conn:
+        if SQLITE_TRANSACTION == "run":
+            # Toda la ejecución en una transacción; cada tabla es un SAVEPOINT.
+            # El volcado por bloques (stream_chunks_to_db) se niega a correr dentro de ella.
+            conn.execute("BEGIN")
+        log("🔍 Analizando diferencias y aplicando cambios hoja por hoja...")
+        for hoja, df in iter_sheets(plan=plan):
+            total += 1
+            try:
+                entrada = detect_sheet_changes(hoja, df, conn)
+                if entrada is None:
+                    # Hoja fuera del diff: se guarda completa
+                    entrada = {"nuevos": 0, "eliminados": 0, "modificados": 0, "claves": [], "delta": False}
+                else:
+                    summary[hoja] = entrada
+
+                hay_cambios = entrada["nuevos"] or entrada["eliminados"] or entrada["modificados"]
+                table_name = sanitize_table_name(hoja)
+                if not hay_cambios and not motivo_reemplazo(conn, table_name, df, entrada):
+                    log(f"⏭️ '{hoja}': contenido igual al de la base, no se escribe.")
+                    # Huellas desfasadas (edición externa o base anterior a la ficha): se rehacen
+                    if not fingerprints_current(conn, table_name):
+                        with transaction(conn):
+                            refresh_fingerprints(conn, table_name)
+                    continue
+
+                if not respaldado:
+                    _respaldar()
+                    respaldado = True
+                    corrida = open_run(conn, "pipeline")
+
+                if apply_changes(hoja, df, entrada, conn, corrida):
+                    actualizadas += 1
+                    escritas.add(sanitize_table_name(hoja))
+            except Exception as e:
+                log(f"❌ Error procesando hoja '{hoja}': {e}")
+                descartar_hoja(plan, hoja)
+
+        close_run(conn, corrida)
+        try:
+            sync_history(conn)
+        except Exception as e:
+            log(f"⚠️ No se pudo iniciar el historial: {e}")
+        try:
+            sync_indexes(conn, escritas)
+        except Exception as e:
+            log(f"⚠️ No se pudieron actualizar los índices: {e}")
+        try:
+            refresh_summaries(conn)
+        except Exception as e:
+            log(f"⚠️ No se pudo actualizar el resumen: {e}")
+
+    save_manifest(plan["manifest"])
+    log(f"📊 Resultado: {actualizadas}/{total} hojas sincronizadas correctamente.")
+    log(f"🗃️ Base de datos actualizada en: {DB_PATH}")
+    return summary
+
+
+if __name__ == "__main__":
+    run_pipeline()
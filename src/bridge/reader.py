@@ -4,10 +4,19 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 import re
+from functools import lru_cache
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
-from core.config import EXCELS
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+from core.config import EXCELS, READER_WORKERS, STREAM_CHUNK_ROWS
 from core.logger import log
+from core.schema import REAL_COLUMNS, DATE_COLUMNS
+from bridge.fingerprint import load_manifest, file_signature, content_hash, sheet_hashes
+from bridge.sheet_cache import load_sheet, store_sheet, purge_sheet_cache
 
 # ==========================================================
 # CONFIGURACIÓN BASE
@@ -18,8 +27,13 @@ OMITIR_HOJAS = {
 }
   # Hojas que se omiten por defecto
 _currency_re = re.compile(r"[^\d\-,.]+")
-NUMERIC_HINTS = {"PARCIAL", "MONTO", "ABONO", "RETIRO", "SALDO"}
-DATE_HINTS = {"FECHA"}
+_float_re = re.compile(r"-?(?:\d+\.?\d*|\.\d+)")
+_iso_re = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_MEDIANOCHE = ("", "00:00:00", "00:00")
+_mojibake_re = re.compile("[ÃÂ]")
+NUMERIC_HINTS = REAL_COLUMNS
+DATE_HINTS = DATE_COLUMNS
+VENTANA_ESTRUCTURA = 10  # filas desde el encabezado usadas para medir el ancho real
 
 # ==========================================================
 # FUNCIONES AUXILIARES
@@ -35,6 +49,41 @@ def _fix_mojibake(text):
             return text
     return text
 
+# Las descripciones y nombres se repiten miles de veces: se repara cada texto una vez
+_fix_mojibake_cached = lru_cache(maxsize=8192)(_fix_mojibake)
+
+def _hay_mojibake(valores):
+    """True si algún texto del arreglo contiene "Ã" o "Â" (una sola búsqueda en C)."""
+    valores = valores[~pd.isna(valores)]
+    try:
+        unido = "\x00".join(valores)
+    except TypeError:  # hay celdas que no son texto
+        unido = "\x00".join(v for v in valores if isinstance(v, str))
+    return "Ã" in unido or "Â" in unido
+
+def _reparar_mojibake(df):
+    """
+    Versión vectorizada de df.applymap(_fix_mojibake).
+    - Descarta primero la hoja y luego las columnas sin "Ã"/"Â".
+    - En las columnas afectadas ubica las celdas con str.contains y solo
+      a esas les aplica la conversión latin1 → utf-8.
+    Retorna (df, celdas_corregidas).
+    """
+    corregidas = 0
+    columnas = [c for c in df.columns if df[c].dtype == object]
+    if not columnas or not _hay_mojibake(df[columnas].to_numpy().ravel()):
+        return df, corregidas
+
+    for col in columnas:
+        if not _hay_mojibake(df[col].to_numpy()):
+            continue
+        textos = df[col][df[col].map(type).eq(str)]
+        originales = textos[textos.str.contains(_mojibake_re)]
+        reparadas = originales.map(_fix_mojibake_cached)
+        df.loc[originales.index, col] = reparadas
+        corregidas += int((reparadas != originales).sum())
+    return df, corregidas
+
 def _to_number(val):
     """Convierte texto a número flotante seguro."""
     if pd.isna(val):
@@ -52,49 +101,396 @@ def _to_number(val):
     except Exception:
         return None
 
+def _iso(val):
+    """ISO ordenable: 'YYYY-MM-DD', o 'YYYY-MM-DD HH:MM:SS' si la hora no es 00:00."""
+    val = val.replace("T", " ", 1)
+    return val[:10] if val[10:].strip() in _MEDIANOCHE else val
+
 def _to_date(val):
     """Convierte fechas tipo Excel o '1-Ene' a ISO (YYYY-MM-DD)."""
     if pd.isna(val) or str(val).strip() in ("", "-"):
         return None
     val = str(val).strip()
-    if re.match(r"^\d{4}-\d{2}-\d{2}", val):
-        return val
+    if _iso_re.match(val):
+        return _iso(val)
     ts = pd.to_datetime(val, dayfirst=True, errors="coerce")
     return ts.date().isoformat() if pd.notna(ts) else None
 
-def _detect_header_row(ws):
-    """Detecta la fila de encabezado real (mínimo 3 columnas con texto)."""
-    for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-        values = [cell.value for cell in row if cell.value not in (None, "")]
-        if len(values) >= 3:
-            return row[0].row
-    return 1
-
-def _col_letter(idx):
-    """Convierte índice numérico a letra (1→A, 27→AA)."""
-    s = ""
-    while idx > 0:
-        idx, rem = divmod(idx - 1, 26)
-        s = chr(65 + rem) + s
-    return s
+def _texto_valido(col):
+    """Texto recortado de las celdas no vacías (ni '', ni '-') de una columna."""
+    txt = col[col.notna()].astype(str).str.strip()
+    return txt[(txt != "") & (txt != "-")]
 
-# ==========================================================
-# LECTOR PRINCIPAL MULTIEXCEL
-# ==========================================================
-def leer_excel_completo():
+def _vacia(col):
+    """Columna object del mismo índice con None en todas las celdas (no NaN)."""
+    return pd.Series([None] * len(col), index=col.index, name=col.name, dtype=object)
+
+def _to_number_series(col):
     """
-    Lee todos los Excels detectados en EXCELS.
-    - Detecta encabezados automáticamente.
-    - Limpia datos y tipifica sin alterar estructura.
-    - Ignora hojas definidas en OMITIR_HOJAS.
+    Versión vectorizada de col.apply(_to_number), con el mismo resultado:
+    float64 con NaN en los vacíos si hay algún número (apply convierte así
+    los None de _to_number), o una columna object de None si no hay ninguno.
     """
-    if not EXCELS:
-        log("⚠️ No se detectaron archivos Excel configurados en el entorno.")
-        return {}
+    txt = _texto_valido(col).str.replace(_currency_re, "", regex=True)
+
+    # "1.234,56" → la coma es decimal: se quitan los puntos de miles
+    coma_decimal = txt.str.rfind(",") > txt.str.rfind(".")
+    coma_decimal &= txt.str.contains(".", regex=False)
+    txt = txt.mask(coma_decimal, txt.str.replace(".", "", regex=False))
+    txt = txt.str.replace(",", ".", regex=False)
+
+    # Solo lo que float() aceptaría; el resto queda como vacío
+    txt = txt[txt.str.fullmatch(_float_re)]
+    out = pd.Series(np.nan, index=col.index, name=col.name)
+    out[txt.index] = txt.astype(float)
+    if len(out) and out.isna().all():
+        return _vacia(col)
+    return out
+
+def _to_date_series(col):
+    """
+    Versión vectorizada de col.apply(_to_date): columna object con None en
+    los vacíos y en lo que no se pudo interpretar.
+    - Valores ISO (YYYY-MM-DD...) se conservan; la hora 00:00:00 se descarta.
+    - El resto se parsea una sola vez por valor único (dayfirst); si el formato
+      inferido no aplica a algún valor (p. ej. '1-Ene'), ese valor se resuelve
+      con _to_date para obtener exactamente el mismo resultado.
+    """
+    txt = _texto_valido(col)
+    out = _vacia(col)
+
+    iso = txt.str.match(_iso_re)
+    valores = txt[iso].str.replace("T", " ", n=1, regex=False)
+    medianoche = valores.str[10:].str.strip().isin(_MEDIANOCHE)
+    out[txt.index[iso]] = valores.where(~medianoche, valores.str[:10])
+
+    resto = txt[~iso]
+    if len(resto):
+        unicos = pd.Series(resto.unique())
+        ts = pd.to_datetime(unicos, dayfirst=True, errors="coerce")
+        convertidos = ts.dt.strftime("%Y-%m-%d").astype(object)
+        fallidos = ts.isna()
+        convertidos[fallidos] = unicos[fallidos].map(_to_date)
+        out[resto.index] = resto.map(dict(zip(unicos, convertidos)))
+    return out
+
+def _convert_cell(cell):
+    """Convierte una celda igual que pandas.read_excel (motor openpyxl)."""
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+def _ultima_col(fila):
+    """Posición (1-based) de la última celda no vacía de una fila ya convertida."""
+    for col_idx in range(len(fila), 0, -1):
+        if fila[col_idx - 1] != "":
+            return col_idx
+    return 0
+
+def _detectar_estructura(filas):
+    """
+    Detecta encabezado y ancho real leyendo solo una ventana acotada del
+    iterador de filas (celdas), en una sola pasada y sin acceso aleatorio:
+    - Encabezado: primera fila con 3+ celdas con datos (1 si no hay ninguna).
+    - Ancho: última columna con datos en las 10 filas desde el encabezado;
+      las columnas vacías a la derecha quedan fuera.
+    Retorna (header_row, last_valid_col, leidas) donde `leidas` son las filas
+    consumidas ya convertidas (completas). El iterador queda en la fila siguiente.
+    """
+    leidas, ultimas = [], []
+    header_row = None
+    for celdas in filas:
+        fila = [_convert_cell(cell) for cell in celdas]
+        leidas.append(fila)
+        ultima = _ultima_col(fila)
+
+        if header_row is None:
+            if sum(1 for v in fila if v != "") < 3:
+                continue
+            header_row = len(leidas)
+
+        # Una fila con datos más allá de la ventana → la ventana ya es definitiva
+        if len(leidas) >= header_row + VENTANA_ESTRUCTURA and ultima:
+            return header_row, max(ultimas, default=0), leidas
+        ultimas.append(ultima)
+
+    # Fin de hoja: la ventana termina antes de la última fila con datos
+    ultimas_todas = [_ultima_col(f) for f in leidas]
+    total = max((i + 1 for i, u in enumerate(ultimas_todas) if u), default=0)
+    header_row = header_row or 1
+    ventana = ultimas_todas[header_row - 1:min(total, header_row + VENTANA_ESTRUCTURA) - 1]
+    return header_row, max(ventana, default=0), leidas
+
+def _iterar_filas(ws):
+    """
+    Recorre la hoja una sola vez. Retorna (header_row, filas) donde `filas` es
+    un generador de filas ya convertidas:
+    - Las filas se recortan/rellenan al ancho real detectado.
+    - Las filas vacías al final no se producen (igual que pandas): las vacías
+      intermedias se retienen solo como contador hasta ver la siguiente con datos.
+    - Si la hoja no tiene columnas válidas el generador no produce filas.
+    """
+    ws.reset_dimensions()
+    filas_ws = iter(ws.rows)
+    header_row, last_col, leidas = _detectar_estructura(filas_ws)
+    if last_col == 0:
+        return header_row, iter(())
+
+    def _ajustadas():
+        for fila in leidas:
+            yield fila[:last_col] + [""] * (last_col - len(fila)), _ultima_col(fila) > 0
+        leidas.clear()
+
+        for celdas in filas_ws:
+            fila = [_convert_cell(cell) for cell in celdas[:last_col]]
+            fila += [""] * (last_col - len(fila))
+            con_datos = (
+                _ultima_col(fila) > 0
+                or any(cell.value is not None and cell.value != "" for cell in celdas[last_col:])
+            )
+            yield fila, con_datos
+
+    def _filas():
+        vacias = 0
+        for fila, con_datos in _ajustadas():
+            if not con_datos:
+                vacias += 1
+                continue
+            for _ in range(vacias):
+                yield [""] * last_col
+            vacias = 0
+            yield fila
+
+    return header_row, _filas()
+
+def _leer_filas(ws):
+    """Igual que _iterar_filas, con todas las filas en una lista."""
+    header_row, filas = _iterar_filas(ws)
+    return header_row, list(filas)
+
+def _leer_hoja(ws):
+    """
+    Construye el DataFrame de una hoja a partir de una única pasada de filas.
+    Retorna None si la hoja no tiene columnas válidas.
+    """
+    header_row, filas = _leer_filas(ws)
+    if not filas:
+        return None
+
+    parser = TextParser(
+        filas,
+        header=header_row - 1,
+        dtype=str,
+        skip_blank_lines=False
+    )
+    return parser.read()
+
+def _iterar_bloques(ws, tamano):
+    """
+    Lee la hoja en DataFrames de `tamano` filas (crudos, como _leer_hoja) sin
+    construir nunca la hoja completa. Los nombres de columna se resuelven una
+    vez con el encabezado y el índice continúa entre bloques.
+    """
+    header_row, filas = _iterar_filas(ws)
+    cabecera = list(islice(filas, header_row))
+    if len(cabecera) < header_row:
+        return
+
+    columnas = list(TextParser(cabecera, header=header_row - 1, dtype=str, skip_blank_lines=False).read().columns)
+    inicio = 0
+    while True:
+        bloque = list(islice(filas, tamano))
+        if not bloque:
+            return
+        df = TextParser(bloque, header=None, names=columnas, dtype=str, skip_blank_lines=False).read()
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        inicio += len(df)
+        yield df
+
+def _limpiar_bloque(df):
+    """Reglas de limpieza celda a celda. Retorna (df, celdas_con_mojibake)."""
+    df, corregidas = _reparar_mojibake(df)
+    df = df.replace({r"^\s*$": None, r"^\s*-\s*$": None}, regex=True)
+
+    for col in df.columns:
+        upper = str(col).strip().upper()
+        if upper in DATE_HINTS:
+            df[col] = _to_date_series(df[col])
+        elif upper in NUMERIC_HINTS:
+            df[col] = _to_number_series(df[col])
+    return df, corregidas
+
+def _limpiar_dataframe(df, hoja=None):
+    """Limpieza y normalización de una hoja ya construida."""
+    df, corregidas = _limpiar_bloque(df)
+    if corregidas:
+        log(f"🔤 Hoja '{hoja}': {corregidas} celdas con codificación corregida.")
+    return df
+
+def _clasificar_hojas(sheetnames):
+    """Separa las hojas válidas de las omitidas y lo registra en el log."""
+    hojas = [h for h in sheetnames if h not in OMITIR_HOJAS]
+    omitidas = [h for h in sheetnames if h in OMITIR_HOJAS]
+
+    log(f"📄 Hojas detectadas: {len(hojas)} válidas / {len(omitidas)} omitidas")
+
+    if omitidas:
+        log(f"   🪶 Omitidas: {', '.join(omitidas)}")
+    return hojas
+
+def _iterar_workbook(key, excel_path, hojas=None, hashes=None):
+    """
+    Genera (excelN_hoja, DataFrame) de un workbook, una hoja a la vez y en el
+    orden original de las hojas.
+    - Las hojas con huella conocida se sirven desde la caché de hojas procesadas;
+      el workbook solo se abre (una vez) al llegar a la primera hoja sin caché.
+    - hojas: subconjunto a procesar (modo paralelo); None = todas las válidas.
+    - hashes: {hoja: huella}; None = se calculan al abrir el workbook.
+    - Las hojas vacías se producen como (excelN_hoja, None) para que quien
+      lleva el manifest las distinga de las que fallaron (no se producen).
+    """
+    wb = None
+    try:
+        if hojas is None or hashes is None:
+            wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+            if hojas is None:
+                hojas = _clasificar_hojas(wb.sheetnames)
+            if hashes is None:
+                try:
+                    hashes = sheet_hashes(wb, hojas)
+                except Exception as e:
+                    log(f"⚠️ No se pudieron calcular huellas de '{excel_path.name}' ({e}). Lectura sin caché.")
+                    hashes = {}
+
+        for hoja in hojas:
+            huella = hashes.get(hoja)
+            df = load_sheet(huella, hoja) if huella else None
+            if df is not None:
+                log(f"⚡ Hoja '{hoja}' desde caché ({len(df)} filas, {len(df.columns)} columnas)")
+                yield f"{key}_{hoja}", df
+                continue
+
+            if wb is None:
+                wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+            try:
+                df = _leer_hoja(wb[hoja])
+                if df is None:
+                    log(f"⚠️ Hoja vacía o sin columnas válidas: {hoja}")
+                    yield f"{key}_{hoja}", None
+                    continue
+
+                df = _limpiar_dataframe(df, hoja)
+                log(f"✅ Hoja '{hoja}' cargada ({len(df)} filas, {len(df.columns)} columnas)")
+                if huella:
+                    store_sheet(huella, hoja, df)
+            except Exception as e:
+                log(f"⚠️ Error al procesar hoja '{hoja}' ({excel_path.name}): {e}")
+                continue
+
+            # Guardar con formato: excelX_nombreHoja
+            yield f"{key}_{hoja}", df
+    finally:
+        if wb is not None:
+            wb.close()
+
+def _leer_workbook(key, excel_path, hojas=None, hashes=None):
+    """Versión dict de _iterar_workbook (resultado serializable para el pool de procesos)."""
+    return dict(_iterar_workbook(key, excel_path, hojas, hashes))
+
+def _huellas_conocidas(key, excel_path):
+    """
+    Si el workbook no cambió desde la última lectura confirmada (stat igual al
+    manifest), retorna (hojas, {hoja: huella}) sin abrirlo. Si no, None.
+    """
+    previo = load_manifest()["workbooks"].get(key)
+    if not previo or previo["path"] != str(excel_path) or previo.get("incompleto"):
+        return None
+    firma = file_signature(excel_path)
+    if any(previo[k] != v for k, v in firma.items()):
+        return None
+    return list(previo["hojas"]), previo["hojas"]
+
+def _dividir_hojas(key, excel_path, hojas, workers, hashes=None):
+    """
+    Divide las hojas de un workbook en bloques contiguos (uno por worker
+    como máximo) para conservar el orden original al unir resultados.
+    """
+    if not hojas:
+        return []
+    bloques = min(workers, len(hojas))
+    tamano = -(-len(hojas) // bloques)
+    return [(key, excel_path, hojas[i:i + tamano], hashes) for i in range(0, len(hojas), tamano)]
+
+def _planificar_tareas(workers):
+    """Reparte todos los workbooks en tareas para el pool de procesos."""
+    tareas = []
+    for key, excel_path in EXCELS.items():
+        if not excel_path.exists():
+            log(f"⚠️ Archivo no encontrado: {excel_path}")
+            continue
+
+        log(f"📘 Planificando archivo: {excel_path.name}")
+        try:
+            conocidas = _huellas_conocidas(key, excel_path)
+            if conocidas:
+                hojas, hashes = conocidas
+            else:
+                wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+                try:
+                    hojas = _clasificar_hojas(wb.sheetnames)
+                    hashes = sheet_hashes(wb, hojas)
+                finally:
+                    wb.close()
+        except Exception as e:
+            log(f"❌ Error al abrir Excel '{excel_path.name}': {e}")
+            continue
+
+        tareas.extend(_dividir_hojas(key, excel_path, hojas, workers, hashes))
+    return tareas
 
-    dataframes = {}
-    total_hojas = 0
+def _iterar_tareas(tareas, workers):
+    """
+    Procesa las tareas (key, excel_path, hojas, hashes) y genera las hojas en orden.
+    Con workers > 1 usa un ProcessPoolExecutor; si no, las lee en secuencia
+    (una hoja en memoria a la vez).
+    """
+    if not tareas:
+        return
+
+    if workers <= 1:
+        for key, excel_path, hojas, hashes in tareas:
+            log(f"📘 Leyendo archivo: {excel_path.name} ({len(hojas)} hojas)")
+            try:
+                yield from _iterar_workbook(key, excel_path, hojas, hashes)
+            except Exception as e:
+                log(f"❌ Error al abrir Excel '{excel_path.name}': {e}")
+        return
+
+    log(f"⚙️ Lectura paralela: {len(tareas)} tareas en {workers} procesos.")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(_leer_workbook, *tarea) for tarea in tareas]
+
+        # Se recorre en el orden de envío → resultado determinista
+        for i, (key, excel_path, hojas, _) in enumerate(tareas):
+            try:
+                resultado = futuros[i].result()
+            except Exception as e:
+                log(f"❌ Error al procesar Excel '{excel_path.name}' (hojas: {', '.join(hojas)}): {e}")
+                continue
+            finally:
+                futuros[i] = None  # liberar el bloque apenas se consume
 
+            for nombre in list(resultado):
+                yield nombre, resultado.pop(nombre)
+
+def _iterar_completo():
+    """Lectura secuencial de todos los workbooks (caché directa si no cambiaron)."""
     for key, excel_path in EXCELS.items():
         if not excel_path.exists():
             log(f"⚠️ Archivo no encontrado: {excel_path}")
@@ -103,77 +499,225 @@ def leer_excel_completo():
         log(f"📘 Leyendo archivo: {excel_path.name}")
 
         try:
-            wb = load_workbook(excel_path, read_only=True, data_only=True)
-            all_sheets = wb.sheetnames
-            hojas = [h for h in all_sheets if h not in OMITIR_HOJAS]
-            omitidas = [h for h in all_sheets if h in OMITIR_HOJAS]
-            wb.close()
+            conocidas = _huellas_conocidas(key, excel_path)
+            if conocidas:
+                log("   ⚡ Sin cambios desde la última lectura: se usa la caché de hojas.")
+                yield from _iterar_workbook(key, excel_path, *conocidas)
+            else:
+                yield from _iterar_workbook(key, excel_path)
+        except Exception as e:
+            log(f"❌ Error al abrir Excel '{excel_path.name}': {e}")
+
+def _planificar_incremental(manifest, workers):
+    """
+    Compara cada workbook con el manifest previo y planifica solo lo que cambió.
+    1. stat (tamaño + mtime) igual → workbook sin cambios, no se abre.
+    2. hash de contenido igual → sin cambios (solo se tocó el archivo).
+    3. Si cambió: hash del XML de cada hoja → solo se leen las hojas distintas.
+    Retorna (tareas, hojas_sin_cambios, manifest_nuevo).
+    """
+    nuevo = {"version": manifest["version"], "workbooks": {}}
+    tareas, sin_cambios = [], []
 
-            log(f"📄 Hojas detectadas: {len(hojas)} válidas / {len(omitidas)} omitidas")
+    for key, excel_path in EXCELS.items():
+        if not excel_path.exists():
+            log(f"⚠️ Archivo no encontrado: {excel_path}")
+            continue
 
-            if omitidas:
-                log(f"   🪶 Omitidas: {', '.join(omitidas)}")
+        previo = manifest["workbooks"].get(key)
+        if previo and previo["path"] != str(excel_path):
+            previo = None
+        # Incompleto → quedaron hojas por reintentar: se revisa hoja por hoja
+        completo = previo and not previo.get("incompleto")
 
-            for hoja in hojas:
-                try:
-                    wb = load_workbook(excel_path, read_only=True, data_only=True)
-                    ws = wb[hoja]
-
-                    header_row = _detect_header_row(ws)
-                    max_col = ws.max_column
-                    max_row = ws.max_row
-
-                    # Determinar última columna con datos reales
-                    last_valid_col = 0
-                    for col_idx in range(1, max_col + 1):
-                        if any(ws.cell(row=r, column=col_idx).value not in (None, "")
-                               for r in range(header_row, min(max_row, header_row + 10))):
-                            last_valid_col = col_idx
-
-                    if last_valid_col == 0:
-                        log(f"⚠️ Hoja vacía o sin columnas válidas: {hoja}")
-                        wb.close()
-                        continue
-
-                    last_col_letter = _col_letter(last_valid_col)
-                    wb.close()
+        try:
+            firma = file_signature(excel_path)
+            if completo and all(previo[k] == v for k, v in firma.items()):
+                log(f"⏭️ Sin cambios: {excel_path.name}")
+                nuevo["workbooks"][key] = previo
+                sin_cambios.extend(f"{key}_{h}" for h in previo["hojas"])
+                continue
 
-                    usecols_exact = f"A:{last_col_letter}"
+            hash_wb = content_hash(excel_path)
+            if completo and previo["hash"] == hash_wb:
+                log(f"⏭️ Sin cambios (contenido idéntico): {excel_path.name}")
+                nuevo["workbooks"][key] = {**previo, **firma}
+                sin_cambios.extend(f"{key}_{h}" for h in previo["hojas"])
+                continue
 
-                    df = pd.read_excel(
-                        excel_path,
-                        sheet_name=hoja,
-                        header=header_row - 1,
-                        usecols=usecols_exact,
-                        engine="openpyxl",
-                        dtype=str
-                    )
+            log(f"📘 Cambios detectados en: {excel_path.name}")
+            wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+            try:
+                hojas = _clasificar_hojas(wb.sheetnames)
+                hashes = sheet_hashes(wb, hojas)
+            finally:
+                wb.close()
+        except Exception as e:
+            log(f"❌ Error al abrir Excel '{excel_path.name}': {e}")
+            continue
 
-                    # Limpieza y normalización
-                    df = df.applymap(_fix_mojibake)
-                    df = df.replace({r"^\s*$": None, r"^\s*-\s*$": None}, regex=True)
+        previas = previo["hojas"] if previo else {}
+        iguales = [h for h in hojas if previas.get(h) == hashes[h]]
+        a_leer = [h for h in hojas if previas.get(h) != hashes[h]]
+        if iguales:
+            log(f"   ⏭️ Hojas sin cambios: {', '.join(iguales)}")
 
-                    for col in df.columns:
-                        upper = str(col).strip().upper()
-                        if upper in DATE_HINTS:
-                            df[col] = df[col].apply(_to_date)
-                        elif upper in NUMERIC_HINTS:
-                            df[col] = df[col].apply(_to_number)
+        sin_cambios.extend(f"{key}_{h}" for h in iguales)
+        nuevo["workbooks"][key] = {"path": str(excel_path), **firma, "hash": hash_wb, "hojas": dict(hashes)}
+        tareas.extend(_dividir_hojas(key, excel_path, a_leer, workers, hashes))
 
-                    log(f"✅ Hoja '{hoja}' cargada ({len(df)} filas, {len(df.columns)} columnas)")
-                    total_hojas += 1
+    return tareas, sin_cambios, nuevo
 
-                    # Guardar con formato: excelX_nombreHoja
-                    dataframes[f"{key}_{hoja}"] = df
+# ==========================================================
+# LECTOR PRINCIPAL MULTIEXCEL
+# ==========================================================
+def planificar_lectura(workers=None):
+    """
+    Plan de lectura incremental: compara los Excels con el manifest de la
+    última lectura confirmada sin parsear ninguna hoja.
+    Retorna {"tareas": [...], "sin_cambios": [excelN_hoja, ...],
+             "manifest": manifest_nuevo, "workers": N}.
+    El plan se puede recorrer varias veces con iter_sheets(plan=plan): a partir
+    de la segunda pasada las hojas salen de la caché.
+    """
+    workers = READER_WORKERS if workers is None else workers
+    if not EXCELS:
+        log("⚠️ No se detectaron archivos Excel configurados en el entorno.")
+        return {"tareas": [], "sin_cambios": [], "manifest": load_manifest(), "workers": workers}
 
-                except Exception as e:
-                    log(f"⚠️ Error al procesar hoja '{hoja}' ({excel_path.name}): {e}")
+    tareas, sin_cambios, manifest = _planificar_incremental(load_manifest(), workers)
+    return {"tareas": tareas, "sin_cambios": sin_cambios, "manifest": manifest, "workers": workers}
 
+def _descartar_no_leidas(plan, procesadas):
+    """
+    Las hojas planificadas que no se procesaron (fallaron o el recorrido se
+    cortó antes) se descartan del manifest con descartar_hoja. Las vacías
+    cuentan como procesadas: conservan su huella y no se releen.
+    """
+    for key, _, hojas, _ in plan["tareas"]:
+        for hoja in hojas:
+            if f"{key}_{hoja}" not in procesadas:
+                descartar_hoja(plan, f"{key}_{hoja}")
+
+def descartar_hoja(plan, nombre):
+    """
+    Quita la huella de una hoja (excelN_hoja) del manifest del plan: en la
+    próxima ejecución se vuelve a leer (p. ej. si no se pudo guardar en la base).
+    """
+    for key, entry in plan["manifest"]["workbooks"].items():
+        if nombre.startswith(f"{key}_"):
+            entry["hojas"].pop(nombre[len(key) + 1:], None)
+            entry["incompleto"] = True
+            return
+
+def iter_sheets(workers=None, plan=None):
+    """
+    Generador: produce (excelN_hoja, DataFrame) de a una hoja, en el mismo
+    orden y con la misma limpieza que leer_excel_completo.
+    - Con workers = 1 solo hay una hoja en memoria a la vez: quien consume
+      puede guardar/comparar y soltar cada DataFrame antes del siguiente.
+    - Con workers > 1 los bloques se leen en paralelo y se liberan al consumirse.
+    - plan: resultado de planificar_lectura(); solo se leen las hojas que
+      cambiaron y su manifest se ajusta al terminar (o al cortar el recorrido).
+    """
+    if not EXCELS:
+        log("⚠️ No se detectaron archivos Excel configurados en el entorno.")
+        return
+
+    if plan is not None:
+        fuente = _iterar_tareas(plan["tareas"], plan["workers"])
+    else:
+        workers = READER_WORKERS if workers is None else workers
+        fuente = _iterar_tareas(_planificar_tareas(workers), workers) if workers > 1 else _iterar_completo()
+
+    leidas, vacias = set(), set()
+    try:
+        for nombre, df in fuente:
+            if df is None:
+                vacias.add(nombre)
+                continue
+            leidas.add(nombre)
+            yield nombre, df
+    finally:
+        fuente.close()
+        if plan is not None:
+            _descartar_no_leidas(plan, leidas | vacias)
+
+    purge_sheet_cache()
+    if plan is not None:
+        log(f"\n📊 Lectura incremental: {len(leidas)} hojas leídas, {len(plan['sin_cambios'])} sin cambios.\n")
+    else:
+        log(f"\n📊 Lectura completada: {len(leidas)} hojas procesadas correctamente.\n")
+
+def _bloques_limpios(ws, hoja, tamano):
+    """Bloques de la hoja ya limpios; al terminar registra el total de la hoja."""
+    filas = corregidas = 0
+    for df in _iterar_bloques(ws, tamano):
+        df, n = _limpiar_bloque(df)
+        # Tipos estables entre bloques: un bloque sin datos no decide el tipo de la columna
+        for col in df.columns:
+            df[col] = df[col].astype(float if str(col).strip().upper() in NUMERIC_HINTS else object)
+        filas += len(df)
+        corregidas += n
+        yield df
+
+    if corregidas:
+        log(f"🔤 Hoja '{hoja}': {corregidas} celdas con codificación corregida.")
+    log(f"✅ Hoja '{hoja}' leída por bloques ({filas} filas)")
+
+def iter_chunks(chunk_rows=None):
+    """
+    Lectura por bloques para hojas muy grandes: produce (excelN_hoja, bloques)
+    donde `bloques` genera DataFrames limpios de chunk_rows filas (por defecto
+    STREAM_CHUNK_ROWS) con las mismas reglas que leer_excel_completo.
+    - Nunca se construye la hoja completa: memoria plana sin importar su tamaño.
+    - No usa la caché de hojas ni el manifest.
+    - Hay que consumir `bloques` antes de pedir la siguiente hoja.
+    """
+    tamano = chunk_rows or STREAM_CHUNK_ROWS
+    for key, excel_path in EXCELS.items():
+        if not excel_path.exists():
+            log(f"⚠️ Archivo no encontrado: {excel_path}")
+            continue
+
+        log(f"📘 Leyendo archivo por bloques de {tamano} filas: {excel_path.name}")
+        try:
+            wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
         except Exception as e:
             log(f"❌ Error al abrir Excel '{excel_path.name}': {e}")
+            continue
+
+        try:
+            for hoja in _clasificar_hojas(wb.sheetnames):
+                yield f"{key}_{hoja}", _bloques_limpios(wb[hoja], hoja, tamano)
+        finally:
+            wb.close()
+
+def leer_excel_completo(workers=None):
+    """
+    Lee todos los Excels detectados en EXCELS.
+    - Abre cada workbook una sola vez (una pasada de filas por hoja).
+    - Detecta encabezados automáticamente.
+    - Limpia datos y tipifica sin alterar estructura.
+    - Ignora hojas definidas en OMITIR_HOJAS.
+    - workers > 1: reparte workbooks/hojas en un pool de procesos
+      (por defecto READER_WORKERS del .env).
+    Para recorrer hoja por hoja sin cargar todo en memoria: iter_sheets().
+    """
+    return dict(iter_sheets(workers))
 
-    log(f"\n📊 Lectura completada: {total_hojas} hojas procesadas correctamente.\n")
-    return dataframes
+def leer_excel_incremental(workers=None):
+    """
+    Igual que leer_excel_completo, pero solo lee lo que cambió desde la
+    última lectura confirmada (manifest en PROCESSED_PATH).
+    Retorna {"hojas": {excelN_hoja: DataFrame}, "sin_cambios": [excelN_hoja, ...],
+             "manifest": manifest_nuevo}.
+    El manifest NO se guarda aquí: llamar a save_manifest(lectura["manifest"])
+    cuando los cambios ya estén aplicados en la base.
+    """
+    plan = planificar_lectura(workers)
+    dataframes = dict(iter_sheets(plan=plan))
+    return {"hojas": dataframes, "sin_cambios": plan["sin_cambios"], "manifest": plan["manifest"]}
 
 # ==========================================================
 # EJECUCIÓN DIRECTA
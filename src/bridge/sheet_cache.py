@@ -0,0 +1,104 @@
+# src/bridge/sheet_cache.py
+# ==========================================================
+# DataPulse v4.0 – Caché de hojas procesadas
+# Guarda cada DataFrame ya limpio en PROCESSED_PATH para no volver a
+# parsear el xlsx mientras la hoja no cambie.
+# ==========================================================
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import os
+import re
+import pickle
+import pandas as pd
+from core.config import PROCESSED_PATH, SHEET_CACHE_MAX_MB
+from core.logger import log
+from bridge.fingerprint import READER_VERSION
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+CACHE_PATH = PROCESSED_PATH / "sheets"
+_EXT = ".pkl"
+_VERSION_RE = re.compile(r"_v(\d+)\.pkl$")
+
+# ==========================================================
+# CLAVES
+# ==========================================================
+def cache_file(sheet_hash: str, hoja: str) -> Path:
+    """Archivo de caché: hash de contenido de la hoja + nombre + versión del lector."""
+    nombre = re.sub(r"[^0-9A-Za-z_-]+", "_", hoja)[:40]
+    return CACHE_PATH / f"{sheet_hash}_{nombre}_v{READER_VERSION}{_EXT}"
+
+# ==========================================================
+# LECTURA / ESCRITURA
+# ==========================================================
+def load_sheet(sheet_hash: str, hoja: str):
+    """Retorna el DataFrame cacheado o None si no existe / está dañado."""
+    path = cache_file(sheet_hash, hoja)
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_pickle(path)
+        os.utime(path)  # marca de uso reciente para la política LRU
+        return df
+    except Exception as e:
+        log(f"⚠️ Caché dañada para '{hoja}' ({e}). Se vuelve a leer la hoja.")
+        path.unlink(missing_ok=True)
+        return None
+
+
+def store_sheet(sheet_hash: str, hoja: str, df: pd.DataFrame):
+    """Guarda el DataFrame limpio de forma atómica (temporal + replace)."""
+    try:
+        CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        path = cache_file(sheet_hash, hoja)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        df.to_pickle(tmp, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+    except Exception as e:
+        log(f"⚠️ No se pudo cachear la hoja '{hoja}': {e}")
+
+# ==========================================================
+# INVALIDACIÓN Y EVICCIÓN
+# ==========================================================
+def purge_sheet_cache(max_mb: float = SHEET_CACHE_MAX_MB):
+    """
+    - Elimina entradas de otras versiones del lector (invalidación automática).
+    - Si la caché supera max_mb, elimina las menos usadas recientemente (LRU).
+    Los cambios de contenido no requieren borrar nada: generan otra clave.
+    """
+    if not CACHE_PATH.exists():
+        return
+    try:
+        vigentes = []
+        for f in CACHE_PATH.glob(f"*{_EXT}"):
+            m = _VERSION_RE.search(f.name)
+            if not m or int(m.group(1)) != READER_VERSION:
+                f.unlink(missing_ok=True)
+                continue
+            st = f.stat()
+            vigentes.append((st.st_mtime, st.st_size, f))
+
+        total = sum(size for _, size, _ in vigentes)
+        limite = max_mb * 1024 * 1024
+        eliminadas = 0
+        for _, size, f in sorted(vigentes):
+            if total <= limite:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            eliminadas += 1
+
+        if eliminadas:
+            log(f"🗑️ Caché de hojas: {eliminadas} entradas antiguas eliminadas ({total / 1048576:.1f} MB en uso).")
+    except Exception as e:
+        log(f"⚠️ Error limpiando la caché de hojas: {e}")
+
+
+if __name__ == "__main__":
+    archivos = sorted(CACHE_PATH.glob(f"*{_EXT}")) if CACHE_PATH.exists() else []
+    total = sum(f.stat().st_size for f in archivos)
+    print(f"\n🗂️ Caché de hojas: {CACHE_PATH}")
+    print(f"   {len(archivos)} entradas | {total / 1048576:.1f} MB / {SHEET_CACHE_MAX_MB} MB")
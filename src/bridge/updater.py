@@ -7,62 +7,285 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-import sqlite3
+import time
+import numpy as np
 import pandas as pd
 from core.config import DB_PATH
 from core.logger import log
-from core.db_utils import sanitize_table_name
-from bridge.reader import leer_excel_completo
+from core.schema import table_sql
+from core.db_utils import (
+    writer, sanitize_table_name, stream_chunks_to_db, transaction,
+    write_dataframe, dataframe_rows, insert_rows, log_rate
+)
+from bridge.reader import planificar_lectura, iter_sheets, iter_chunks, descartar_hoja
+from bridge.fingerprint import save_manifest
+from bridge.comparator import (
+    row_fingerprints, store_fingerprints, update_fingerprints, stored_fingerprints, pair_fingerprints,
+    fingerprints_current,
+)
+from bridge.indexer import sync_indexes
+from bridge.history import record_delta, record_replace, sync_history
+from bridge.events import open_run, close_run, snapshot_keys, emit_replace, emit_deletes, emit_delta
+from bridge.consolidator import mark_groups, refresh_summaries
 
 # ==========================================================
 # FUNCIÓN PRINCIPAL
 # ==========================================================
-def sync_excel_to_db():
+def sync_excel_to_db(hojas=None):
     """
     Sincroniza todas las hojas de todos los Excels definidos en .env hacia la base de datos.
     Cada hoja se convierte en una tabla (1:1 con su estructura).
+    - hojas: dict {hoja: DataFrame} o iterable de pares (hoja, DataFrame);
+      si es None se planifica la lectura contra el manifest (planificar_lectura)
+      y iter_sheets() lee, de a una, solo las hojas cuyo contenido cambió: las
+      tablas de las demás no se tocan. El manifest se guarda al final, sin las
+      hojas que no se pudieron guardar.
     """
     log("📂 Iniciando sincronización completa de Excels hacia la base de datos...")
 
-    # Leer todas las hojas (multi-excel)
-    hojas = leer_excel_completo()
-    if not hojas:
-        log("⚠️ No se encontraron hojas válidas para sincronizar.")
-        return
+    # Leer todas las hojas (multi-excel), de a una
+    plan = None
+    if hojas is None:
+        plan = planificar_lectura()
+        if plan["sin_cambios"]:
+            log(f"⏭️ {len(plan['sin_cambios'])} hojas sin cambios. Sus tablas se conservan.")
+        hojas = iter_sheets(plan=plan)
+    elif isinstance(hojas, dict):
+        hojas = hojas.items()
 
-    total = len(hojas)
+    total = 0
     actualizadas = 0
 
     try:
-        conn = sqlite3.connect(DB_PATH)
+        with writer() as conn:
+            corrida = open_run(conn, "sync")
+            for hoja, df in hojas:
+                total += 1
+                try:
+                    table_name = sanitize_table_name(hoja)
+                    log(f"🧩 Guardando hoja '{hoja}' → tabla '{table_name}'...")
 
-        for hoja, df in hojas.items():
-            try:
-                table_name = sanitize_table_name(hoja)
-                log(f"🧩 Guardando hoja '{hoja}' → tabla '{table_name}'...")
+                    if df.empty:
+                        log(f"⚠️ Hoja '{hoja}' vacía, se omite.")
+                        continue
+
+                    with transaction(conn):
+                        reemplazar_tabla(conn, table_name, df, corrida)
+                    log(f"✅ '{hoja}' sincronizada correctamente ({len(df)} filas, {len(df.columns)} columnas).")
+                    actualizadas += 1
 
-                if df.empty:
-                    log(f"⚠️ Hoja '{hoja}' vacía, se omite.")
-                    continue
+                except Exception as e:
+                    log(f"❌ Error procesando hoja '{hoja}': {e}")
+                    if plan is not None:
+                        descartar_hoja(plan, hoja)
 
-                df.to_sql(table_name, conn, if_exists="replace", index=False)
-                log(f"✅ '{hoja}' sincronizada correctamente ({len(df)} filas, {len(df.columns)} columnas).")
-                actualizadas += 1
+            close_run(conn, corrida)
+            sync_history(conn)
+            sync_indexes(conn)
+            refresh_summaries(conn)
 
-            except Exception as e:
-                log(f"❌ Error procesando hoja '{hoja}': {e}")
+        if plan is not None:
+            save_manifest(plan["manifest"])
 
     except Exception as e:
         log(f"💥 Error crítico durante la sincronización: {e}")
 
-    finally:
-        if 'conn' in locals():
-            conn.close()
+    if not total:
+        if plan is not None and plan["sin_cambios"]:
+            log("✅ Ningún Excel cambió desde la última sincronización. Base ya actualizada.")
+        else:
+            log("⚠️ No se encontraron hojas válidas para sincronizar.")
+        return
 
     log(f"\n🚀 Sincronización finalizada.")
     log(f"📊 Resultado: {actualizadas}/{total} hojas sincronizadas correctamente.")
     log(f"🗃️ Base de datos actualizada en: {DB_PATH}\n")
 
+# ==========================================================
+# APLICACIÓN INCREMENTAL (DELTA)
+# ==========================================================
+def motivo_reemplazo(conn, table_name, df, cambios):
+    """Retorna por qué la tabla se debe reemplazar completa, o None si admite delta."""
+    actual = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    if actual is None:
+        return "tabla nueva"
+    if actual[0] != table_sql(conn, table_name, df):
+        return "cambió el esquema"
+    if not cambios.get("claves") or not cambios.get("delta"):
+        return "sin claves para comparar"
+    return None
+
+
+def _cambia(pares) -> bool:
+    """El reemplazo altera el contenido (sin huellas previas se asume que sí)."""
+    return pares is None or bool(len(pares["bajas"]) or len(pares["altas"]))
+
+
+def _registrar_reemplazo(conn, table_name, pares, corrida):
+    """Historial, eventos y grupos del resumen de una tabla recién reescrita completa (rowids 1..n)."""
+    record_replace(conn, table_name, pares)
+    emit_replace(conn, corrida, table_name, pares)
+    if _cambia(pares):
+        mark_groups(conn, table_name)
+
+
+def reemplazar_tabla(conn, table_name, df, corrida=None):
+    """
+    Reescribe la tabla completa con df y deja al día huellas, historial,
+    eventos y grupos del resumen (solo las filas que no estaban emiten /
+    abren versión; si nada cambió no se marca ningún grupo). No confirma.
+    """
+    huellas = row_fingerprints(df)
+    pares = pair_fingerprints(stored_fingerprints(conn, table_name), huellas)
+    snapshot_keys(conn, corrida, table_name)
+    if _cambia(pares):
+        mark_groups(conn, table_name)
+    write_dataframe(conn, df, table_name)
+    store_fingerprints(conn, table_name, huellas=huellas)
+    _registrar_reemplazo(conn, table_name, pares, corrida)
+
+
+def apply_changes(hoja, df, cambios, conn, corrida=None):
+    """
+    Aplica a la tabla de la hoja solo lo que detectó el comparator
+    (detect_sheet_changes): DELETE de eliminados, UPDATE de modificados e
+    INSERT de nuevos, en una transacción por tabla.
+    Si la tabla no existe, cambió su esquema o no hay claves para emparejar
+    filas, la reemplaza completa (to_sql replace).
+    En la misma transacción registra las versiones en el historial si la
+    tabla lo lleva (bridge.history, HISTORY_TABLES), los eventos de cambio
+    de la corrida (bridge.events; corrida None = sin eventos) y los grupos
+    del resumen que se deben recalcular (bridge.consolidator).
+    Retorna "delta", "reemplazo" o None si la hoja está vacía.
+    """
+    table_name = sanitize_table_name(hoja)
+    if df.empty:
+        log(f"⚠️ Hoja '{hoja}' vacía, se omite.")
+        return None
+
+    motivo = motivo_reemplazo(conn, table_name, df, cambios)
+    if motivo:
+        with transaction(conn):
+            reemplazar_tabla(conn, table_name, df, corrida)
+        log(f"✅ '{hoja}' reemplazada completa ({motivo}): {len(df)} filas, {len(df.columns)} columnas.")
+        return "reemplazo"
+
+    eliminados = cambios["eliminados_rid"]
+    modificados = cambios["modificados_idx"]
+    nuevos = cambios["nuevos_idx"]
+    asignaciones = ", ".join(f'"{c}" = ?' for c in df.columns)
+
+    inicio = time.perf_counter()
+    with transaction(conn):
+        # Las huellas solo se ajustan por delta si estaban al día antes de escribir
+        vigentes = fingerprints_current(conn, table_name)
+        # Grupos del resumen que dejan las filas borradas / modificadas
+        mark_groups(conn, table_name, [*eliminados, *cambios["modificados_rid"]])
+        if len(eliminados):
+            emit_deletes(conn, corrida, table_name, eliminados)
+            conn.executemany(
+                f'DELETE FROM "{table_name}" WHERE rowid = ?',
+                ((int(r),) for r in eliminados)
+            )
+        if len(modificados):
+            filas = dataframe_rows(df.loc[modificados])
+            rowids = (int(r) for r in cambios["modificados_rid"])
+            conn.executemany(
+                f'UPDATE "{table_name}" SET {asignaciones} WHERE rowid = ?',
+                (fila + (rowid,) for fila, rowid in zip(filas, rowids))
+            )
+        # rowids que tomarán los nuevos (SQLite asigna max(rowid) + 1 en orden)
+        primer_rid = conn.execute(f'SELECT COALESCE(MAX(rowid), 0) + 1 FROM "{table_name}"').fetchone()[0]
+        if len(nuevos):
+            insert_rows(conn, table_name, df.columns, dataframe_rows(df.loc[nuevos]))
+        update_fingerprints(conn, table_name, df, cambios, primer_rid, vigentes)
+        record_delta(conn, table_name, cambios, primer_rid)
+        emit_delta(conn, corrida, table_name, cambios, primer_rid)
+        mark_groups(conn, table_name, cambios["modificados_rid"], primer_rid if len(nuevos) else None)
+
+    log_rate(table_name, len(nuevos) + len(eliminados) + len(modificados), inicio, "aplicadas")
+    log(f"✅ '{hoja}' actualizada por delta: +{len(nuevos)} / -{len(eliminados)} / ✏️ {len(modificados)} filas.")
+    return "delta"
+
+# ==========================================================
+# MODO STREAMING (HOJAS MUY GRANDES)
+# ==========================================================
+def _con_huellas(bloques, huellas: list):
+    """Pasa los bloques tal cual y acumula sus huellas por fila en `huellas`."""
+    for df in bloques:
+        huellas.append(row_fingerprints(df))
+        yield df
+
+
+def _antes_del_swap(conn, table_name, corrida):
+    """Claves y grupos de las filas previas, leídos justo antes de borrar la tabla."""
+    snapshot_keys(conn, corrida, table_name)
+    mark_groups(conn, table_name)
+
+
+def _despues_del_swap(conn, table_name, previas, huellas: list, corrida):
+    """Huellas, historial y eventos de la tabla recién renombrada (misma transacción)."""
+    huellas = {
+        **huellas[0],
+        "clave": np.concatenate([h["clave"] for h in huellas]),
+        "fila": np.concatenate([h["fila"] for h in huellas]),
+    }
+    store_fingerprints(conn, table_name, huellas=huellas)
+    _registrar_reemplazo(conn, table_name, pair_fingerprints(previas, huellas), corrida)
+
+
+def stream_excel_to_db(chunk_rows=None):
+    """
+    Variante de sync_excel_to_db para hojas con cientos de miles de filas:
+    cada hoja se lee en bloques de chunk_rows filas (STREAM_CHUNK_ROWS por
+    defecto), se limpia con las mismas reglas del reader y se inserta bloque a
+    bloque en una tabla staging que reemplaza a la final al terminar.
+    La memoria queda acotada por el tamaño del bloque, no por el de la hoja.
+    """
+    log("🌊 Iniciando sincronización por bloques de Excels hacia la base de datos...")
+
+    total = 0
+    actualizadas = 0
+
+    try:
+        with writer() as conn:
+            corrida = open_run(conn, "stream")
+            for hoja, bloques in iter_chunks(chunk_rows):
+                total += 1
+                table_name = sanitize_table_name(hoja)
+                log(f"🧩 Volcando hoja '{hoja}' → tabla '{table_name}' por bloques...")
+                try:
+                    huellas = []
+                    previas = stored_fingerprints(conn, table_name)
+                    filas = stream_chunks_to_db(
+                        _con_huellas(bloques, huellas), table_name, conn,
+                        antes=lambda c: _antes_del_swap(c, table_name, corrida),
+                        despues=lambda c: _despues_del_swap(c, table_name, previas, huellas, corrida),
+                    )
+                    if not filas:
+                        log(f"⚠️ Hoja '{hoja}' vacía, se omite.")
+                        continue
+
+                    log(f"✅ '{hoja}' sincronizada correctamente ({filas} filas).")
+                    actualizadas += 1
+
+                except Exception as e:
+                    log(f"❌ Error procesando hoja '{hoja}': {e}")
+
+            close_run(conn, corrida)
+            sync_history(conn)
+            sync_indexes(conn)
+            refresh_summaries(conn)
+
+    except Exception as e:
+        log(f"💥 Error crítico durante la sincronización por bloques: {e}")
+
+    log(f"\n🚀 Sincronización por bloques finalizada.")
+    log(f"📊 Resultado: {actualizadas}/{total} hojas sincronizadas correctamente.")
+    log(f"🗃️ Base de datos actualizada en: {DB_PATH}\n")
+
 # ==========================================================
 # MODO DIRECTO (EJECUCIÓN INDEPENDIENTE)
 # ==========================================================
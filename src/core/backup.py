@@ -3,7 +3,7 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-import shutil
+import sqlite3
 from datetime import datetime
 from src.core.config import DB_PATH, BACKUP_PATH, PROJECT_NAME
 from src.core.logger import log
@@ -20,7 +20,13 @@ def create_backup():
             return None
 
         backup_file = BACKUP_PATH / f"{PROJECT_NAME}_{timestamp}.sqlite"
-        shutil.copy2(src, backup_file)
+        # API de backup de SQLite: incluye lo confirmado que aún está en el -wal
+        origen, destino = sqlite3.connect(src), sqlite3.connect(backup_file)
+        try:
+            origen.backup(destino)
+        finally:
+            destino.close()
+            origen.close()
         log(f"🧾 Respaldo creado: {backup_file.name}")
         return backup_file
 
@@ -57,6 +57,42 @@ else:
 
 # === CONFIGURACIONES GENERALES ===
 SCHEDULE_INTERVAL_MINUTES = int(os.getenv("SCHEDULE_INTERVAL_MINUTES", 5))
+# Procesos para leer los Excels en paralelo (1 = lectura secuencial)
+READER_WORKERS = int(os.getenv("READER_WORKERS", 1))
+# Procesos para comparar hojas contra la base en paralelo (1 = comparación secuencial)
+COMPARATOR_WORKERS = int(os.getenv("COMPARATOR_WORKERS", 1))
+# Tamaño máximo de la caché de hojas procesadas (PROCESSED_PATH/sheets)
+SHEET_CACHE_MAX_MB = float(os.getenv("SHEET_CACHE_MAX_MB", 200))
+# Filas por bloque en la carga por streaming (hojas muy grandes)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 5000))
+
+# === SQLITE (escritura masiva) ===
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Negativo = KiB (-65536 → 64 MB de caché de páginas)
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -65536))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+# Alcance de la transacción de sincronización: "table" (una por tabla) o "run" (toda la ejecución).
+# Solo aplica al pipeline: la carga por bloques confirma por bloque y no admite "run"
+SQLITE_TRANSACTION = os.getenv("SQLITE_TRANSACTION", "table")
+# Pool: conexiones de solo lectura simultáneas y sentencias preparadas en caché por conexión
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", 4))
+# Segundos que reader() espera un lector libre con el pool lleno antes de abrir uno temporal
+SQLITE_READER_TIMEOUT = float(os.getenv("SQLITE_READER_TIMEOUT", 5))
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", 256))
+# Motor del diff por hoja: fingerprint (huellas persistidas) | sql (tabla TEMP en SQLite) | pandas (carga la tabla)
+DIFF_ENGINE = os.getenv("DIFF_ENGINE", "fingerprint").strip().lower()
+# Diferencia máxima entre montos para considerarlos iguales al detectar modificados
+DIFF_TOLERANCE = float(os.getenv("DIFF_TOLERANCE", 0.005))
+# Historial de versiones (SCD2) por tabla: nombres separados por coma, '*' = todas, vacío = sin historial
+HISTORY_TABLES = [t.strip() for t in os.getenv("HISTORY_TABLES", "").split(",") if t.strip()]
+# Log append-only de eventos de cambio por corrida (_dp_events): true | false
+CHANGE_EVENTS = os.getenv("CHANGE_EVENTS", "true").strip().lower() in ("1", "true", "si", "yes")
+# Índices tras cada sincronización: columnas separadas por coma, 'a+b' = índice compuesto
+INDEX_COLUMNS = [
+    c.strip() for c in os.getenv("INDEX_COLUMNS", "fecha,responsable,portafolio+responsable,tipo_mov").split(",")
+    if c.strip()
+]
 
 # ==========================================================
 # FUNCIÓN DE VALIDACIÓN DE ENTORNO
@@ -6,26 +6,228 @@
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import os
+import time
+import queue
+import atexit
 import sqlite3
+import threading
 import pandas as pd
 import unicodedata
-from core.config import DB_PATH
+from contextlib import contextmanager
+from core.config import (
+    DB_PATH, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE, SQLITE_TEMP_STORE,
+    SQLITE_READERS, SQLITE_READER_TIMEOUT, SQLITE_STATEMENT_CACHE
+)
 from core.logger import log
+from core.schema import create_typed_table
+
+# Tablas internas de DataPulse (registro de esquema, etc.): no son hojas
+INTERNAL_PREFIX = "_dp_"
+# Huellas por fila del comparator (ver bridge/comparator.py)
+FINGERPRINT_TABLE = f"{INTERNAL_PREFIX}fingerprints"
+FINGERPRINT_SETS = f"{INTERNAL_PREFIX}fingerprint_sets"
+
+
+def is_internal_table(name: str) -> bool:
+    """True para las tablas auxiliares de DataPulse o de SQLite (no provienen de una hoja)."""
+    return str(name).startswith((INTERNAL_PREFIX, "sqlite_"))
 
 # ==========================================================
 # 🔗 CONEXIÓN A LA BASE DE DATOS
 # ==========================================================
-def create_connection():
-    """Crea o abre una conexión a la base de datos SQLite."""
+def apply_pragmas(conn):
+    """Ajustes de escritura masiva (journal, synchronous, caché y temporales) del .env."""
+    conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+
+
+def create_connection(tuned: bool = False):
+    """
+    Crea o abre una conexión a la base de datos SQLite.
+    - tuned: aplica los pragmas de escritura masiva (una conexión por ejecución).
+    """
     try:
         conn = sqlite3.connect(DB_PATH)
+        if tuned:
+            apply_pragmas(conn)
         log(f"🧩 Conexión establecida con la base de datos: {DB_PATH}")
         return conn
     except Exception as e:
         log(f"❌ Error al conectar con la base de datos: {e}")
         return None
 
+
+@contextmanager
+def transaction(conn, nombre: str = "datapulse"):
+    """
+    Transacción anidable basada en SAVEPOINT:
+    - Sin transacción abierta, el SAVEPOINT la abre y RELEASE la confirma.
+    - Dentro de una transacción mayor (toda la ejecución) solo deshace su parte.
+    """
+    conn.execute(f'SAVEPOINT "{nombre}"')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute(f'ROLLBACK TO "{nombre}"')
+        conn.execute(f'RELEASE "{nombre}"')
+        raise
+    conn.execute(f'RELEASE "{nombre}"')
+
+# ==========================================================
+# 🏊 POOL DE CONEXIONES (1 ESCRITOR + N LECTORES)
+# ==========================================================
+_pool_lock = threading.Lock()
+_writer_lock = threading.RLock()
+_writer = None
+_writer_depth = 0
+_readers = queue.LifoQueue()
+_readers_abiertos = 0
+_lectores_hilo = threading.local()
+_pool_pid = os.getpid()
+
+
+def _connect(readonly: bool = False):
+    """Conexión usable desde cualquier hilo (una a la vez) con caché de sentencias."""
+    if readonly:
+        destino, uri = f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", True
+    else:
+        destino, uri = DB_PATH, False
+    return sqlite3.connect(
+        destino, uri=uri, check_same_thread=False, cached_statements=SQLITE_STATEMENT_CACHE
+    )
+
+
+def _check_pid():
+    """En un proceso hijo (fork) no se reutilizan las conexiones del padre."""
+    global _pool_lock, _writer_lock, _writer, _writer_depth, _readers, _readers_abiertos
+    global _lectores_hilo, _pool_pid
+    if os.getpid() != _pool_pid:
+        _pool_lock, _writer_lock = threading.Lock(), threading.RLock()
+        _writer, _writer_depth = None, 0
+        _readers, _readers_abiertos = queue.LifoQueue(), 0
+        _lectores_hilo = threading.local()
+        _pool_pid = os.getpid()
+
+
+def _abrir_lector():
+    conn = _connect(readonly=True)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+    return conn
+
+
+def _tomar_lector():
+    """
+    Devuelve (conexión, temporal).
+    - Primero un lector libre del pool, o uno nuevo si no se llegó a SQLITE_READERS.
+    - Con el pool lleno espera como mucho SQLITE_READER_TIMEOUT segundos; si el
+      hilo ya tiene un lector abierto (reader() anidado) no espera: ningún otro
+      hilo tiene por qué devolver uno y se bloquearía para siempre.
+    - Si no llega ninguno, abre una conexión temporal fuera del límite que se
+      cierra al salir del bloque en vez de volver al pool.
+    """
+    global _readers_abiertos
+    try:
+        return _readers.get_nowait(), False
+    except queue.Empty:
+        pass
+
+    with _pool_lock:
+        if _readers_abiertos < SQLITE_READERS:
+            conn = _abrir_lector()
+            _readers_abiertos += 1
+            return conn, False
+
+    if not getattr(_lectores_hilo, "abiertos", 0):
+        try:
+            return _readers.get(timeout=SQLITE_READER_TIMEOUT), False
+        except queue.Empty:
+            pass
+
+    log(
+        f"⚠️ Pool de lectores lleno ({SQLITE_READERS} en uso): "
+        "se abre una conexión temporal fuera del límite."
+    )
+    return _abrir_lector(), True
+
+
+@contextmanager
+def reader():
+    """
+    Conexión de solo lectura del pool (hasta SQLITE_READERS abiertas a la vez).
+    Los pragmas se aplican una sola vez al crearla y sus sentencias preparadas
+    quedan en caché entre usos. Se devuelve al pool al salir del bloque (las
+    temporales, abiertas con el pool lleno, se cierran).
+    """
+    _check_pid()
+    conn, temporal = _tomar_lector()
+    _lectores_hilo.abiertos = getattr(_lectores_hilo, "abiertos", 0) + 1
+    try:
+        yield conn
+    finally:
+        _lectores_hilo.abiertos -= 1
+        if temporal:
+            conn.close()
+        else:
+            if conn.in_transaction:
+                conn.rollback()
+            _readers.put(conn)
+
+
+@contextmanager
+def writer():
+    """
+    Conexión única de escritura (pragmas de escritura masiva aplicados una vez).
+    Un hilo a la vez; reentrante. Al salir del bloque más externo confirma lo
+    pendiente, o lo deshace si hubo una excepción.
+    """
+    global _writer, _writer_depth
+    _check_pid()
+    with _writer_lock:
+        if _writer is None:
+            _writer = _connect()
+            apply_pragmas(_writer)
+            log(f"🧩 Conexión de escritura establecida con la base de datos: {DB_PATH}")
+
+        _writer_depth += 1
+        try:
+            yield _writer
+        except BaseException:
+            if _writer_depth == 1 and _writer.in_transaction:
+                _writer.rollback()
+            raise
+        else:
+            if _writer_depth == 1 and _writer.in_transaction:
+                _writer.commit()
+        finally:
+            _writer_depth -= 1
+
+
+def close_pool():
+    """Cierra la conexión de escritura y los lectores inactivos."""
+    global _writer, _readers_abiertos
+    if os.getpid() != _pool_pid:
+        return
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+    while True:
+        try:
+            _readers.get_nowait().close()
+            _readers_abiertos -= 1
+        except queue.Empty:
+            break
+
+
+atexit.register(close_pool)
+
 # ==========================================================
 # 🧱 NORMALIZACIÓN DE NOMBRES
 # ==========================================================
@@ -69,15 +271,62 @@ def sanitize_table_name(name: str) -> str:
 # ==========================================================
 # 💾 GUARDADO DE DATAFRAMES
 # ==========================================================
-def save_dataframe_to_db(df: pd.DataFrame, table_name: str):
+def dataframe_rows(df: pd.DataFrame) -> list:
+    """Filas de df como tuplas para executemany (NaN → NULL)."""
+    valores = df.astype(object)
+    return list(valores.where(valores.notna(), None).itertuples(index=False, name=None))
+
+
+def insert_rows(conn, table: str, columns, rows):
+    """INSERT preparado con executemany. No confirma (usar dentro de transaction)."""
+    columnas = ", ".join(f'"{c}"' for c in columns)
+    marcas = ", ".join("?" * len(columns))
+    conn.executemany(f'INSERT INTO "{table}" ({columnas}) VALUES ({marcas})', rows)
+
+
+def log_rate(table: str, filas: int, inicio: float, accion: str = "escritas"):
+    """Registra filas/segundo de una escritura iniciada en `inicio` (perf_counter)."""
+    seg = max(time.perf_counter() - inicio, 1e-9)
+    log(f"⏱️ '{table}': {filas} filas {accion} en {seg:.2f}s ({filas / seg:,.0f} filas/s).")
+
+
+def forget_fingerprints(conn, table: str):
+    """Invalida las huellas del comparator de una tabla que se reescribe. No confirma."""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FINGERPRINT_SETS,)
+    ).fetchone()
+    if existe:
+        conn.execute(f'DELETE FROM "{FINGERPRINT_SETS}" WHERE tabla = ?', (table,))
+        conn.execute(f'DELETE FROM "{FINGERPRINT_TABLE}" WHERE tabla = ?', (table,))
+
+
+def write_dataframe(conn, df: pd.DataFrame, table_name: str) -> int:
+    """
+    Reemplaza la tabla con el contenido de df:
+    - CREATE TABLE con el esquema tipado (core.schema), estable entre ejecuciones.
+    - Inserción con executemany sobre una sentencia preparada.
+    No confirma: el llamador decide el alcance con transaction().
+    """
+    table = sanitize_table_name(table_name)
+    inicio = time.perf_counter()
+    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    forget_fingerprints(conn, table)
+    create_typed_table(conn, table, df)
+    insert_rows(conn, table, df.columns, dataframe_rows(df))
+    log_rate(table, len(df), inicio)
+    return len(df)
+
+
+def save_dataframe_to_db(df: pd.DataFrame, table_name: str, conn=None):
     """
     Guarda un DataFrame en la base de datos:
-    - Crea o reemplaza la tabla según corresponda.
+    - Crea o reemplaza la tabla según corresponda (una transacción).
     - Mantiene nombres seguros para múltiples Excels.
+    - conn: conexión compartida; None = conexión de escritura del pool.
     """
-    conn = create_connection()
     if conn is None:
-        return
+        with writer() as conn:
+            return save_dataframe_to_db(df, table_name, conn)
 
     table = sanitize_table_name(table_name)
 
@@ -86,34 +335,108 @@ def save_dataframe_to_db(df: pd.DataFrame, table_name: str):
             log(f"⚠️ '{table_name}' está vacía. No se guardará en la base.")
             return
 
-        df.to_sql(table, conn, if_exists="replace", index=False)
+        with transaction(conn):
+            write_dataframe(conn, df, table)
         log(f"✅ Tabla '{table}' guardada correctamente ({len(df)} filas).")
 
     except Exception as e:
         log(f"💥 Error al guardar '{table_name}' → {e}")
 
-    finally:
-        conn.close()
+# ==========================================================
+# 🌊 CARGA POR BLOQUES (STAGING + SWAP)
+# ==========================================================
+def stream_chunks_to_db(chunks, table_name: str, conn, antes=None, despues=None) -> int:
+    """
+    Vuelca una hoja que llega en bloques (iterable de DataFrames) sin tenerla
+    entera en memoria:
+    - Cada bloque se inserta con executemany en la tabla '<tabla>__staging'
+      en su propio transaction() (un commit por bloque → journal acotado).
+    - Al terminar, la staging reemplaza a la tabla final en un solo
+      transaction(); si algo falla la tabla original queda intacta.
+    - antes / despues: funciones (conn) que corren dentro de la transacción del
+      reemplazo, antes de borrar la tabla final y después de renombrar la
+      staging (huellas, historial y eventos se confirman junto con los datos).
+    - Se niega a correr con una transacción abierta en conn (transaction() del
+      llamador o SQLITE_TRANSACTION=run): el commit por bloque rompería su
+      alcance y sin él la staging completa iría a un solo journal.
+    Retorna las filas insertadas (0 = hoja vacía, la tabla no se toca).
+    """
+    if conn.in_transaction:
+        raise RuntimeError(
+            f"stream_chunks_to_db('{table_name}') confirma por bloques: "
+            "no se puede usar con una transacción abierta en la conexión."
+        )
+    table = sanitize_table_name(table_name)
+    staging = f"{table}__staging"
+    filas = 0
+
+    inicio = time.perf_counter()
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        creada = False
+        for df in chunks:
+            with transaction(conn, "bloque"):
+                if not creada:
+                    create_typed_table(conn, table, df, staging)
+                    creada = True
+                insert_rows(conn, staging, df.columns, dataframe_rows(df))
+            filas += len(df)
+
+        if not creada:
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            return 0
+
+        # Modo legacy: el RENAME no revalida ni reescribe las vistas del consolidator,
+        # que siguen apuntando por nombre a la tabla final
+        conn.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            with transaction(conn, "swap"):
+                if antes:
+                    antes(conn)
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                forget_fingerprints(conn, table)
+                conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+                if despues:
+                    despues(conn)
+        finally:
+            conn.execute("PRAGMA legacy_alter_table=OFF")
+        log_rate(table, filas, inicio)
+        return filas
+
+    except Exception:
+        # Cada transaction() ya deshizo su parte; solo queda la staging confirmada
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        raise
 
 # ==========================================================
 # 🧠 INICIALIZACIÓN GLOBAL MULTIEXCEL
 # ==========================================================
-def init_database_from_reader(dataframes: dict):
+def init_database_from_reader(dataframes):
     """
-    Recibe el dict de `reader.py` con todas las hojas
-    (de varios Excels) y las guarda en la base SQLite.
+    Recibe las hojas de `reader.py` (de varios Excels) y las guarda en la base SQLite.
+    - dataframes: dict {hoja: DataFrame} o un iterable de pares (hoja, DataFrame),
+      p. ej. reader.iter_sheets(); en ese caso se guarda hoja por hoja sin
+      retener las anteriores.
     """
-    if not dataframes:
-        log("⚠️ No se recibieron DataFrames para guardar.")
-        return
+    if isinstance(dataframes, dict):
+        if not dataframes:
+            log("⚠️ No se recibieron DataFrames para guardar.")
+            return
+        log(f"📦 Iniciando volcado de {len(dataframes)} hojas hacia la base de datos...")
+        dataframes = dataframes.items()
+    else:
+        log("📦 Iniciando volcado de hojas hacia la base de datos (hoja por hoja)...")
 
-    total = len(dataframes)
-    log(f"📦 Iniciando volcado de {total} hojas hacia la base de datos...")
+    total = guardadas = 0
+    with writer() as conn:
+        for hoja, df in dataframes:
+            total += 1
+            save_dataframe_to_db(df, hoja, conn)
+            guardadas += 1
 
-    guardadas = 0
-    for hoja, df in dataframes.items():
-        save_dataframe_to_db(df, hoja)
-        guardadas += 1
+    if not total:
+        log("⚠️ No se recibieron DataFrames para guardar.")
+        return
 
     log(f"🚀 Volcado completado: {guardadas}/{total} tablas guardadas correctamente.")
     log(f"🗃️ Base actualizada en: {DB_PATH}")
@@ -0,0 +1,114 @@
+# src/core/schema.py
+# ==========================================================
+# DataPulse v4.0 – Esquema tipado de las tablas
+# Decide el tipo declarado de cada columna al crear una tabla y lo
+# registra en la base para que no cambie de una ejecución a otra.
+# ==========================================================
+import pandas as pd
+
+# ==========================================================
+# CONFIGURACIÓN BASE
+# ==========================================================
+# Columnas que el reader convierte (nombre en mayúsculas, sin espacios laterales)
+REAL_COLUMNS = {"PARCIAL", "MONTO", "ABONO", "RETIRO", "SALDO"}
+DATE_COLUMNS = {"FECHA"}
+
+# Registro persistente: (tabla, columna) → tipo declarado
+SCHEMA_TABLE = "_dp_schema"
+
+# ==========================================================
+# INFERENCIA
+# ==========================================================
+def infer_type(column, serie: pd.Series) -> str:
+    """
+    Tipo declarado para una columna nueva:
+    - REAL: montos (REAL_COLUMNS) y columnas float.
+    - INTEGER: columnas enteras.
+    - TEXT: fechas (ISO 'YYYY-MM-DD', ordenable como texto) y el resto,
+      incluidas las columnas completamente vacías.
+    """
+    nombre = str(column).strip().upper()
+    if nombre in REAL_COLUMNS:
+        return "REAL"
+    if nombre in DATE_COLUMNS:
+        return "TEXT"
+    if pd.api.types.is_bool_dtype(serie):
+        return "INTEGER"
+    if pd.api.types.is_integer_dtype(serie):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(serie):
+        return "REAL"
+    return "TEXT"
+
+# ==========================================================
+# REGISTRO
+# ==========================================================
+def _registro(conn, table: str) -> dict:
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SCHEMA_TABLE,)
+    ).fetchone()
+    if not existe:
+        return {}
+    return dict(conn.execute(
+        f'SELECT columna, tipo FROM "{SCHEMA_TABLE}" WHERE tabla = ?', (table,)
+    ))
+
+
+def column_types(conn, table: str, df: pd.DataFrame) -> dict:
+    """
+    Tipos de las columnas de df para la tabla: el registrado si la columna ya
+    se vio antes; si no, el inferido. No escribe nada.
+    """
+    registrados = _registro(conn, table)
+    return {c: registrados.get(str(c)) or infer_type(c, df[c]) for c in df.columns}
+
+
+def register_types(conn, table: str, tipos: dict):
+    """Registra los tipos de columnas nuevas (los ya registrados no cambian). No confirma."""
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{SCHEMA_TABLE}" ('
+        "tabla TEXT NOT NULL, columna TEXT NOT NULL, tipo TEXT NOT NULL, "
+        "PRIMARY KEY (tabla, columna))"
+    )
+    conn.executemany(
+        f'INSERT OR IGNORE INTO "{SCHEMA_TABLE}" (tabla, columna, tipo) VALUES (?, ?, ?)',
+        [(table, str(c), t) for c, t in tipos.items()],
+    )
+
+
+def create_table_sql(table: str, tipos: dict, temporal: bool = False) -> str:
+    """CREATE TABLE con los tipos dados (mismo texto en cada ejecución; TEMP si temporal)."""
+    columnas = ",\n  ".join(f'"{c}" {t}' for c, t in tipos.items())
+    return f'CREATE {"TEMP " if temporal else ""}TABLE "{table}" (\n  {columnas}\n)'
+
+
+def table_sql(conn, table: str, df: pd.DataFrame) -> str:
+    """CREATE TABLE que corresponde hoy a df en `table` (para comparar con sqlite_master)."""
+    return create_table_sql(table, column_types(conn, table, df))
+
+
+def create_typed_table(conn, table: str, df: pd.DataFrame, nombre: str = None):
+    """
+    Crea la tabla con el esquema tipado de df y registra los tipos nuevos.
+    - nombre: nombre físico (p. ej. la staging); los tipos se registran bajo `table`.
+    No confirma: el llamador decide el alcance con transaction().
+    """
+    tipos = column_types(conn, table, df)
+    register_types(conn, table, tipos)
+    conn.execute(create_table_sql(nombre or table, tipos))
+    return tipos
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from core.db_utils import reader
+
+    with reader() as conn:
+        filas = conn.execute(
+            f'SELECT tabla, tipo, COUNT(*) FROM "{SCHEMA_TABLE}" GROUP BY tabla, tipo ORDER BY tabla'
+        ).fetchall()
+    print(f"\n🧾 Registro de esquema ({SCHEMA_TABLE}):")
+    for tabla, tipo, n in filas:
+        print(f" • {tabla}: {n} columnas {tipo}")
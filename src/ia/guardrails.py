@@ -1,9 +1,11 @@
 # src/ia/guardrails.py
 import re
-import sqlite3
+import sys
 from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 from src.core.logger import log
-from src.core.config import DB_PATH
+from core.db_utils import reader
 
 # === CONFIGURACIÓN BASE ===
 SAFE_SQL_COMMANDS = {"SELECT", "WITH"}  # Solo lectura
@@ -60,11 +62,8 @@ def safe_execute_sql(query: str) -> list[tuple]:
         query = sanitize_sql_query(query)
         log(f"🧩 Ejecutando consulta validada: {query}")
 
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute(query)
-        rows = cur.fetchall()
-        conn.close()
+        with reader() as conn:
+            rows = conn.execute(query).fetchall()
 
         log(f"✅ Consulta ejecutada correctamente: {len(rows)} filas obtenidas.")
         return rows
@@ -2,12 +2,12 @@
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-import sqlite3
 import pandas as pd
 import re
 from datetime import datetime
-from src.core.config import DB_PATH
+from core.db_utils import reader
 from src.core.logger import log
 from src.ia.summarizer import get_all_tables
 from src.ia.guardrails import safe_execute_sql  # 🔒 Protección de consultas
@@ -69,9 +69,8 @@ def detect_intent_and_generate_sql(query_text: str) -> str | None:
 
     # --- Detectar columna monetaria
     monto_fields = ["monto", "importe", "total"]
-    conn = sqlite3.connect(DB_PATH)
-    cols = pd.read_sql_query(f"PRAGMA table_info('{table}')", conn)["name"].tolist()
-    conn.close()
+    with reader() as conn:
+        cols = pd.read_sql_query(f"PRAGMA table_info('{table}')", conn)["name"].tolist()
     monto_col = next((c for c in cols if any(m in c.lower() for m in monto_fields)), None)
     if not monto_col:
         log("⚠️ No se encontró una columna de monto en la tabla.")
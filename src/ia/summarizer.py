@@ -2,31 +2,28 @@
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 import pandas as pd
-import sqlite3
 from datetime import datetime
-from src.core.config import DB_PATH
+from core.db_utils import reader, is_internal_table
 from src.core.logger import log
 
 
 def get_all_tables():
     """Obtiene todas las tablas disponibles en la base de datos."""
-    conn = sqlite3.connect(DB_PATH)
-    try:
+    with reader() as conn:
         tables = pd.read_sql_query(
             "SELECT name FROM sqlite_master WHERE type='table';", conn
         )["name"].tolist()
-        return tables
-    finally:
-        conn.close()
+        return [t for t in tables if not is_internal_table(t)]
 
 
 def summarize_table(table: str):
     """Analiza una tabla bancaria y devuelve un resumen numérico."""
-    conn = sqlite3.connect(DB_PATH)
     try:
-        df = pd.read_sql_query(f"SELECT * FROM '{table}'", conn)
+        with reader() as conn:
+            df = pd.read_sql_query(f"SELECT * FROM '{table}'", conn)
         if df.empty:
             return None
 
@@ -68,8 +65,6 @@ def summarize_table(table: str):
     except Exception as e:
         log(f"⚠️ Error analizando tabla '{table}': {e}")
         return None
-    finally:
-        conn.close()
 
 
 def generate_summary_report():
@@ -0,0 +1,131 @@
+# ==========================================================
+# DataPulse Tool – Benchmark del diff con claves muy repetidas
+# Tabla sintética con pocas claves distintas (miles de filas por clave),
+# altas / bajas / modificaciones conocidas. Verifica que los tres motores
+# (_comparar, _comparar_huellas y _comparar_sql) den exactamente esos
+# conteos, mide tiempo y memoria pico de Python (la carga de la tabla
+# guardada incluida) y compara con el merge por claves anterior (producto
+# cartesiano por grupo).
+# Uso: python tools/bench_diff_duplicados.py [filas] [claves]
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import time
+import sqlite3
+import tracemalloc
+import numpy as np
+import pandas as pd
+from core.logger import log
+from core.db_utils import write_dataframe
+from bridge.comparator import (
+    _comparar, _comparar_huellas, _comparar_sql, load_table_from_db, store_fingerprints,
+    normalize_columns, coerce_types,
+)
+
+FILAS = 200_000
+CLAVES = 20
+CAMBIOS = 500            # altas, bajas y modificaciones de cada tipo
+LIMITE_LEGACY = 5_000_000  # filas de merge por encima de las cuales no se ejecuta el anterior
+
+# ==========================================================
+# DATOS
+# ==========================================================
+def _tabla(filas: int, claves: int) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    fechas = pd.date_range("1700-01-01", periods=claves, freq="D").strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "FECHA": rng.choice(fechas, filas),
+        "RESPONSABLE": rng.choice(["ana", "luis", "rosa"], filas).astype(object),
+        "DESCRIPCION": rng.choice([f"mov {i}" for i in range(50)], filas).astype(object),
+        "MONTO": rng.integers(1, 500, filas).astype(float),
+        "SALDO": rng.random(filas).round(2),
+    })
+
+
+def _mutar(df: pd.DataFrame, claves: int):
+    """
+    Bajas en la segunda mitad de las claves, modificaciones en la primera y
+    altas con claves nuevas (también repetidas). Así el resultado esperado
+    no es ambiguo: (nuevo, bajas, modificaciones).
+    """
+    rng = np.random.default_rng(5)
+    orden = np.sort(df["FECHA"].unique())
+    primera = df.index[df["FECHA"].isin(orden[: claves // 2])]
+    segunda = df.index[df["FECHA"].isin(orden[claves // 2:])]
+    mods = rng.choice(primera, CAMBIOS, replace=False)
+    bajas = rng.choice(segunda, CAMBIOS, replace=False)
+
+    nuevo = df.copy()
+    nuevo.loc[mods, "SALDO"] = -1.0
+    altas = df.sample(CAMBIOS, random_state=3).assign(FECHA=[f"1699-12-0{1 + i % 5}" for i in range(CAMBIOS)])
+    return pd.concat([nuevo.drop(index=bajas), altas], ignore_index=True)
+
+
+def _pares_legacy(old: pd.DataFrame, new: pd.DataFrame) -> int:
+    """Filas que producía el merge por claves anterior: Σ (repeticiones old × new) por clave."""
+    a = old["FECHA"].value_counts()
+    b = new["FECHA"].value_counts()
+    return int((a * b.reindex(a.index, fill_value=0)).sum())
+
+# ==========================================================
+# BENCHMARK
+# ==========================================================
+def benchmark(filas: int = FILAS, claves: int = CLAVES):
+    old = _tabla(filas, claves)
+    new = _mutar(old, claves)
+    esperado = (CAMBIOS, CAMBIOS, CAMBIOS)
+    log(f"🧪 {filas} filas, {claves} claves (~{filas // claves} repeticiones por clave); "
+        f"esperado +{esperado[0]} / -{esperado[1]} / ✏️ {esperado[2]}.")
+
+    conn = sqlite3.connect(":memory:")
+    write_dataframe(conn, old, "bench")
+    store_fingerprints(conn, "bench", old)
+    motores = {
+        "pandas": lambda: _comparar(load_table_from_db("bench", conn, rowid=True), new),
+        "huellas": lambda: _comparar_huellas(conn, "bench", new),
+        "sql": lambda: _comparar_sql(conn, "bench", new),
+    }
+
+    ok = True
+    for nombre, motor in motores.items():
+        t0 = time.perf_counter()
+        r = motor()
+        t = time.perf_counter() - t0
+        tracemalloc.start()  # segunda pasada solo para la memoria (tracemalloc la hace más lenta)
+        motor()
+        pico = tracemalloc.get_traced_memory()[1] / 1048576
+        tracemalloc.stop()
+        if r is None:
+            log(f"❌ Motor {nombre}: no se aplicó.")
+            ok = False
+            continue
+        obtenido = tuple(len(r[k]) for k in ("nuevos", "eliminados", "modificados"))
+        marca = "✅" if obtenido == esperado else "❌"
+        ok &= obtenido == esperado
+        log(f"{marca} Motor {nombre}: +{obtenido[0]} / -{obtenido[1]} / ✏️ {obtenido[2]} "
+            f"en {t:.2f}s (pico Python {pico:.0f} MB).")
+    conn.close()
+
+    pares = _pares_legacy(old, new)
+    log(f"📐 El merge por claves anterior generaba {pares:,} filas (la entrada tiene {filas:,}).")
+    if pares <= LIMITE_LEGACY:
+        t0 = time.perf_counter()
+        coerce_types(normalize_columns(new)).merge(coerce_types(normalize_columns(old)), on=["fecha"])
+        log(f"⏱️ Merge anterior: {time.perf_counter() - t0:.2f}s.")
+    else:
+        log(f"⏭️ Merge anterior omitido (más de {LIMITE_LEGACY:,} filas).")
+    return ok
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(0 if benchmark(*args) else 1)
@@ -0,0 +1,84 @@
+# ==========================================================
+# DataPulse Tool – Benchmark de detección de estructura
+# Compara la detección anterior (ws.cell por columna × fila, acceso
+# aleatorio en read_only) contra _detectar_estructura (ventana acotada).
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import time
+from openpyxl import load_workbook
+from core.config import EXCELS
+from core.logger import log
+from bridge.reader import OMITIR_HOJAS, _detectar_estructura
+
+TOP_HOJAS = 5  # hojas más anchas a medir
+
+
+# ==========================================================
+# DETECCIÓN ANTERIOR (referencia)
+# ==========================================================
+def _detectar_legacy(ws):
+    """Encabezado + última columna tal como lo hacía el lector original."""
+    header_row = 1
+    for idx, row in enumerate(ws.iter_rows(min_row=1, max_row=ws.max_row), start=1):
+        if len([c.value for c in row if c.value not in (None, "")]) >= 3:
+            header_row = idx
+            break
+
+    max_col, max_row = ws.max_column, ws.max_row
+    last_valid_col = 0
+    for col_idx in range(1, max_col + 1):
+        if any(ws.cell(row=r, column=col_idx).value not in (None, "")
+               for r in range(header_row, min(max_row, header_row + 10))):
+            last_valid_col = col_idx
+    return header_row, last_valid_col
+
+
+def _medir(excel_path, hoja, detector):
+    wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[hoja]
+        t0 = time.perf_counter()
+        resultado = detector(ws)
+        return time.perf_counter() - t0, resultado[:2]
+    finally:
+        wb.close()
+
+
+def benchmark():
+    hojas = []
+    for key, excel_path in EXCELS.items():
+        if not excel_path.exists():
+            continue
+        wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+        for ws in wb.worksheets:
+            if ws.title not in OMITIR_HOJAS:
+                hojas.append((ws.max_column or 0, excel_path, ws.title))
+        wb.close()
+
+    if not hojas:
+        log("⚠️ No hay Excels configurados para el benchmark.")
+        return
+
+    hojas.sort(key=lambda h: h[0], reverse=True)
+    print(f"\n{'Hoja':<32}{'Cols':>6}{'Anterior (s)':>15}{'Ventana (s)':>14}{'x':>8}")
+    for ancho, excel_path, hoja in hojas[:TOP_HOJAS]:
+        t_old, r_old = _medir(excel_path, hoja, _detectar_legacy)
+        t_new, r_new = _medir(excel_path, hoja, lambda ws: (ws.reset_dimensions(), _detectar_estructura(iter(ws.rows)))[1])
+        marca = "" if r_old == r_new else f"  ⚠️ {r_old} ≠ {r_new}"
+        print(f"{hoja[:31]:<32}{ancho:>6}{t_old:>15.3f}{t_new:>14.4f}{t_old / max(t_new, 1e-9):>8.0f}{marca}")
+
+    log("✅ Benchmark de detección de estructura completado.")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,122 @@
+# ==========================================================
+# DataPulse Tool – Paridad de conversión numérica / fechas
+# Verifica que _to_number_series / _to_date_series (vectorizadas)
+# den exactamente lo mismo que col.apply(_to_number / _to_date): mismo
+# dtype y mismo valor por celda, sin confundir None con NaN.
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import time
+import numpy as np
+import pandas as pd
+from core.config import EXCELS
+from core.logger import log
+from bridge import reader
+from bridge.reader import (
+    _to_number, _to_date, _to_number_series, _to_date_series,
+    DATE_HINTS, NUMERIC_HINTS,
+)
+
+# ==========================================================
+# CASOS BORDE
+# ==========================================================
+CASOS_NUMERO = [
+    None, np.nan, "", "  ", "-", " - ", "0", "8", "-15", "70.8", "250.75",
+    "1.234,56", "1,234.56", "1.234.567,8", "1,234,567.8", "1,5", "12,", ",5",
+    "S/ 1,200.00", "$ -3.50", "US$ 1.000", "1.2.3", "--5", "5-", ".", "-.5",
+    "38247.22000000001", "1e5", "abc", "12-05-2025", "0.05", "000123",
+]
+
+CASOS_FECHA = [
+    None, np.nan, "", " ", "-", "2025-06-17", "2025-06-17 00:00:00",
+    " 2025-06-17T10:30:00 ", "17/06/2025", "01/10/2025", "1/2/2025",
+    "13-01-2025", "1-Ene", "1-Ene-2025", "15-Jan-2025", "Jan 15 2025",
+    "20250617", "texto", "31/02/2025", "2025/06/17",
+]
+
+# ==========================================================
+# FUNCIONES
+# ==========================================================
+def _celdas(serie):
+    """(tipo, valor) por celda; NaN se marca aparte para compararlo sin ambigüedad con None."""
+    return [("NaN", None) if isinstance(v, float) and np.isnan(v) else (type(v).__name__, v) for v in serie.tolist()]
+
+
+def _comparar(nombre, col, escalar, vectorizada):
+    """Compara col.apply(escalar) contra la vectorizada: dtype y cada celda."""
+    esperado = col.apply(escalar)
+    obtenido = vectorizada(col)
+    if esperado.dtype != obtenido.dtype or not esperado.index.equals(obtenido.index):
+        log(f"❌ Diferencia en '{nombre}': dtype {esperado.dtype} vs {obtenido.dtype}")
+        return False
+    distintas = [
+        (i, e, o) for i, e, o in zip(col.index, _celdas(esperado), _celdas(obtenido)) if e != o
+    ]
+    for i, e, o in distintas[:5]:
+        log(f"❌ Diferencia en '{nombre}' fila {i} ({col[i]!r}): {e} vs {o}")
+    return not distintas
+
+
+def _columnas_reales():
+    """Columnas FECHA/numéricas de los Excels configurados, antes de tipificar."""
+    columnas = []
+
+    def capturar(df, *args):
+        crudo, _ = reader._reparar_mojibake(df.copy())
+        crudo = crudo.replace({r"^\s*$": None, r"^\s*-\s*$": None}, regex=True)
+        for c in crudo.columns:
+            upper = str(c).strip().upper()
+            if upper in DATE_HINTS or upper in NUMERIC_HINTS:
+                columnas.append((upper, c, crudo[c]))
+        return original(df, *args)
+
+    original = reader._limpiar_dataframe
+    reader._limpiar_dataframe = capturar
+    try:
+        for key, path in EXCELS.items():
+            if path.exists():
+                reader._leer_workbook(key, path)
+    finally:
+        reader._limpiar_dataframe = original
+    return columnas
+
+
+def verificar_paridad():
+    ok = True
+    ok &= _comparar("casos número", pd.Series(CASOS_NUMERO, dtype=object), _to_number, _to_number_series)
+    ok &= _comparar("casos fecha", pd.Series(CASOS_FECHA, dtype=object), _to_date, _to_date_series)
+    ok &= _comparar("columna vacía", pd.Series([None, None], dtype=object), _to_number, _to_number_series)
+    ok &= _comparar("columna vacía", pd.Series([None, None], dtype=object), _to_date, _to_date_series)
+
+    t_escalar = t_vector = 0.0
+    columnas = _columnas_reales()
+    for upper, nombre, col in columnas:
+        escalar, vectorizada = (_to_date, _to_date_series) if upper in DATE_HINTS else (_to_number, _to_number_series)
+        ok &= _comparar(nombre, col, escalar, vectorizada)
+
+        t0 = time.perf_counter()
+        col.apply(escalar)
+        t1 = time.perf_counter()
+        vectorizada(col)
+        t_escalar += t1 - t0
+        t_vector += time.perf_counter() - t1
+
+    log(f"⏱️ {len(columnas)} columnas reales: apply {t_escalar:.3f}s | vectorizado {t_vector:.3f}s")
+    if ok:
+        log("✅ Paridad completa entre conversión escalar y vectorizada.")
+    else:
+        log("⚠️ Se encontraron diferencias de conversión (ver detalle arriba).")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_paridad() else 1)
@@ -0,0 +1,184 @@
+# ==========================================================
+# DataPulse Tool – Paridad de motores de diff
+# Para cada hoja real (claves repetidas incluidas) arma una tabla "vieja" en memoria,
+# aplica altas, bajas y modificaciones sintéticas y verifica que el diff por
+# huellas (_comparar_huellas) y el diff en SQLite (_comparar_sql) den lo
+# mismo que el diff pandas (_comparar).
+# También aplica el delta y comprueba que las huellas quedan al día, y
+# revisa la tolerancia en montos, las columnas cambiadas por fila y las
+# celdas del resumen compacto.
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+from core.logger import log
+from core.db_utils import write_dataframe, sanitize_table_name
+from bridge.reader import iter_sheets
+from bridge.comparator import (
+    IDX, CAMBIOS, _comparar, materialize_changes, _comparar_huellas, _comparar_sql, _entrada, load_table_from_db,
+    get_keys_for_sheet, _normalize_name,
+    store_fingerprints, refresh_fingerprints, FINGERPRINT_TABLE,
+)
+from bridge.updater import apply_changes
+
+FILAS = 5  # filas eliminadas / modificadas / nuevas por hoja
+
+# ==========================================================
+# FUNCIONES
+# ==========================================================
+def _mutar(df, keys):
+    """Copia de df con FILAS bajas, modificaciones (columna no clave) y altas."""
+    rng = np.random.default_rng(7)
+    nuevo = df.copy()
+    n = min(FILAS, len(df) // 4)
+    if not n:
+        return nuevo
+    pos = rng.choice(len(df), size=3 * n, replace=False)
+    bajas, mods, altas = pos[:n], pos[n:2 * n], pos[2 * n:]
+
+    no_clave = [c for c in df.columns if _normalize_name(c) not in keys]
+    if no_clave:
+        col = df.columns.get_loc(no_clave[0])
+        for p in mods:
+            nuevo.iloc[p, col] = f"cambio_{p}"
+
+    extra = df.iloc[altas].copy()
+    clave = df.columns[[_normalize_name(c) for c in df.columns].index(keys[-1])]
+    extra[clave] = [f"2099-01-{i + 1:02d}" if "fecha" in keys[-1] else f"alta_{p}" for i, p in enumerate(altas)]
+    nuevo = pd.concat([nuevo.drop(index=df.index[bajas]), extra], ignore_index=True)
+    return nuevo
+
+
+def _ordenado(df, por):
+    if df.empty:
+        return df.reset_index(drop=True)
+    return df.sort_values(por).reset_index(drop=True)
+
+
+def _mismo(a, b, por):
+    try:
+        pd.testing.assert_frame_equal(_ordenado(a, por), _ordenado(b, por), check_dtype=False, check_index_type=False)
+        return True
+    except AssertionError as e:
+        log(f"   ↳ {e}")
+        return False
+
+
+def _casos_tolerancia():
+    """Montos dentro de la tolerancia no cuentan; fuera de ella sí, con su columna."""
+    old = pd.DataFrame({
+        "fecha": ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"],
+        "monto": [100.0, 200.0, 300.0, None],
+        "saldo": [1.0, 2.0, 3.0, 4.0],
+        "nota_1": ["a", "b", None, "d"],
+    })
+    new = old.copy()
+    new.loc[0, "monto"] = 100.001      # dentro de la tolerancia
+    new.loc[1, "monto"] = 200.01       # fuera
+    new.loc[2, "nota_1"] = "c"         # None → texto
+    new.loc[3, ["monto", "saldo"]] = [5.0, 4.0000001]
+    r = _comparar(old, new)
+    obtenido = dict(zip(r["modificados"][f"{IDX}_new"], r["modificados"][CAMBIOS]))
+    esperado = {1: ("monto",), 2: ("nota_1",), 3: ("monto",)}
+    if obtenido != esperado:
+        log(f"❌ Tolerancia / columnas cambiadas: {obtenido} ≠ {esperado}")
+        return False
+
+    c = r["celdas"]
+    celdas = {
+        (int(i), c["columnas"][j]): (a, d)
+        for i, j, a, d in zip(c["idx"], c["columna"], c["antes"], c["despues"])
+    }
+    esperadas = {(1, "monto"): (200.0, 200.01), (2, "nota_1"): (None, "c"), (3, "monto"): (None, 5.0)}
+    ancho = materialize_changes({"celdas": c}, "modificados")
+    if celdas != esperadas or dict(zip(ancho[f"{IDX}_new"], ancho[CAMBIOS])) != esperado:
+        log(f"❌ Celdas del resumen compacto: {celdas} ≠ {esperadas}")
+        return False
+    log("✅ Tolerancia en montos, columnas cambiadas y celdas por fila.")
+    return True
+
+
+def verificar_paridad():
+    ok = _casos_tolerancia()
+    t_pandas = t_huellas = t_sql = 0.0
+    hojas = 0
+    for hoja, df in iter_sheets():
+        keys = get_keys_for_sheet(sorted(_normalize_name(c) for c in df.columns))
+        if not keys or df.empty:
+            continue
+        if len(df) < 8:
+            continue
+
+        table = sanitize_table_name(hoja)
+        conn = sqlite3.connect(":memory:")
+        write_dataframe(conn, df, table)
+        store_fingerprints(conn, table, df)
+        nuevo = _mutar(df, keys)
+
+        t0 = time.perf_counter()
+        esperado = _comparar(load_table_from_db(table, conn, rowid=True), nuevo)
+        t1 = time.perf_counter()
+        obtenido = _comparar_huellas(conn, table, nuevo)
+        t2 = time.perf_counter()
+        en_sql = _comparar_sql(conn, table, nuevo)
+        t_pandas += t1 - t0
+        t_huellas += t2 - t1
+        t_sql += time.perf_counter() - t2
+        hojas += 1
+
+        if obtenido is None or en_sql is None:
+            log(f"❌ '{hoja}': el diff por {'huellas' if obtenido is None else 'SQL'} no se aplicó.")
+            ok = False
+            continue
+
+        iguales = all(
+            _mismo(esperado["nuevos"], r["nuevos"], [IDX])
+            and _mismo(esperado["eliminados"], r["eliminados"], [IDX])
+            and _mismo(esperado["modificados"], r["modificados"], [f"{IDX}_new"])
+            and _mismo(materialize_changes(esperado, "modificados"), materialize_changes(r, "modificados"), [f"{IDX}_new"])
+            for r in (obtenido, en_sql)
+        )
+
+        # Aplicar el delta y comprobar que las huellas incrementales = recalculadas
+        apply_changes(hoja, nuevo, _entrada(hoja, obtenido), conn)
+        incremental = conn.execute(f'SELECT rid, clave, fila FROM "{FINGERPRINT_TABLE}" ORDER BY rid').fetchall()
+        refresh_fingerprints(conn, table)
+        recalculadas = conn.execute(f'SELECT rid, clave, fila FROM "{FINGERPRINT_TABLE}" ORDER BY rid').fetchall()
+        al_dia = incremental == recalculadas and not any(
+            len(v) for k, v in _comparar_huellas(conn, table, nuevo).items() if k in ("nuevos", "eliminados", "modificados")
+        )
+
+        # Edición fuera del pipeline con el mismo COUNT(*): las huellas quedan
+        # desfasadas, no se usan y el diff completo sí ve el cambio
+        columna = next(c for c in nuevo.columns if _normalize_name(c) not in keys)
+        conn.execute(f'UPDATE "{table}" SET "{columna}" = 987654.321 WHERE rowid = (SELECT MIN(rowid) FROM "{table}")')
+        al_dia &= _comparar_huellas(conn, table, nuevo) is None
+        al_dia &= len(_comparar(load_table_from_db(table, conn, rowid=True), nuevo)["modificados"]) == 1
+        conn.close()
+
+        if iguales and al_dia:
+            log(f"✅ '{hoja}': mismo resultado ({len(df)} filas).")
+        else:
+            log(f"❌ '{hoja}': diferencias (diff {'ok' if iguales else 'distinto'}, huellas {'ok' if al_dia else 'desfasadas'}).")
+            ok = False
+
+    log(f"⏱️ {hojas} hojas: diff pandas {t_pandas:.3f}s | por huellas {t_huellas:.3f}s | en SQLite {t_sql:.3f}s")
+    if ok:
+        log("✅ Paridad completa entre el diff pandas, el diff por huellas y el diff en SQLite.")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_paridad() else 1)
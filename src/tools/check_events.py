@@ -0,0 +1,124 @@
+# ==========================================================
+# DataPulse Tool – Log de eventos de cambio
+# Aplica sobre una base en memoria una tabla nueva, un delta con altas /
+# bajas / modificaciones y reemplazos de una hoja sin claves, cada uno en
+# su corrida, y verifica que:
+# - los eventos (insert / update / delete) cuadren con el diff aplicado,
+# - reproducirlos en orden sobre un espejo {rid: clave} dé la tabla final,
+# - un consumidor retome desde su offset guardado sin repetir eventos.
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import sqlite3
+import numpy as np
+import pandas as pd
+from core.logger import log
+from bridge.comparator import _comparar_huellas, _entrada
+from bridge.updater import apply_changes
+from bridge.events import _clave_sql, open_run, close_run, read_events, pending_events, commit_offset, get_offset
+
+SIN_DIFF = {"nuevos": 0, "eliminados": 0, "modificados": 0, "claves": [], "delta": False}
+
+# ==========================================================
+# FUNCIONES
+# ==========================================================
+def _hoja(filas: int, semilla: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "FECHA": pd.date_range("2025-01-01", periods=filas, freq="h").strftime("%Y-%m-%d %H:%M").to_numpy(),
+        "DESCRIPCION / ACTIVIDAD": rng.choice([f"mov {i}" for i in range(40)], filas).astype(object),
+        "MONTO ": rng.integers(1, 900, filas).astype(float),
+        "SALDO": rng.random(filas).round(2),
+    })
+
+
+def _corrida(conn, hoja: str, df: pd.DataFrame, delta: bool) -> tuple:
+    """Aplica df en una corrida propia. Retorna (corrida, entrada del diff)."""
+    corrida = open_run(conn, "check")
+    r = _comparar_huellas(conn, hoja.lower(), df) if delta else None
+    entrada = _entrada(hoja, r) if r is not None else SIN_DIFF
+    apply_changes(hoja, df, entrada, conn, corrida)
+    close_run(conn, corrida)
+    return corrida, entrada
+
+
+def _espejo(eventos: pd.DataFrame, tabla: str, espejo: dict) -> dict:
+    for fila in eventos[eventos["tabla"] == tabla].itertuples():
+        if fila.op == "delete":
+            espejo.pop(fila.rid)
+        else:
+            espejo[fila.rid] = fila.clave
+    return espejo
+
+
+def _conteo(eventos: pd.DataFrame, corrida: int) -> dict:
+    return eventos[eventos["corrida"] == corrida]["op"].value_counts().to_dict()
+
+
+def verificar_eventos():
+    conn = sqlite3.connect(":memory:")
+    ok = True
+
+    v1 = _hoja(2_000)
+    c1, _ = _corrida(conn, "Movimientos", v1, delta=False)
+    v2 = v1.drop(index=v1.index[:15]).copy()
+    v2.loc[v2.index[:10], "SALDO"] = -1.0
+    v2 = pd.concat([v2, _hoja(8, 9).assign(FECHA=[f"2030-01-0{i + 1}" for i in range(8)])], ignore_index=True)
+    c2, entrada = _corrida(conn, "Movimientos", v2, delta=True)
+
+    eventos = read_events(conn=conn)
+    esperado = {c1: {"insert": len(v1)}, c2: {"delete": 15, "update": 10, "insert": 8}}
+    for corrida, conteo in esperado.items():
+        bien = _conteo(eventos, corrida) == conteo and entrada["delta"]
+        ok &= bien
+        log(f"{'✅' if bien else '❌'} Corrida {corrida}: {_conteo(eventos, corrida)} (esperado {conteo}).")
+
+    orden = eventos["seq"].is_monotonic_increasing and eventos["corrida"].is_monotonic_increasing
+    espejo = _espejo(eventos, "movimientos", {})
+    tabla = dict(conn.execute(f"SELECT rowid, {_clave_sql(conn, 'movimientos')} FROM movimientos"))
+    bien = orden and espejo == tabla
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Reproducir los eventos en orden da la tabla final ({len(tabla)} filas).")
+
+    # Hoja sin claves: reemplazo idéntico no emite; una fila cambiada = delete + insert
+    plana = pd.DataFrame({"ITEM": ["a", "b", "b", "c"], "VALOR": [1, 2, 2, 3]})
+    _corrida(conn, "Plana", plana, delta=False)
+    c4, _ = _corrida(conn, "Plana", plana.iloc[::-1].reset_index(drop=True), delta=False)
+    cambio = plana.copy()
+    cambio.loc[1, "VALOR"] = 5
+    c5, _ = _corrida(conn, "Plana", cambio, delta=False)
+    eventos = read_events(conn=conn)
+    bien = _conteo(eventos, c4) == {} and _conteo(eventos, c5) == {"delete": 1, "insert": 1}
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Hoja sin claves: reemplazo idéntico sin eventos, una fila cambiada = delete + insert.")
+
+    # Consumidor: lee por lotes, confirma y retoma sin repetir; el offset no retrocede
+    vistos = []
+    while True:
+        lote = pending_events("check", 500, conn)
+        if lote.empty:
+            break
+        vistos.extend(lote["seq"])
+        commit_offset("check", int(lote["seq"].iloc[-1]), conn)
+    commit_offset("check", 1, conn)
+    bien = vistos == list(eventos["seq"]) and get_offset("check", conn) == vistos[-1]
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Consumidor: {len(vistos)} eventos en lotes, retoma desde el offset {get_offset('check', conn)}.")
+    conn.close()
+
+    if ok:
+        log("✅ Log de eventos ordenado, completo y reanudable.")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_eventos() else 1)
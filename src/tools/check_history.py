@@ -0,0 +1,151 @@
+# ==========================================================
+# DataPulse Tool – Historial de versiones (SCD2)
+# Aplica sobre una base en memoria varias versiones de una hoja sintética
+# (alta de la tabla, delta con altas / bajas / modificaciones, reemplazo
+# por cambio de esquema y reemplazo idéntico de una hoja sin claves) y
+# verifica que as_of() devuelva exactamente la tabla de cada instante,
+# que las filas sin cambios no generen versiones y que la consulta por
+# instante use el índice de vigencia. Mide as_of sobre una tabla grande.
+# Uso: python tools/check_history.py [filas]
+# ==========================================================
+import os
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+os.environ["HISTORY_TABLES"] = "*"  # antes de importar core.config
+
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+from core.logger import log
+from bridge.comparator import _comparar_huellas, _entrada, load_table_from_db
+from bridge.updater import apply_changes
+from bridge.history import as_of, history_table, history_view
+
+FILAS = 100_000
+
+# ==========================================================
+# FUNCIONES
+# ==========================================================
+def _hoja(filas: int, semilla: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "FECHA": pd.Series(pd.date_range("2025-01-01", periods=365, freq="D").strftime("%Y-%m-%d")).sample(
+            filas, replace=True, random_state=semilla).to_numpy(),
+        "DESCRIPCION / ACTIVIDAD": rng.choice([f"mov {i}" for i in range(40)], filas).astype(object),
+        "MONTO ": rng.integers(1, 900, filas).astype(float),
+        "RESPONSABLE": rng.choice(["ana", "luis", "rosa"], filas).astype(object),
+        "SALDO": rng.random(filas).round(2),
+    })
+
+
+def _aplicar(conn, hoja: str, df: pd.DataFrame) -> str:
+    table = hoja.lower()
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    r = _comparar_huellas(conn, table, df) if existe else None
+    entrada = _entrada(hoja, r) if r is not None else {"nuevos": 0, "eliminados": 0, "modificados": 0, "claves": [], "delta": False}
+    return apply_changes(hoja, df, entrada, conn)
+
+
+def _instante(conn, hoja: str, df: pd.DataFrame, modo: str) -> tuple:
+    """Aplica df, espera al segundo siguiente y retorna (instante, copia de la tabla)."""
+    obtenido = _aplicar(conn, hoja, df)
+    if obtenido != modo:
+        raise AssertionError(f"se esperaba {modo}, se aplicó {obtenido}")
+    time.sleep(1.05)
+    momento = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    time.sleep(1.05)
+    return momento, load_table_from_db(hoja.lower(), conn)
+
+
+def _igual(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    a = a[list(b.columns)]
+    orden = list(b.columns)
+    try:
+        pd.testing.assert_frame_equal(
+            a.sort_values(orden).reset_index(drop=True), b.sort_values(orden).reset_index(drop=True),
+            check_dtype=False,
+        )
+        return True
+    except AssertionError as e:
+        log(f"   ↳ {e}")
+        return False
+
+
+def _versiones(conn, table: str) -> int:
+    return conn.execute(f'SELECT COUNT(*) FROM "{history_table(table)}"').fetchone()[0]
+
+
+def verificar_historial(filas: int = FILAS):
+    conn = sqlite3.connect(":memory:")
+    ok = True
+
+    # v1: tabla nueva · v2: delta · v3: columna nueva (reemplazo por esquema)
+    v1 = _hoja(filas)
+    t1, s1 = _instante(conn, "Movimientos", v1, "reemplazo")
+
+    v2 = v1.drop(index=v1.index[:50]).copy()
+    v2.loc[v2.index[:30], "SALDO"] = -1.0
+    v2 = pd.concat([v2, _hoja(20, 9).assign(FECHA="2026-02-01")], ignore_index=True)
+    t2, s2 = _instante(conn, "Movimientos", v2, "delta")
+    despues_v2 = _versiones(conn, "movimientos")
+
+    v3 = v2.assign(NOTA="x")
+    v3.loc[v3.index[:10], "MONTO "] = 0.0
+    t3, s3 = _instante(conn, "Movimientos", v3, "reemplazo")
+
+    for nombre, momento, esperado in (("v1", t1, s1), ("v2", t2, s2), ("v3", t3, s3)):
+        t0 = time.perf_counter()
+        obtenido = as_of("Movimientos", momento, conn)
+        ms = (time.perf_counter() - t0) * 1000
+        bien = _igual(obtenido, esperado)
+        ok &= bien
+        log(f"{'✅' if bien else '❌'} as_of {nombre} ({momento}): {len(obtenido)} filas en {ms:.0f} ms.")
+
+    if despues_v2 != filas + 30 + 20:
+        log(f"❌ Versiones tras el delta: {despues_v2} (esperadas {filas + 30 + 20}).")
+        ok = False
+    antes = as_of("Movimientos", "2000-01-01", conn)
+    if not antes.empty:
+        log(f"❌ as_of antes del historial devolvió {len(antes)} filas.")
+        ok = False
+
+    # Hoja sin claves reemplazada con el mismo contenido (otro orden): sin versiones nuevas
+    plana = pd.DataFrame({"ITEM": ["a", "b", "b", "c"], "VALOR": [1, 2, 2, 3]})
+    _instante(conn, "Plana", plana, "reemplazo")
+    n = _versiones(conn, "plana")
+    _instante(conn, "Plana", plana.iloc[::-1].reset_index(drop=True), "reemplazo")
+    cambio = plana.copy()
+    cambio.loc[1, "VALOR"] = 5
+    _instante(conn, "Plana", cambio, "reemplazo")
+    mismos = n == 4 and _versiones(conn, "plana") == 5
+    ok &= mismos
+    log(f"{'✅' if mismos else '❌'} Hoja sin claves: reemplazo idéntico sin versiones nuevas, una fila cambiada = 1 versión.")
+
+    plan = [fila[-1] for fila in conn.execute(
+        f'EXPLAIN QUERY PLAN SELECT * FROM "{history_view("movimientos")}" WHERE valid_from <= ? AND valid_to > ?',
+        (t2, t2),
+    )]
+    usa = any("__vigencia" in p for p in plan)
+    ok &= usa
+    log(f"{'✅' if usa else '❌'} Consulta por instante: {' | '.join(plan)}")
+    log(f"📐 {_versiones(conn, 'movimientos')} versiones guardadas ({len(v3)} vigentes).")
+    conn.close()
+
+    if ok:
+        log("✅ Historial coherente: as_of reproduce cada versión de la tabla.")
+    return ok
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(0 if verificar_historial(*args) else 1)
@@ -0,0 +1,169 @@
+# ==========================================================
+# DataPulse Tool – Resumen materializado del consolidator
+# Sobre una base en memoria con una hoja tipo banco aplica deltas que
+# mueven filas de grupo, vacían un grupo y crean otro, y verifica que el
+# resumen incremental (solo grupos marcados) sea idéntico al agregado
+# completo de la tabla, que solo se recalculen los grupos tocados y que
+# v_reporte_bancos se lea del índice del resumen, no de las tablas.
+# Luego agrega una hoja con columnas alias y otra sin las columnas del
+# resumen, cambia el esquema de la primera y verifica que solo se creen
+# o reconstruyan las vistas de las tablas cuyo esquema cambió.
+# Uso: python tools/check_summaries.py [filas]
+# ==========================================================
+import sys
+from pathlib import Path
+
+# === FIX DE RUTA GLOBAL ===
+BASE_DIR = Path(__file__).resolve().parents[1]  # apunta a /src
+ROOT_DIR = BASE_DIR.parent                      # apunta a /DataPulse
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+from core.logger import log
+from bridge.comparator import _comparar_huellas, _entrada
+from bridge.updater import apply_changes
+from bridge.indexer import sync_indexes
+import bridge.consolidator as consolidator
+from bridge.consolidator import refresh_summaries, summary_view, MASTER_VIEW, REPORT_COLUMNS, REPORT_TABLE
+
+FILAS = 50_000
+SIN_DIFF = {"nuevos": 0, "eliminados": 0, "modificados": 0, "claves": [], "delta": False}
+
+# Agregado completo, igual al de la vista resumen anterior (referencia)
+_COMPLETO = """
+    SELECT portafolio, responsable, MIN(fecha), MAX(fecha),
+           SUM(CASE WHEN {tipo}='INGRESO' THEN abono ELSE 0 END),
+           SUM(CASE WHEN {tipo}='EGRESO' THEN retiro ELSE 0 END),
+           MAX(saldo), '{tabla}'
+    FROM {tabla} WHERE saldo IS NOT NULL GROUP BY portafolio, responsable
+"""
+
+# ==========================================================
+# FUNCIONES
+# ==========================================================
+def _hoja(filas: int, semilla: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    tipo = rng.choice(["INGRESO", "EGRESO"], filas)
+    monto = rng.integers(1, 900, filas).astype(float)
+    return pd.DataFrame({
+        "PORTAFOLIO": rng.choice(["P01", "P02", "P03", None], filas).astype(object),
+        "FECHA": pd.Series(pd.date_range("2025-01-01", periods=365, freq="D").strftime("%Y-%m-%d")).sample(
+            filas, replace=True, random_state=semilla).to_numpy(),
+        "RESPONSABLE": rng.choice([f"resp {i}" for i in range(12)], filas).astype(object),
+        "TIPO_MOV": tipo.astype(object),
+        "ABONO": np.where(tipo == "INGRESO", monto, np.nan),
+        "RETIRO": np.where(tipo == "EGRESO", monto, np.nan),
+        "SALDO": rng.random(filas).round(2) * 1000,
+    })
+
+
+def _aplicar(conn, df: pd.DataFrame, delta: bool = True, hoja: str = "Banco") -> int:
+    """Aplica df como la hoja dada y refresca el resumen. Retorna los grupos recalculados."""
+    r = _comparar_huellas(conn, hoja.lower(), df) if delta else None
+    apply_changes(hoja, df, _entrada(hoja, r) if r is not None else SIN_DIFF, conn)
+    sync_indexes(conn, {hoja.lower()})
+    return refresh_summaries(conn)
+
+
+def _igual(conn, tabla: str = "banco", tipo: str = "tipo_mov") -> bool:
+    completo = sorted(conn.execute(_COMPLETO.format(tabla=tabla, tipo=tipo)).fetchall(), key=repr)
+    resumen = sorted(conn.execute(f"SELECT {', '.join(REPORT_COLUMNS)} FROM {summary_view(tabla)}").fetchall(), key=repr)
+    return completo == resumen
+
+
+def _vistas(conn) -> set:
+    return {v for (v,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' AND name GLOB 'v_*_resumen'")}
+
+
+def _esquemas(conn, pasos) -> list:
+    """Ejecuta los pasos (funciones sin argumentos) contando las vistas resumen creadas por cada uno."""
+    original = consolidator.create_summary_view
+    creadas = []
+    consolidator.create_summary_view = lambda c, t: (creadas.append(t), original(c, t))
+    try:
+        resultado = []
+        for paso in pasos:
+            creadas.clear()
+            paso()
+            resultado.append(sorted(creadas))
+        return resultado
+    finally:
+        consolidator.create_summary_view = original
+
+
+def verificar_resumen(filas: int = FILAS):
+    conn = sqlite3.connect(":memory:")
+    ok = True
+
+    v1 = _hoja(filas)
+    _aplicar(conn, v1, delta=False)
+    grupos_total = conn.execute(f"SELECT COUNT(*) FROM {MASTER_VIEW}").fetchone()[0]
+
+    # Delta: 20 filas cambian de responsable (dejan un grupo y llegan a otro),
+    # se borra el grupo (P03, resp 11) completo y aparece (P09, resp nuevo)
+    v2 = v1.copy()
+    v2.loc[v2.index[:20], "RESPONSABLE"] = "resp 0"
+    v2 = v2[~((v2["PORTAFOLIO"] == "P03") & (v2["RESPONSABLE"] == "resp 11"))]
+    v2 = pd.concat([v2, _hoja(5, 9).assign(PORTAFOLIO="P09", RESPONSABLE="resp nuevo")], ignore_index=True)
+    tocados = (
+        set(zip(v1["PORTAFOLIO"][:20], v1["RESPONSABLE"][:20]))
+        | set(zip(v1["PORTAFOLIO"][:20], ["resp 0"] * 20)) | {("P09", "resp nuevo")}
+    )
+
+    t0 = time.perf_counter()
+    recalculados = _aplicar(conn, v2)
+    ms = (time.perf_counter() - t0) * 1000
+    bien = _igual(conn) and recalculados <= len(tocados)
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Delta: {recalculados} de {grupos_total} grupos recalculados "
+        f"(≤ {len(tocados)} tocados, grupo vaciado eliminado) en {ms:.0f} ms; resumen = agregado completo.")
+
+    # Reemplazo idéntico (otro orden): no marca grupos
+    recalculados = _aplicar(conn, v2.iloc[::-1].reset_index(drop=True), delta=False)
+    bien = recalculados == 0 and _igual(conn)
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Reemplazo idéntico: {recalculados} grupos recalculados.")
+
+    plan = [fila[-1] for fila in conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM {MASTER_VIEW}")]
+    t0 = time.perf_counter()
+    conn.execute(f"SELECT * FROM {MASTER_VIEW}").fetchall()
+    ms = (time.perf_counter() - t0) * 1000
+    bien = all(REPORT_TABLE in p for p in plan)
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} {MASTER_VIEW} en {ms:.2f} ms: {' | '.join(plan)}")
+
+    # Esquemas: hoja con alias (TIPO_MOVIMIENTO), hoja sin columnas del resumen con
+    # una vista vieja, cambio de esquema de Banco y refresco sin cambios
+    caja = _hoja(2_000, 5).rename(columns={"TIPO_MOV": "TIPO_MOVIMIENTO"})
+    notas = pd.DataFrame({"PORTAFOLIO": ["P01"], "NOTA": ["x"]})
+    conn.execute("CREATE TABLE notas (portafolio)")
+    conn.execute("CREATE VIEW v_notas_resumen AS SELECT * FROM notas")
+    creadas = _esquemas(conn, [
+        lambda: (_aplicar(conn, caja, delta=False, hoja="Caja"), _aplicar(conn, notas, delta=False, hoja="Notas")),
+        lambda: _aplicar(conn, v2.assign(NOTA="x"), delta=False),
+        lambda: refresh_summaries(conn),
+    ])
+    esperado = [["caja"], ["banco"], []]
+    bien = (
+        creadas == esperado and _vistas(conn) == {"v_banco_resumen", "v_caja_resumen"}
+        and _igual(conn) and _igual(conn, "caja", "tipo_movimiento")
+    )
+    ok &= bien
+    log(f"{'✅' if bien else '❌'} Esquemas: vistas creadas por paso {creadas} (esperado {esperado}); "
+        f"sin vista para la hoja sin columnas del resumen; alias tipo_movimiento mapeado.")
+    conn.close()
+
+    if ok:
+        log("✅ Resumen incremental idéntico al agregado completo.")
+    return ok
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(0 if verificar_resumen(*args) else 1)
@@ -3,33 +3,45 @@ import sys
 from pathlib import Path
 
 # === FIX GLOBAL DE RUTA ===
-# Agrega la carpeta raíz del proyecto (C:\Proyectos\DataPulse)
+# Agrega /src y la carpeta raíz del proyecto (C:\Proyectos\DataPulse)
 CURRENT_DIR = Path(__file__).resolve()
-ROOT_DIR = CURRENT_DIR.parents[3]
+BASE_DIR = CURRENT_DIR.parents[1]
+ROOT_DIR = CURRENT_DIR.parents[2]
+sys.path.append(str(BASE_DIR))
 sys.path.append(str(ROOT_DIR))
 
 import pandas as pd
 import sqlite3
-from src.core.config import EXCELS, DB_PATH, DATA_PATH
+from src.core.config import DB_PATH, DATA_PATH
 from src.core.logger import log
+from core.db_utils import sanitize_table_name
+from bridge.reader import iter_sheets
 
 # ==========================================================
 # CONFIGURACIÓN
 # ==========================================================
-EXCEL_PATH = EXCELS.get("movimientos")
 OUTPUT_PATH = DATA_PATH / "Comparativo_Resultados.xlsx"
 
 OMITIR_HOJAS = {"Reporte_Bancos", "FE", "Clientes_Proveedores"}
 
+
+def _ordenar(df):
+    """Ordena las filas por todas sus columnas (como texto) con índice 0..n-1."""
+    if df.empty:
+        return df.reset_index(drop=True)
+    clave = df.astype(str)
+    return df.loc[clave.sort_values(list(clave.columns)).index].reset_index(drop=True)
+
+
 # ==========================================================
 # FUNCIÓN PRINCIPAL
 # ==========================================================
 def verificar_excel_vs_db():
-    """Compara cada hoja del Excel con su tabla equivalente en SQLite."""
-    if not EXCEL_PATH or not EXCEL_PATH.exists():
-        log(f"❌ No se encontró el archivo Excel: {EXCEL_PATH}")
-        return
-
+    """
+    Compara cada hoja procesada de los Excels con su tabla equivalente en SQLite.
+    Las hojas salen de iter_sheets (ya limpias, de a una; desde la caché de hojas
+    procesadas cuando el Excel no cambió), igual que lo que se guarda en la base.
+    """
     if not DB_PATH.exists():
         log(f"❌ No se encontró la base de datos: {DB_PATH}")
         return
@@ -37,20 +49,23 @@ def verificar_excel_vs_db():
     log("📘 Iniciando comparación hoja ↔ tabla...")
 
     conn = sqlite3.connect(DB_PATH)
-    xls = pd.ExcelFile(EXCEL_PATH, engine="openpyxl")
 
     resumen, diferencias = [], []
 
-    for hoja in xls.sheet_names:
-        if hoja in OMITIR_HOJAS:
+    for hoja, df in iter_sheets():
+        if any(hoja.endswith(f"_{omitida}") for omitida in OMITIR_HOJAS):
             continue
 
         log(f"🔍 Comparando '{hoja}'...")
 
         try:
-            # --- Leer desde Excel y BD ---
-            df_excel = pd.read_excel(EXCEL_PATH, sheet_name=hoja, dtype=str).fillna("")
-            df_sql = pd.read_sql_query(f"SELECT * FROM '{hoja}'", conn).fillna("")
+            # --- Hoja procesada y tabla en BD ---
+            df_excel = df.fillna("")
+            df_sql = pd.read_sql_query(f"SELECT * FROM '{sanitize_table_name(hoja)}'", conn).fillna("")
+
+            # --- Mismo orden de filas: la aplicación por delta no conserva el del Excel ---
+            df_excel = _ordenar(df_excel)
+            df_sql = _ordenar(df_sql)
 
             # --- Igualar dimensiones y columnas ---
             max_rows = max(len(df_excel), len(df_sql))
@@ -82,6 +97,10 @@ def verificar_excel_vs_db():
 
     conn.close()
 
+    if not resumen:
+        log("❌ No se pudieron leer hojas desde los Excels configurados.")
+        return
+
     # --- Exportar resultados ---
     df_resumen = pd.DataFrame(
         resumen,